@@ -1,29 +1,50 @@
 # app.py
 import os
 import json
+import hashlib
 from datetime import datetime, timedelta
 from io import BytesIO
 from functools import wraps
 
-from flask import Flask, request, jsonify, send_file, render_template, g, send_from_directory
+from flask import (Flask, request, jsonify, send_file, render_template, g, send_from_directory, Response,
+                   stream_with_context, has_request_context)
 from flask_cors import CORS
-from sqlalchemy import text
+from sqlalchemy import text, event
+from sqlalchemy.engine import Engine
 from werkzeug.utils import secure_filename
-from threading import Thread
-from time import sleep
+from threading import Lock
+from time import monotonic, perf_counter
+
+import click
 
 import bcrypt
 import jwt
 
-from openpyxl import Workbook
-from docx import Document as DocxDocument
 import smtplib
 from email.message import EmailMessage
-from docx.shared import Inches
-from flask import send_file
 
-from models import db, UploadedFile, Document, SelectedEntry, SearchHistory, User
-from extractor import extract_rows_from_excel
+from models import (db, Document, SelectedEntry, SearchHistory, User, Translation, UserDataVersion, HeaderAlias,
+                    HeaderLayout, upgrade_schema)
+from extractor import (derive_english_fields, normalize_colname, preview_file, resolve_columns,
+                       convert_amount_columns, parse_amounts, PREVIEW_ROWS, COLUMN_MAP, DOCUMENT_FIELDS, AMOUNT_FIELDS,
+                       DEFAULT_DOCNAME_MAP, DEFAULT_SRO_MAP, PROPERTY_KINDS, parse_property_number)
+from headers import header_resolver, invalidate_header_layouts, LAYOUT_LIST_MAX_LIMIT
+from ingest import unique_path, save_upload, ingest_file, document_values
+from parties import PARTY_ROLES, SUGGEST_LIMIT, suggest_party_names, fuzzy_party_matches
+from chain import CHAIN_MAX_DEPTH, party_chain, property_chain
+import resumable
+from exporter import EXPORT_COLUMNS, iter_batches, stream_csv, write_parquet
+from jobs import register_job, run_job, start_scheduler, job_status
+from retention import run_retention, purge_user_data
+from maintenance import run_maintenance, in_maintenance_window, database_stats
+import metrics
+import slow_queries
+import profiling
+from static_files import IndexCache, send_static, precompress
+from tenants import (TENANT_TABLES, tenant_text, for_each_tenant, tenant_ids, tenant_db_path, init_tenant_db,
+                     has_shared_documents, migrate_shared_database, dispose_tenant_engines)
+from streaming import (stream_mode, negotiate_encoding, compress_chunks, compress_body, MIN_COMPRESS_SIZE,
+                       ndjson_stream, json_array_stream, grouped_json_stream)
 
 
 # -----------------------------
@@ -38,6 +59,8 @@ else:
 
 UPLOAD_FOLDER = os.path.join(DB_ROOT, "uploads")
 DB_PATH = os.path.join(DB_ROOT, "Adoodle.db")
+# set → one user_<id>.db per user in this directory; unset → one shared database (tenants.py)
+TENANT_DB_DIR = os.environ.get('TENANT_DB_DIR') or None
 
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
@@ -59,7 +82,7 @@ def create_app(db_path=f"sqlite:///{DB_PATH}"):
 
     app = Flask(
         __name__,
-        static_folder="dist/assets",     # <---- Vite assets
+        static_folder=None,              # <---- dist/ is served by static_files.py
         template_folder="dist"           # <---- index.html
     )
 
@@ -69,7 +92,8 @@ def create_app(db_path=f"sqlite:///{DB_PATH}"):
     app.config.update(
         SQLALCHEMY_DATABASE_URI=db_path,
         SQLALCHEMY_TRACK_MODIFICATIONS=False,
-        UPLOAD_FOLDER=UPLOAD_FOLDER
+        UPLOAD_FOLDER=UPLOAD_FOLDER,
+        TENANT_DB_DIR=TENANT_DB_DIR
     )
 
     # -----------------
@@ -90,29 +114,128 @@ def create_app(db_path=f"sqlite:///{DB_PATH}"):
 
     db.init_app(app)
 
-    # -----------------------------
-    # DB + Super Admin Setup
-    # -----------------------------
+    return app
+
+
+
+# ==========================================================
+# Create App Instance
+# ==========================================================
+app = create_app()
+
+@app.after_request
+def add_cors_headers(response):
+    origin = request.headers.get("Origin")
+
+    allowed = [
+        "https://adoodle-software.onrender.com",
+        "https://adoodle-backend.onrender.com",
+        "http://localhost:5173"
+    ]
+
+    if origin in allowed:
+        response.headers["Access-Control-Allow-Origin"] = origin
+
+    response.headers["Access-Control-Allow-Credentials"] = "true"
+    response.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization, X-Adoodle-Profile"
+    response.headers["Access-Control-Expose-Headers"] = "X-Profile-Id"
+    response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
+    return response
+
+
+@app.after_request
+def compress_json_response(response):
+    # Buffered JSON only; streamed responses are compressed chunk by chunk
+    if (response.mimetype != 'application/json' or response.is_streamed or response.direct_passthrough
+            or 'Content-Encoding' in response.headers or response.status_code < 200):
+        return response
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    if not encoding:
+        return response
+    data = response.get_data()
+    if len(data) < MIN_COMPRESS_SIZE:
+        return response
+    response.set_data(compress_body(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+STREAM_BATCH_SIZE = int(os.environ.get('STREAM_BATCH_SIZE', '200'))
+
+
+def iter_result_batches(result, to_dict, batch_size=STREAM_BATCH_SIZE):
+    """Yield lists of dicts as rows come off the cursor; closes the read transaction at the end."""
+    try:
+        while True:
+            rows = result.fetchmany(batch_size)
+            if not rows:
+                break
+            yield [to_dict(r) for r in rows]
+    finally:
+        result.close()
+        db.session.rollback()
+
+
+def streamed_response(chunks, mimetype):
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    if encoding:
+        chunks = compress_chunks(chunks, encoding)
+    resp = Response(stream_with_context(chunks), mimetype=mimetype)
+    if encoding:
+        resp.headers['Content-Encoding'] = encoding
+    resp.vary.add('Accept-Encoding')
+    resp.headers['X-Accel-Buffering'] = 'no'
+    return resp
+
+# ==========================================================
+# Database bootstrap (one-time migration step)
+# Run by gunicorn.conf.py in the master before workers fork, or
+# by hand with `flask --app app init-db`. Importing the app does
+# no DDL and no bcrypt work, so each worker boots quickly.
+# ==========================================================
+DEFAULT_USER_EMAIL = "user@example.com"
+DEFAULT_USER_PW = "user123"
+
+
+def init_database():
     with app.app_context():
-        db.create_all()
+        # with TENANT_DB_DIR, per-user tables are created in each user's own file (tenants.py)
+        central = [t for t in db.metadata.sorted_tables if t.name not in TENANT_TABLES]
+        db.metadata.create_all(db.engine, tables=central)
+        upgrade_schema(tables=central)
+        if not app.config['TENANT_DB_DIR']:
+            init_tenant_db(db.engine)
+        elif has_shared_documents(db.engine):
+            print("Shared documents are still in the central database: "
+                  "run `flask --app app migrate-tenants` to move them into per-user files.")
 
         try:
-            db.session.execute(text("""
-                CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts 
-                USING fts5(
-                    docid UNINDEXED, 
-                    purchasername, 
-                    sellername, 
-                    propertydescription, 
-                    docname, 
-                    docno, 
-                    content=''
-                );
-            """))
+            if not Translation.query.first():
+                for source, target in DEFAULT_DOCNAME_MAP.items():
+                    db.session.add(Translation(kind='docname', source=source, target=target.strip()))
+                for source, target in DEFAULT_SRO_MAP.items():
+                    db.session.add(Translation(kind='sro', source=source, target=target.strip()))
+                db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print("Translation seed failed:", e)
+
+        try:
+            # older seeds stored " Agreement": trim it and re-derive the documents that copied it
+            padded = Translation.query.filter(Translation.target != db.func.trim(Translation.target)).all()
+            for t in padded:
+                t.target = t.target.strip()
             db.session.commit()
+            if padded:
+                for t in padded:
+                    _refresh_translated_rows(t.kind, t.source)
+                bump_data_version()
+                db.session.commit()
+                print(f"Trimmed {len(padded)} translation targets")
         except Exception as e:
             db.session.rollback()
-            print("Warning: FTS5 unavailable:", e)
+            print("Translation trim failed:", e)
 
         try:
             existing_admin = User.query.filter_by(is_admin=True).first()
@@ -132,71 +255,127 @@ def create_app(db_path=f"sqlite:///{DB_PATH}"):
             db.session.rollback()
             print("Super admin creation failed:", e)
 
-    return app
+        try:
+            existing_user = User.query.filter_by(email=DEFAULT_USER_EMAIL.lower()).first()
+            if not existing_user:
+                hashed_pw = bcrypt.hashpw(DEFAULT_USER_PW.encode(), bcrypt.gensalt()).decode()
+                default_user = User(
+                    email=DEFAULT_USER_EMAIL.lower(),
+                    password_hash=hashed_pw,
+                    name="Default User",
+                    is_admin=False,
+                    is_active=True
+                )
+                db.session.add(default_user)
+                db.session.commit()
+                print(f"Default user created: {DEFAULT_USER_EMAIL}")
+        except Exception as e:
+            db.session.rollback()
+            print("Default user creation failed:", e)
+
+        # no pooled SQLite connection may cross the gunicorn fork
+        db.session.remove()
+        db.engine.dispose()
+        dispose_tenant_engines()
+
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Create / upgrade tables, seed translations and the admin user."""
+    init_database()
+    print("Database ready.")
+
 
+@app.cli.command('migrate-tenants')
+@click.confirmation_option(prompt='Move shared documents into per-user files and drop the shared tables?')
+def migrate_tenants_command():
+    """Move documents of a shared-mode database into per-user files (needs TENANT_DB_DIR)."""
+    if not app.config['TENANT_DB_DIR']:
+        raise click.UsageError("Set TENANT_DB_DIR to the directory for the per-user databases first.")
+    moved = migrate_shared_database(db.engine)
+    dispose_tenant_engines()
+    print(f"Moved {moved} users' documents into per-user databases.")
 
 
 # ==========================================================
-# Create App Instance
+# Metrics: request latency, SQL per request (see metrics.py)
 # ==========================================================
-app = create_app()
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
 
-@app.after_request
-def add_cors_headers(response):
-    origin = request.headers.get("Origin")
 
-    allowed = [
-        "https://adoodle-software.onrender.com",
-        "https://adoodle-backend.onrender.com",
-        "http://localhost:5173"
-    ]
+def _metrics_endpoint():
+    return (request.endpoint or 'unmatched') if has_request_context() else 'background'
 
-    if origin in allowed:
-        response.headers["Access-Control-Allow-Origin"] = origin
 
-    response.headers["Access-Control-Allow-Credentials"] = "true"
-    response.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization"
-    response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
+@event.listens_for(Engine, "before_cursor_execute")
+def _sql_start(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _sql_end(conn, cursor, statement, parameters, context, executemany):
+    elapsed = perf_counter() - conn.info['query_start'].pop()
+    endpoint = _metrics_endpoint()
+    metrics.inc('adoodle_sql_queries_total', endpoint=endpoint)
+    metrics.observe('adoodle_sql_query_duration_seconds', elapsed, endpoint=endpoint)
+    if elapsed * 1000 >= slow_queries.SLOW_QUERY_MS:
+        slow_queries.record(cursor.connection, statement, parameters, elapsed, endpoint, executemany)
+    if has_request_context():
+        g.sql_queries = g.get('sql_queries', 0) + 1
+
+
+@event.listens_for(Engine, "handle_error")
+def _sql_error(exception_context):
+    starts = exception_context.connection.info.get('query_start') if exception_context.connection else None
+    if starts:
+        starts.pop()
+    kind = 'locked' if 'database is locked' in str(exception_context.original_exception) else 'other'
+    metrics.inc('adoodle_sql_errors_total', kind=kind)
+
+
+@app.before_request
+def start_request_timer():
+    g.request_start = perf_counter()
+    g.sql_queries = 0
+
+
+@app.after_request
+def record_request_metrics(response):
+    start = g.get('request_start')
+    if start is not None:
+        endpoint = _metrics_endpoint()
+        metrics.observe('adoodle_http_request_duration_seconds', perf_counter() - start, endpoint=endpoint)
+        metrics.inc('adoodle_http_requests_total', endpoint=endpoint, method=request.method,
+                    status=response.status_code)
+        metrics.observe('adoodle_sql_queries_per_request', g.get('sql_queries', 0), endpoint=endpoint)
+    metrics.flush()
     return response
 
-with app.app_context():
-    try:
-        DEFAULT_USER_EMAIL = "user@example.com"
-        DEFAULT_USER_PW = "user123"
-
-        existing_user = User.query.filter_by(email=DEFAULT_USER_EMAIL.lower()).first()
-
-        if not existing_user:
-            hashed_pw = bcrypt.hashpw(DEFAULT_USER_PW.encode(), bcrypt.gensalt()).decode()
-            default_user = User(
-                email=DEFAULT_USER_EMAIL.lower(),
-                password_hash=hashed_pw,
-                name="Default User",
-                is_admin=False,
-                is_active=True
-            )
-            db.session.add(default_user)
-            db.session.commit()
 
-            print(f"Default user created: {DEFAULT_USER_EMAIL}")
-        else:
-            print("Default user already exists")
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    # Optional bearer token for scrapers (METRICS_TOKEN); open when unset
+    if METRICS_TOKEN and request.headers.get('Authorization', '') != f'Bearer {METRICS_TOKEN}':
+        return jsonify({'error': 'Unauthorized'}), 401
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
-    except Exception as e:
-        db.session.rollback()
-        print("Default user creation failed:", e)
 
 # ==========================================================
 # Vite Frontend Routes (dist folder)
 # ==========================================================
+DIST_FOLDER = os.path.join(app.root_path, "dist")
+ASSETS_FOLDER = os.path.join(DIST_FOLDER, "assets")
+index_html = IndexCache(os.path.join(DIST_FOLDER, "index.html"))
+
+
 @app.route("/")
 def index():
-    return send_from_directory(app.template_folder, "index.html")
+    return index_html.response()
 
 
 @app.route("/assets/<path:path>")
 def assets(path):
-    return send_from_directory(app.static_folder, path)
+    return send_static(ASSETS_FOLDER, path)
 
 
 # React Router Catch-All (VERY IMPORTANT)
@@ -205,49 +384,44 @@ def catch_all(path):
     # Prevent overriding API routes
     if path.startswith("api"):
         return jsonify({"error": "API route not found"}), 404
-    return send_from_directory(app.template_folder, "index.html")
+    # files copied from public/ (favicon, logos) sit next to index.html
+    if "." in path.rsplit("/", 1)[-1] and os.path.isfile(os.path.join(DIST_FOLDER, path)):
+        return send_static(DIST_FOLDER, path)
+    return index_html.response()
 
 
+@app.cli.command('precompress-assets')
+def precompress_assets_command():
+    """Write .br / .gz next to the dist/ files (run after `npm run build`)."""
+    print(f"Precompressed: {precompress(DIST_FOLDER)} files written.")
 
-def cleanup_old_files():
-    from app import app  # important: get the running app instance
-
-    with app.app_context():  # <<< FIXED
-        try:
-            cutoff = datetime.utcnow() - timedelta(days=30)
 
-            old_files = UploadedFile.query.filter(
-                UploadedFile.upload_date < cutoff
-            ).all() 
 
-            if not old_files:
-                return
+RETENTION_INTERVAL = int(os.environ.get('RETENTION_INTERVAL', str(6 * 60 * 60)))
 
-            for f in old_files:
 
-                # delete file from disk
-                try:
-                    if os.path.exists(f.filepath):
-                        os.remove(f.filepath)
-                except Exception as e:
-                    print("File delete error:", e)
-
-                # delete DB entry
-                db.session.delete(f)
-
-            db.session.commit()
-            print(f"Cleanup: {len(old_files)} old files removed.")
-
-        except Exception as e:
-            print("Cleanup error:", str(e))
+def cleanup_old_files():
+    """
+    Retention job: removes expired uploads with their documents, FTS entries and
+    selections (see retention.py). Scheduled through jobs.py, so only one worker
+    runs it at a time.
+    """
+    stats = run_retention()
+    for user_id in stats['users']:
+        bump_data_version(user_id)
+    db.session.commit()
+    stats['upload_sessions'], _ = resumable.expire_sessions(app.config['UPLOAD_FOLDER'])
+    print(f"Cleanup: {stats['files']} files, {stats['documents']} documents, "
+          f"{stats['bytes']} bytes reclaimed in {stats['seconds']}s.")
+    stats['users'] = len(stats['users'])
+    return stats
 
-def start_cleanup_thread():
-    def worker():
-        while True:
-            cleanup_old_files()
-            sleep(24 * 60 * 60)   # run once per day
-    Thread(target=worker, daemon=True).start()
 
+@app.cli.command('run-retention')
+def run_retention_command():
+    """Run one retention pass now (ignores the schedule, respects the lock)."""
+    result = run_job(app, 'retention', force=True)
+    print(result if result is not None else "Retention is running in another worker.")
 
 
 # ---------------- HELPERS ----------------
@@ -261,6 +435,137 @@ def build_in_params(int_ids, prefix="id"):
     return placeholders, params
 
 
+# ---------------- TRANSLATIONS (Marathi → English) ----------------
+TRANSLATION_CACHE_TTL = int(os.environ.get('TRANSLATION_CACHE_TTL', '60'))
+_translation_cache = {'loaded_at': 0.0, 'maps': None}
+
+
+def get_translation_maps():
+    """Return (docname_map, sro_map) from the translations table, cached per process."""
+    now = monotonic()
+    stale = _translation_cache['maps'] is None or now - _translation_cache['loaded_at'] > TRANSLATION_CACHE_TTL
+    metrics.cache_result('translations', not stale)
+    if stale:
+        maps = {'docname': {}, 'sro': {}}
+        for t in Translation.query.all():
+            maps.setdefault(t.kind, {})[t.source] = t.target
+        _translation_cache['maps'] = (maps['docname'], maps['sro'])
+        _translation_cache['loaded_at'] = now
+    return _translation_cache['maps']
+
+
+def invalidate_translation_cache():
+    _translation_cache['maps'] = None
+
+
+def backfill_english_fields(only_missing=False, batch_size=2000):
+    """Recompute docname_en / sro_code_en / reg_year for existing documents, in every user's database."""
+    docname_map, sro_map = get_translation_maps()
+    db.session.commit()
+    results = for_each_tenant(
+        lambda user_id: _bump_if_updated(user_id, _backfill_tenant(docname_map, sro_map, only_missing, batch_size))
+    )
+    return sum(results.values())
+
+
+def _bump_if_updated(user_id, updated):
+    """for_each_tenant helper: a backfill that rewrote documents invalidates the user's ETags."""
+    if updated:
+        bump_data_version(user_id)
+    return updated
+
+
+def _backfill_tenant(docname_map, sro_map, only_missing, batch_size):
+    """One tenant database, in id batches."""
+    missing = " AND (docname_en IS NULL OR reg_year IS NULL)" if only_missing else ""
+    last_id, updated = 0, 0
+    while True:
+        rows = db.session.execute(tenant_text(f"""
+            SELECT id, docname, sroname, registrationdate FROM documents
+            WHERE id > :last_id{missing}
+            ORDER BY id LIMIT :limit
+        """), {'last_id': last_id, 'limit': batch_size}).fetchall()
+        if not rows:
+            break
+        updates = []
+        for r in rows:
+            fields = derive_english_fields(
+                {'docname': r[1], 'sroname': r[2], 'registrationdate': r[3]}, docname_map, sro_map
+            )
+            fields['id'] = r[0]
+            updates.append(fields)
+        db.session.execute(tenant_text("""
+            UPDATE documents SET docname_en = :docname_en, sro_code_en = :sro_code_en, reg_year = :reg_year
+            WHERE id = :id
+        """), updates)
+        db.session.commit()
+        updated += len(rows)
+        last_id = rows[-1][0]
+    return updated
+
+
+@app.cli.command('backfill-english')
+@click.option('--only-missing', is_flag=True, help='Only rows without derived values yet.')
+def backfill_english_command(only_missing):
+    """Fill docname_en / sro_code_en / reg_year for existing documents."""
+    updated = backfill_english_fields(only_missing=only_missing)
+    print(f"Backfill: {updated} documents updated.")
+
+
+def backfill_amounts(batch_size=2000):
+    """Re-parse NULL consideration_amt / marketvalue from raw_json, in every user's database."""
+    resolver = header_resolver()
+    db.session.commit()
+    return sum(for_each_tenant(
+        lambda user_id: _bump_if_updated(user_id, _backfill_amounts_tenant(resolver, batch_size))
+    ).values())
+
+
+def _backfill_amounts_tenant(resolver, batch_size):
+    last_id, updated = 0, 0
+    while True:
+        rows = db.session.execute(tenant_text("""
+            SELECT id, raw_json, consideration_amt, marketvalue FROM documents
+            WHERE id > :last_id AND raw_json IS NOT NULL
+              AND (consideration_amt IS NULL OR marketvalue IS NULL)
+            ORDER BY id LIMIT :limit
+        """), {'last_id': last_id, 'limit': batch_size}).fetchall()
+        if not rows:
+            break
+        recs, current = [], {}
+        for doc_id, raw_json, *amounts in rows:
+            try:
+                raw = json.loads(raw_json)
+            except ValueError:
+                continue
+            keys = list(raw)
+            fields = resolve_columns([normalize_colname(k) for k in keys], resolver)
+            rec = {'id': doc_id}
+            rec.update({fields[i]: raw[k] for i, k in enumerate(keys) if fields[i] in AMOUNT_FIELDS})
+            recs.append(rec)
+            current[doc_id] = dict(zip(AMOUNT_FIELDS, amounts))
+        # only rows where a NULL column actually gets a value
+        updates = [r for r in convert_amount_columns(recs)
+                   if any(r[f] is not None and current[r['id']][f] is None for f in AMOUNT_FIELDS)]
+        if updates:
+            db.session.execute(tenant_text("""
+                UPDATE documents SET consideration_amt = COALESCE(consideration_amt, :consideration_amt),
+                                     marketvalue = COALESCE(marketvalue, :marketvalue)
+                WHERE id = :id
+            """), updates)
+        db.session.commit()
+        updated += len(updates)
+        last_id = rows[-1][0]
+    return updated
+
+
+@app.cli.command('backfill-amounts')
+def backfill_amounts_command():
+    """Parse amounts that older uploads left empty (Rs. / ₹ / Devanagari / lakh-grouped values)."""
+    updated = backfill_amounts()
+    print(f"Backfill: {updated} documents updated.")
+
+
 # ---------------- JWT HELPERS & DECORATOR ----------------
 def create_token(user, expires_days=None):
     if expires_days is None:
@@ -300,26 +605,179 @@ def get_token_from_header():
     return request.args.get('token')
 
 
-def _check_and_handle_expiry(user):
+def _is_expired(user):
     """
-    If user has expiry_date and it's passed, mark as inactive and return True (expired).
-    Returns True if expired (and user.is_active updated), False otherwise.
+    True if the user has an expiry_date that has passed. Pure check, no DB write:
+    flipping is_active for expired accounts is done in bulk by deactivate_expired_users().
     """
+    expiry = getattr(user, 'expiry_date', None)
+    return bool(expiry and isinstance(expiry, datetime) and datetime.utcnow() > expiry)
+
+
+# ---------------- AUTH USER CACHE ----------------
+# jwt_required / admin_required would otherwise load the user on every
+# request. Entries are keyed on (user id, token iat) and served without a
+# query for AUTH_CACHE_TTL seconds. An expired entry is revalidated with one
+# primary-key read of user.auth_version, which every admin change bumps: the
+# snapshot is kept if it still matches, the user reloaded if not. So another
+# worker sees a deactivated or deleted user at most AUTH_CACHE_TTL late;
+# the worker that made the change drops its entries at once.
+AUTH_CACHE_TTL = int(os.environ.get('AUTH_CACHE_TTL', '30'))
+AUTH_CACHE_MAX = int(os.environ.get('AUTH_CACHE_MAX', '10000'))
+_auth_cache = {}
+_auth_cache_lock = Lock()
+
+
+class AuthUser:
+    """Detached snapshot of the User fields the request path needs (set as g.current_user)."""
+    __slots__ = ('id', 'email', 'name', 'is_admin', 'is_active', 'expiry_date', 'created_at', 'auth_version')
+
+    def __init__(self, user):
+        for attr in self.__slots__:
+            setattr(self, attr, getattr(user, attr, None))
+
+
+def get_auth_user(payload):
     try:
-        expiry = getattr(user, 'expiry_date', None)
+        user_id = int(payload.get('sub'))
     except Exception:
-        expiry = None
+        return None
+    key = (user_id, payload.get('iat'))
+    now = monotonic()
+
+    with _auth_cache_lock:
+        hit = _auth_cache.get(key)
+    if hit and hit[0] > now:
+        metrics.cache_result('auth_user', True)
+        return hit[1]
+    metrics.cache_result('auth_user', False)
+
+    snapshot = None
+    if hit:
+        row = db.session.execute(text("SELECT auth_version FROM user WHERE id = :id"), {'id': user_id}).first()
+        if row is None:
+            invalidate_user_cache(user_id, bump=False)
+            return None
+        if (row[0] or 0) == (hit[1].auth_version or 0):
+            snapshot = hit[1]
+    if snapshot is None:
+        user = User.query.get(user_id)
+        if not user:
+            return None
+        snapshot = AuthUser(user)
+
+    with _auth_cache_lock:
+        if len(_auth_cache) >= AUTH_CACHE_MAX:
+            for k in [k for k, v in _auth_cache.items() if v[0] <= now] or list(_auth_cache):
+                del _auth_cache[k]
+        _auth_cache[key] = (now + AUTH_CACHE_TTL, snapshot)
+    return snapshot
+
+
+def invalidate_user_cache(*user_ids, bump=True):
+    """
+    After a user change is committed: bump auth_version (own commit) so other
+    workers reload the user when their entry expires, and drop this worker's entries.
+    """
+    if bump:
+        db.session.execute(text("""
+            UPDATE user SET auth_version = COALESCE(auth_version, 0) + 1
+            WHERE id IN (SELECT value FROM json_each(:ids))
+        """), {'ids': json.dumps(list(user_ids))})
+        db.session.commit()
+    with _auth_cache_lock:
+        for k in [k for k in _auth_cache if k[0] in user_ids]:
+            del _auth_cache[k]
+
+
+def deactivate_expired_users():
+    """Batched sweep: mark every active user whose expiry_date has passed as inactive."""
+    now = datetime.utcnow()
+    ids = [r[0] for r in User.query.with_entities(User.id).filter(
+        User.is_active == True,
+        User.expiry_date.isnot(None),
+        User.expiry_date < now
+    ).all()]
+    if not ids:
+        db.session.rollback()
+        return {'deactivated': 0}
+
+    User.query.filter(User.id.in_(ids)).update({User.is_active: False}, synchronize_session=False)
+    db.session.commit()
+    invalidate_user_cache(*ids)
+    print(f"Expiry sweep: {len(ids)} users deactivated.")
+    return {'deactivated': len(ids)}
+
+
+EXPIRY_SWEEP_INTERVAL = int(os.environ.get('EXPIRY_SWEEP_INTERVAL', '300'))
+MAINTENANCE_INTERVAL = int(os.environ.get('MAINTENANCE_INTERVAL', str(20 * 60 * 60)))
+_background_pid = None
+
+register_job('expiry_sweep', EXPIRY_SWEEP_INTERVAL, deactivate_expired_users)
+register_job('retention', RETENTION_INTERVAL, cleanup_old_files)
+register_job('maintenance', MAINTENANCE_INTERVAL, run_maintenance, when=in_maintenance_window)
+
+
+def start_background_jobs():
+    """
+    Start this process's job scheduler once. Runs from the first request, so it
+    works under gunicorn (forked workers each track their own pid); the DB lock
+    in jobs.py makes sure a due job runs in one worker only.
+    """
+    global _background_pid
+    if _background_pid == os.getpid():
+        return
+    _background_pid = os.getpid()
+    start_scheduler(app)
+
+
+@app.before_request
+def ensure_background_jobs():
+    start_background_jobs()
+
+
+# ---------------- PER-REQUEST PROFILER (admin opt-in, see profiling.py) ----------------
+@app.before_request
+def start_request_profile():
+    # Only a header / query lookup unless the flag is set
+    if not profiling.requested(request):
+        return
+    payload = decode_token(get_token_from_header() or '')
+    if not payload or payload.get('role') != 'admin':
+        return
+    user = get_auth_user(payload)
+    if not user or not user.is_admin or not user.is_active:
+        return
+    profile = profiling.RequestProfile(request.method, request.full_path, user.id)
+    try:
+        profile.enable()
+    except ValueError as e:   # another profiler already active in this thread
+        print("Profiler not started:", e)
+        return
+    g.profile = profile
 
-    if expiry and isinstance(expiry, datetime):
-        if datetime.utcnow() > expiry:
-            if user.is_active:
-                user.is_active = False
-                try:
-                    db.session.commit()
-                except Exception:
-                    db.session.rollback()
-            return True
-    return False
+
+@app.after_request
+def finish_request_profile(response):
+    profile = g.pop('profile', None)
+    if profile is None:
+        return response
+    response.headers['X-Profile-Id'] = profile.id
+    if response.is_streamed and not response.direct_passthrough:
+        # the body is produced after this hook; keep profiling while it is consumed
+        profile.disable()
+        response.response = profiling.profiled_iter(response.response, profile, response.status_code)
+    else:
+        profile.finish(response.status_code)
+    return response
+
+
+@app.teardown_request
+def abort_request_profile(exc):
+    # after_request is skipped on unhandled errors
+    profile = g.pop('profile', None)
+    if profile is not None:
+        profile.finish(500)
 
 
 def jwt_required(f):
@@ -331,16 +789,12 @@ def jwt_required(f):
         payload = decode_token(token)
         if not payload:
             return jsonify({'error': 'Invalid or expired token'}), 401
-        user_id = payload.get('sub')
-        try:
-            user = User.query.get(int(user_id))
-        except Exception:
-            user = None
+        user = get_auth_user(payload)
         if not user:
             return jsonify({'error': 'User not found'}), 401
 
-        # Check expiry: if expired, auto-deactivate and deny access
-        if _check_and_handle_expiry(user):
+        # Expired accounts are denied here; the background sweep flips is_active
+        if _is_expired(user):
             return jsonify({'error': 'Account expired. Contact admin.'}), 403
 
         if not user.is_active:
@@ -362,16 +816,12 @@ def admin_required(f):
             return jsonify({'error': 'Invalid or expired token'}), 401
         if payload.get('role') != 'admin':
             return jsonify({'error': 'Admin access required'}), 403
-        user_id = payload.get('sub')
-        try:
-            user = User.query.get(int(user_id))
-        except Exception:
-            user = None
+        user = get_auth_user(payload)
         if not user or not user.is_admin:
             return jsonify({'error': 'Admin not found'}), 403
 
         # Check expiry for admin too (optional; can remove if admins shouldn't expire)
-        if _check_and_handle_expiry(user):
+        if _is_expired(user):
             return jsonify({'error': 'Admin account expired'}), 403
 
         g.current_user = user
@@ -379,6 +829,62 @@ def admin_required(f):
     return wrapper
 
 
+# ---------------- DATA VERSION / ETAGS ----------------
+def bump_data_version(user_id=None):
+    """
+    Mark a user's data as changed (user_id=None: every user). Runs in the caller's
+    transaction so the new version becomes visible together with the change.
+    """
+    now = datetime.utcnow()
+    if user_id is None:
+        db.session.execute(text("UPDATE user_data_versions SET version = version + 1, updated_at = :now"),
+                           {'now': now})
+        return
+    db.session.execute(text("""
+        INSERT INTO user_data_versions (user_id, version, updated_at) VALUES (:user_id, 1, :now)
+        ON CONFLICT(user_id) DO UPDATE SET version = version + 1, updated_at = :now
+    """), {'user_id': user_id, 'now': now})
+
+
+def get_data_version(user_id):
+    row = db.session.execute(text("SELECT version FROM user_data_versions WHERE user_id = :user_id"),
+                             {'user_id': user_id}).first()
+    return row[0] if row else 0
+
+
+def etag_cached(f):
+    """
+    Conditional GET for read endpoints (use below @jwt_required). The ETag is the
+    user's data version plus a hash of the request (path, query, body, Accept), so a
+    matching If-None-Match is answered with 304 before any documents query runs.
+    POST is accepted for reads that carry their filter in the body (/api/selected_rows).
+    """
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        version = get_data_version(g.current_user.id)
+        digest = hashlib.sha1()
+        digest.update(request.full_path.encode('utf-8'))
+        digest.update(request.get_data() or b'')
+        digest.update(request.headers.get('Accept', '').encode('utf-8'))
+        etag = f'{g.current_user.id}-{version}-{digest.hexdigest()[:16]}'
+
+        not_modified = request.if_none_match.contains_weak(etag)
+        metrics.cache_result('etag', not_modified)
+        if not_modified:
+            db.session.rollback()
+            resp = app.response_class(status=304)
+            resp.set_etag(etag, weak=True)
+            resp.headers['Cache-Control'] = 'private, no-cache'
+            return resp
+
+        resp = app.make_response(f(*args, **kwargs))
+        if resp.status_code == 200:
+            resp.set_etag(etag, weak=True)
+            resp.headers['Cache-Control'] = 'private, no-cache'
+        return resp
+    return wrapper
+
+
 @app.route('/login', methods=['POST'])
 def login():
     data = request.get_json(force=True)
@@ -391,8 +897,8 @@ def login():
     if not user:
         return jsonify({'error': 'Invalid credentials'}), 401
 
-    # If user has expiry_date and it's passed, auto-deactivate and deny login
-    if _check_and_handle_expiry(user):
+    # If user has expiry_date and it's passed, deny login (sweep deactivates)
+    if _is_expired(user):
         return jsonify({'error': 'User account expired. Contact admin.'}), 403
 
     # check active status
@@ -521,6 +1027,7 @@ def admin_set_status():
         return jsonify({'error': 'Cannot change your own status'}), 400
     u.is_active = bool(status)
     db.session.commit()
+    invalidate_user_cache(u.id)
     return jsonify({'message': 'ok', 'user': u.as_dict()}), 200
 
 
@@ -571,6 +1078,7 @@ def admin_set_expiry():
             u.is_active = True
 
     db.session.commit()
+    invalidate_user_cache(u.id)
     return jsonify({'message': 'expiry updated', 'user': u.as_dict()}), 200
 
 @app.route("/admin/update_user", methods=["POST"])
@@ -614,6 +1122,7 @@ def admin_update_user():
         user.password_hash = hashed
 
     db.session.commit()
+    invalidate_user_cache(user.id)
 
     return jsonify({
         "message": "User updated successfully",
@@ -650,10 +1159,249 @@ def admin_delete_user():
 
     db.session.delete(user)
     db.session.commit()
+    invalidate_user_cache(int(user_id))
+    # uploads, documents and selections are in the user's own database file
+    purge_user_data(int(user_id))
 
     return jsonify({"message": "User deleted successfully"}), 200
 
 
+# ---------------- Admin: background jobs ----------------
+@app.route('/admin/jobs', methods=['GET'])
+@admin_required
+def admin_list_jobs():
+    return jsonify({'jobs': job_status()}), 200
+
+
+@app.route('/admin/jobs/<name>/run', methods=['POST'])
+@admin_required
+def admin_run_job(name):
+    try:
+        result = run_job(app, name, force=True)
+    except KeyError:
+        return jsonify({'error': 'Unknown job'}), 404
+    if result is None:
+        return jsonify({'message': 'Job is already running in another worker'}), 409
+    return jsonify({'message': 'ok', 'result': result}), 200
+
+
+# ---------------- Admin: slow query log ----------------
+@app.route('/admin/slow_queries', methods=['GET'])
+@admin_required
+def admin_slow_queries():
+    try:
+        limit = int(request.args.get('limit', 50))
+    except ValueError:
+        return jsonify({'error': 'limit must be a number'}), 400
+    return jsonify({
+        'threshold_ms': slow_queries.SLOW_QUERY_MS,
+        'queries': slow_queries.recent(limit)
+    }), 200
+
+
+@app.route('/admin/slow_queries', methods=['DELETE'])
+@admin_required
+def admin_clear_slow_queries():
+    slow_queries.clear()
+    return jsonify({'message': 'cleared'}), 200
+
+
+# ---------------- Admin: request profiles ----------------
+@app.route('/admin/profiles', methods=['GET'])
+@admin_required
+def admin_list_profiles():
+    return jsonify({'profiles': profiling.list_profiles()}), 200
+
+
+@app.route('/admin/profiles/<profile_id>', methods=['GET'])
+@admin_required
+def admin_get_profile(profile_id):
+    profile = profiling.load(profile_id)
+    if not profile:
+        return jsonify({'error': 'Profile not found'}), 404
+    return jsonify(profile), 200
+
+
+# ---------------- Admin: database maintenance ----------------
+@app.route('/admin/maintenance', methods=['GET'])
+@admin_required
+def admin_maintenance_status():
+    job = next((j for j in job_status() if j['name'] == 'maintenance'), None)
+    with db.engine.connect() as conn:
+        current = database_stats(conn)
+    tenants = tenant_ids()
+    tenant_bytes = sum(os.path.getsize(tenant_db_path(uid)) for uid in tenants)
+    return jsonify({'last_run': job, 'database': current, 'in_window': in_maintenance_window(),
+                    'tenants': {'databases': len(tenants), 'bytes': tenant_bytes}}), 200
+
+
+@app.route('/admin/maintenance/run', methods=['POST'])
+@admin_required
+def admin_run_maintenance():
+    """
+    Body (optional): { enable_incremental_vacuum: true } to switch the database to
+    auto_vacuum=incremental (runs one full VACUUM, so best done off-peak).
+    """
+    data = request.get_json(silent=True) or {}
+    result = run_job(app, 'maintenance', force=True,
+                     enable_incremental_vacuum=bool(data.get('enable_incremental_vacuum')))
+    if result is None:
+        return jsonify({'message': 'Maintenance is already running in another worker'}), 409
+    return jsonify({'message': 'ok', 'result': result}), 200
+
+
+@app.cli.command('db-maintenance')
+@click.option('--enable-incremental-vacuum', is_flag=True, help='Switch to auto_vacuum=incremental (full VACUUM).')
+def db_maintenance_command(enable_incremental_vacuum):
+    """Run ANALYZE / FTS merge / incremental vacuum now."""
+    print(run_job(app, 'maintenance', force=True, enable_incremental_vacuum=enable_incremental_vacuum))
+
+
+# ---------------- Admin: translation dictionary ----------------
+def _refresh_translated_rows(kind, source):
+    """
+    Recompute the derived English columns for documents affected by one dictionary
+    entry, in every user's database. The dictionary change must be committed first:
+    each tenant is committed (and the session closed) on its own.
+    """
+    invalidate_translation_cache()
+    docname_map, sro_map = get_translation_maps()
+
+    def refresh(user_id):
+        if kind == 'docname':
+            target = docname_map.get(source, source)
+            result = db.session.execute(tenant_text("UPDATE documents SET docname_en = :target WHERE docname = :source"),
+                                        {'target': target, 'source': source})
+            return result.rowcount
+
+        rows = db.session.execute(tenant_text("SELECT id, sroname FROM documents WHERE sroname LIKE :pat"),
+                                  {'pat': f"%{source}%"}).fetchall()
+        updates = [{'id': r[0], 'code': derive_english_fields({'sroname': r[1]}, docname_map, sro_map)['sro_code_en']}
+                   for r in rows]
+        if updates:
+            db.session.execute(tenant_text("UPDATE documents SET sro_code_en = :code WHERE id = :id"), updates)
+        return len(updates)
+
+    db.session.commit()
+    return sum(for_each_tenant(refresh).values())
+
+
+@app.route('/admin/translations', methods=['GET'])
+@admin_required
+def admin_list_translations():
+    rows = Translation.query.order_by(Translation.kind, Translation.source).all()
+    return jsonify({'translations': [t.as_dict() for t in rows]}), 200
+
+
+@app.route('/admin/translations', methods=['POST'])
+@admin_required
+def admin_save_translation():
+    """
+    Body: { kind: "docname" | "sro", source: <Marathi text>, target: <English text> }
+    Creates or updates the entry and re-derives the affected documents.
+    """
+    data = request.get_json(force=True)
+    kind = (data.get('kind') or '').strip()
+    source = (data.get('source') or '').strip()
+    target = (data.get('target') or '').strip()
+
+    if kind not in ('docname', 'sro'):
+        return jsonify({'error': 'kind must be docname or sro'}), 400
+    if not source or not target:
+        return jsonify({'error': 'source and target required'}), 400
+
+    t = Translation.query.filter_by(kind=kind, source=source).first()
+    if t:
+        t.target = target
+    else:
+        t = Translation(kind=kind, source=source, target=target)
+        db.session.add(t)
+    db.session.commit()
+    saved = t.as_dict()
+
+    updated = _refresh_translated_rows(kind, source)
+    if updated:
+        bump_data_version()
+        db.session.commit()
+    return jsonify({'message': 'saved', 'translation': saved, 'documents_updated': updated}), 200
+
+
+@app.route('/admin/translations/<int:tid>', methods=['DELETE'])
+@admin_required
+def admin_delete_translation(tid):
+    t = Translation.query.get(tid)
+    if not t:
+        return jsonify({'error': 'Translation not found'}), 404
+    kind, source = t.kind, t.source
+    db.session.delete(t)
+    db.session.commit()
+
+    updated = _refresh_translated_rows(kind, source)
+    if updated:
+        bump_data_version()
+        db.session.commit()
+    return jsonify({'message': 'deleted', 'documents_updated': updated}), 200
+
+
+
+# ---------------- Admin: upload header aliases ----------------
+@app.route('/admin/header_aliases', methods=['GET'])
+@admin_required
+def admin_list_header_aliases():
+    rows = HeaderAlias.query.order_by(HeaderAlias.field, HeaderAlias.alias).all()
+    return jsonify({'aliases': [a.as_dict() for a in rows], 'builtin': COLUMN_MAP, 'fields': DOCUMENT_FIELDS}), 200
+
+
+@app.route('/admin/header_aliases', methods=['POST'])
+@admin_required
+def admin_save_header_alias():
+    """
+    Body: { alias: <header text as it appears in files>, field: <one of fields> }
+    Applies to uploads in every worker within HEADER_CACHE_TTL seconds.
+    """
+    data = request.get_json(force=True)
+    alias = normalize_colname(data.get('alias') or '')
+    field = (data.get('field') or '').strip()
+    if not alias:
+        return jsonify({'error': 'alias required'}), 400
+    if field not in DOCUMENT_FIELDS:
+        return jsonify({'error': f"field must be one of {', '.join(DOCUMENT_FIELDS)}"}), 400
+
+    a = HeaderAlias.query.filter_by(alias=alias).first()
+    if a:
+        a.field = field
+    else:
+        a = HeaderAlias(alias=alias, field=field)
+        db.session.add(a)
+    invalidate_header_layouts()
+    db.session.commit()
+    return jsonify({'message': 'saved', 'alias': a.as_dict()}), 200
+
+
+@app.route('/admin/header_aliases/<int:aid>', methods=['DELETE'])
+@admin_required
+def admin_delete_header_alias(aid):
+    a = HeaderAlias.query.get(aid)
+    if not a:
+        return jsonify({'error': 'Alias not found'}), 404
+    db.session.delete(a)
+    invalidate_header_layouts()
+    db.session.commit()
+    return jsonify({'message': 'deleted'}), 200
+
+
+@app.route('/admin/header_layouts', methods=['GET'])
+@admin_required
+def admin_list_header_layouts():
+    """Header layouts seen in uploads, newest first, with the columns that did not map."""
+    try:
+        limit = int(request.args.get('limit', 50))
+    except ValueError:
+        return jsonify({'error': 'limit must be a number'}), 400
+    limit = max(1, min(limit, LAYOUT_LIST_MAX_LIMIT))
+    rows = HeaderLayout.query.order_by(HeaderLayout.created_at.desc()).limit(limit).all()
+    return jsonify({'layouts': [l.as_dict() for l in rows]}), 200
+
 
 # ---------------- PROFILE (protected) ----------------
 @app.route('/profile', methods=['GET'])
@@ -674,7 +1422,7 @@ def get_profile():
 @app.route('/profile/update', methods=['PUT'])
 @jwt_required
 def update_profile():
-    user = g.current_user
+    user = User.query.get(g.current_user.id)
     data = request.json
 
     new_name = data.get("name")
@@ -714,17 +1462,23 @@ def update_profile():
         return jsonify({"message": "No changes made"}), 200
 
     db.session.commit()
+    invalidate_user_cache(user.id)
     return jsonify({"message": "Profile updated successfully"}), 200
 
 # ---------------- API: fetch selected rows (by ids) ----------------
 @app.route('/api/selected_rows', methods=['POST'])
 @jwt_required
+@etag_cached
 def api_selected_rows():
     payload = request.get_json(force=True)
     ids = payload.get('ids', []) or []
 
     user_id = g.current_user.id
 
+    mode = stream_mode(request.args, request.headers)
+    if mode:
+        return _stream_selected_rows(user_id, ids, mode)
+
     # Fetch selected entries (only this user's)
     if not ids:
         sel_rows = SelectedEntry.query.filter_by(user_id=user_id).order_by(SelectedEntry.created_at.desc()).all()
@@ -748,7 +1502,7 @@ def api_selected_rows():
     # Fetch document rows that belong to this user
     placeholders, params = build_in_params(doc_ids, prefix="id")
     params['user_id'] = user_id
-    sql = text(f"""
+    sql = tenant_text(f"""
         SELECT id, table_name, docno, docname, registrationdate, sroname,
                sellername, purchasername, propertydescription, areaname,
                consideration_amt, dateofexecution
@@ -791,6 +1545,60 @@ def api_selected_rows():
     })
 
 
+def _stream_selected_rows(user_id, ids, mode):
+    """
+    Streaming variant of /api/selected_rows: one JOIN over selected_entries and
+    documents, ordered by table_name so groups can be written as they complete.
+    NDJSON lines are flat rows carrying their table_name.
+    """
+    params = {'user_id': user_id}
+    id_filter = ""
+    if ids:
+        try:
+            int_ids = [int(i) for i in ids]
+        except Exception:
+            return jsonify({'error': 'Invalid ids'}), 400
+        placeholders, id_params = build_in_params(int_ids, prefix="id")
+        params.update(id_params)
+        id_filter = f" AND s.document_id IN ({placeholders})"
+
+    sql = tenant_text(f"""
+        SELECT s.id, d.id, d.table_name, d.docno, d.docname, d.registrationdate, d.sroname,
+               d.sellername, d.purchasername, d.propertydescription, d.areaname,
+               d.consideration_amt, d.dateofexecution
+        FROM selected_entries s
+        JOIN documents d ON d.id = s.document_id AND d.user_id = s.user_id
+        WHERE s.user_id = :user_id{id_filter}
+        ORDER BY d.table_name, d.id DESC
+    """)
+
+    def to_dict(r):
+        return {
+            "sel_id": r[0],
+            "document_id": r[1],
+            "table_name": r[2],
+            "docno": r[3],
+            "docname": r[4],
+            "registrationdate": r[5],
+            "sroname": r[6],
+            "sellerparty": r[7],
+            "purchaserparty": r[8],
+            "propertydescription": r[9],
+            "areaname": r[10],
+            "consideration_amt": r[11],
+            "dateofexecution": r[12]
+        }
+
+    rows = iter_result_batches(db.session.execute(sql, params), to_dict)
+    if mode == 'ndjson':
+        return streamed_response(ndjson_stream(rows), 'application/x-ndjson')
+    return streamed_response(
+        grouped_json_stream('groups', rows, lambda row: row['table_name'],
+                            lambda t: {'table_name': t, 'chip_label': t}),
+        'application/json'
+    )
+
+
 # ---------------- API: save selected entries (persist) ----------------
 @app.route('/api/save_selected', methods=['POST'])
 @jwt_required
@@ -837,6 +1645,8 @@ def api_save_selected():
         db.session.add(se)
         added += 1
 
+    if added:
+        bump_data_version(user_id)
     db.session.commit()
 
     return jsonify({
@@ -864,6 +1674,7 @@ def api_remove_selected():
         return jsonify({'error': 'Not found or not yours'}), 404
 
     db.session.delete(se)
+    bump_data_version(se.user_id)
     db.session.commit()
     return jsonify({'deleted': sid})
 
@@ -889,11 +1700,21 @@ def api_remove_selected_group():
         SelectedEntry.document_id.in_(doc_ids)
     ).delete(synchronize_session=False)
 
+    if deleted_count:
+        bump_data_version(user_id)
     db.session.commit()
 
     return jsonify({'deleted': deleted_count})
 
 
+def upload_table_folder(table_name):
+    # folder per table per user (avoid collisions)
+    user_folder = os.path.join(app.config['UPLOAD_FOLDER'], str(g.current_user.id))
+    table_folder = os.path.join(user_folder, table_name)
+    os.makedirs(table_folder, exist_ok=True)
+    return table_folder
+
+
 @app.route('/upload', methods=['POST'])
 @jwt_required
 def upload_files():
@@ -903,107 +1724,31 @@ def upload_files():
     if not table_name:
         return jsonify({"status": "error", "message": "Table name is required"}), 400
 
-    # folder per table per user (avoid collisions)
-    user_folder = os.path.join(app.config['UPLOAD_FOLDER'], str(g.current_user.id))
-    table_folder = os.path.join(user_folder, table_name)
-    os.makedirs(table_folder, exist_ok=True)
+    table_folder = upload_table_folder(table_name)
 
     if not files:
         return jsonify({'status': 'error', 'message': 'No files uploaded'}), 400
 
     created_files = []
-
-    def safe_float(v):
-        try:
-            if v is None or v == "" or str(v).strip() == "":
-                return None
-            return float(str(v).replace(",", "").strip())
-        except:
-            return None
+    docname_map, sro_map = get_translation_maps()
+    # the central read transaction must not stay open while files are parsed
+    db.session.commit()
 
     for file in files:
         if not allowed_file(file.filename):
             continue
 
+        fpath = None
         try:
-            original_name = secure_filename(file.filename)
-            fname = original_name
-            fpath = os.path.join(table_folder, fname)
-
-            # make unique name
-            base, ext = os.path.splitext(fpath)
-            i = 1
-            while os.path.exists(fpath):
-                fname = f"{os.path.splitext(original_name)[0]}_{i}{ext}"
-                fpath = os.path.join(table_folder, fname)
-                i += 1
-
-            file.save(fpath)
-            filesize = os.path.getsize(fpath)
-
-            # save Upload record (include user_id)
-            uf = UploadedFile(
-                user_id=g.current_user.id,
-                filename=fname,
-                filepath=fpath,
-                filesize=filesize,
-                table_name=table_name
-            )
-            db.session.add(uf)
-            db.session.flush()
-
-            rows = extract_rows_from_excel(fpath)
-            print(f"Parsed {len(rows)} rows from {fname}")
+            fpath = unique_path(table_folder, secure_filename(file.filename))
+            fname = os.path.basename(fpath)
+            _, sha256 = save_upload(file.stream, fpath)
 
-            for r in rows:
-                doc = Document(
-                    user_id=g.current_user.id,
-                    file_id=uf.id,
-                    table_name=table_name,  # ✅ FIX ADDED
-
-                    sr_code=str(r.get('sr_code')).strip() if r.get('sr_code') else None,
-                    internal_document_number=str(r.get('internal_document_number')).strip() if r.get('internal_document_number') else None,
-
-                    docno=str(r.get('docno')).strip() if r.get('docno') else None,
-                    docname=str(r.get('docname')).strip() if r.get('docname') else None,
-
-                    registrationdate=r.get('registrationdate'),
-                    dateofexecution=r.get('dateofexecution'),
-
-                    purchasername=str(r.get('purchasername')).strip() if r.get('purchasername') else None,
-                    sellername=str(r.get('sellername')).strip() if r.get('sellername') else None,
-
-                    propertydescription=str(r.get('propertydescription')).strip() if r.get('propertydescription') else None,
-                    areaname=str(r.get('areaname')).strip() if r.get('areaname') else None,
-                    sroname=str(r.get('sroname')).strip() if r.get('sroname') else None,
-
-                    consideration_amt=safe_float(r.get('consideration_amt')),
-                    marketvalue=safe_float(r.get('marketvalue')),
-
-                    raw_json=r.get('raw_json')
-                )
-
-                db.session.add(doc)
-                db.session.flush()
-
-                # FTS insert (docid numeric stored as string previously)
-                try:
-                    db.session.execute(text("""
-                        INSERT INTO documents_fts(
-                            docid, purchasername, sellername, propertydescription, docname, docno
-                        ) VALUES (:docid, :purchasername, :sellername, :propertydescription, :docname, :docno)
-                    """), {
-                        'docid': str(doc.id),
-                        'purchasername': doc.purchasername or '',
-                        'sellername': doc.sellername or '',
-                        'propertydescription': doc.propertydescription or '',
-                        'docname': doc.docname or '',
-                        'docno': doc.docno or ''
-                    })
-                except Exception as e:
-                    # FTS may not be available or may fail for this DB; skip silently (logged)
-                    print("FTS skipped:", e)
+            # parse into a staging file, then one short write transaction (see ingest.py)
+            uf, _ = ingest_file(g.current_user.id, table_name, fname, fpath, sha256, docname_map, sro_map,
+                                header_resolver())
 
+            bump_data_version(g.current_user.id)
             db.session.commit()
 
             created_files.append({
@@ -1014,36 +1759,188 @@ def upload_files():
 
         except Exception as e:
             db.session.rollback()
+            if fpath and os.path.exists(fpath):
+                os.remove(fpath)
             return jsonify({'status': 'error', 'message': str(e)}), 500
 
     return jsonify({'status': 'success', 'uploaded': created_files}), 201
 
-## ---------------- SEARCH (protected) ----------------
-@app.route('/search', methods=['GET'])
+
+@app.route('/upload/preview', methods=['POST'])
 @jwt_required
-def search():
-    q = request.args.get('q', '').strip()
-    purchaser = request.args.get('purchaser', '').strip()
-    seller = request.args.get('seller', '').strip()
-    docname = request.args.get('docname', '').strip()
-    docno = request.args.get('docno', '').strip()
-    propdesc = request.args.get('propertydescription', '').strip()
-    reg_date = request.args.get('registrationdate', '').strip()
-    exact = request.args.get('exact', '0') == '1'
-    table_name = request.args.get("table_name", "").strip()
+def upload_preview():
+    """
+    Multipart 'files' (one or more) + optional form/query 'rows' (default PREVIEW_ROWS).
+    Nothing is stored: returns per file the detected columns, which DB field each
+    maps to, unmapped headers, fields not found, and the first rows as they would
+    be saved. Only the start of each file is read; for HTML .xls and .csv files
+    the client may send just a leading slice of a large file.
+    """
+    files = request.files.getlist('files')
+    if not files:
+        return jsonify({'error': 'No files uploaded'}), 400
+    try:
+        limit = int(request.values.get('rows', PREVIEW_ROWS))
+    except ValueError:
+        return jsonify({'error': 'rows must be an integer'}), 400
 
-    page = int(request.args.get('page', 1))
-    per_page = int(request.args.get('per_page', 300))
-    offset = (page - 1) * per_page
+    docname_map, sro_map = get_translation_maps()
+    previews = []
+    for file in files:
+        if not allowed_file(file.filename):
+            previews.append({'filename': file.filename, 'error': 'Only .xls, .xlsx or .csv files are accepted'})
+            continue
+        try:
+            preview = preview_file(file.stream, file.filename, limit, header_resolver())
+        except Exception as e:
+            previews.append({'filename': file.filename, 'error': f'Could not read file: {e}'})
+            continue
+        records = preview.pop('records')
+        preview['rows'] = [{k: v for k, v in document_values(r, docname_map, sro_map).items() if k != 'raw_json'}
+                           for r in records]
+        previews.append({'filename': file.filename, **preview})
 
-    user_id = g.current_user.id
+    return jsonify({'previews': previews}), 200
 
-    base_query = """
-        SELECT d.id, d.docno, d.docname, d.registrationdate, d.sroname,
-               d.sellername, d.purchasername, d.propertydescription,
-               d.areaname, d.consideration_amt
-        FROM documents d
+
+# ---------------- RESUMABLE UPLOADS (protected, see resumable.py) ----------------
+def _resumable_error(e):
+    return jsonify({'error': str(e), **e.extra}), e.status
+
+
+@app.route('/upload/resumable', methods=['POST'])
+@jwt_required
+def upload_resumable_init():
+    """
+    Body: { filename, table_name, size: <total bytes>, sha256: <optional hex digest> }
+    Then PUT each chunk to /upload/resumable/<upload_id>?offset=<byte offset>
+    (raw body, at most chunk_max bytes) and POST .../complete when done.
+    """
+    data = request.get_json(force=True)
+    filename = (data.get('filename') or '').strip()
+    table_name = (data.get('table_name') or '').strip()
+    if not table_name:
+        return jsonify({'error': 'Table name is required'}), 400
+    if not allowed_file(filename):
+        return jsonify({'error': 'Only .xls, .xlsx or .csv files are accepted'}), 400
+    try:
+        size = int(data.get('size') or 0)
+        session = resumable.create(app.config['UPLOAD_FOLDER'], g.current_user.id, filename, table_name,
+                                   size, data.get('sha256'))
+    except ValueError:
+        return jsonify({'error': 'size must be an integer'}), 400
+    except resumable.UploadError as e:
+        return _resumable_error(e)
+    session['chunk_max'] = resumable.CHUNK_MAX_BYTES
+    return jsonify(session), 201
+
+
+@app.route('/upload/resumable/<upload_id>', methods=['GET'])
+@jwt_required
+def upload_resumable_status(upload_id):
+    """Where to resume: the number of bytes received so far."""
+    try:
+        return jsonify(resumable.load(app.config['UPLOAD_FOLDER'], g.current_user.id, upload_id)), 200
+    except resumable.UploadError as e:
+        return _resumable_error(e)
+
+
+@app.route('/upload/resumable/<upload_id>', methods=['PUT'])
+@jwt_required
+def upload_resumable_chunk(upload_id):
+    try:
+        offset = int(request.args.get('offset', ''))
+    except ValueError:
+        return jsonify({'error': 'offset query parameter required'}), 400
+    try:
+        # request.stream is read straight into the .part file, never buffered whole
+        new_offset = resumable.write_chunk(app.config['UPLOAD_FOLDER'], g.current_user.id, upload_id,
+                                           offset, request.stream, request.content_length)
+    except resumable.UploadError as e:
+        return _resumable_error(e)
+    return jsonify({'upload_id': upload_id, 'offset': new_offset}), 200
+
+
+@app.route('/upload/resumable/<upload_id>/complete', methods=['POST'])
+@jwt_required
+def upload_resumable_complete(upload_id):
+    folder = app.config['UPLOAD_FOLDER']
+    try:
+        meta = resumable.load(folder, g.current_user.id, upload_id)
+        fpath = unique_path(upload_table_folder(meta['table_name']), secure_filename(meta['filename']))
+        meta, sha256 = resumable.finish(folder, g.current_user.id, upload_id, fpath)
+    except resumable.UploadError as e:
+        return _resumable_error(e)
+
+    docname_map, sro_map = get_translation_maps()
+    db.session.commit()
+    try:
+        uf, rows = ingest_file(g.current_user.id, meta['table_name'], os.path.basename(fpath), fpath, sha256,
+                               docname_map, sro_map, header_resolver())
+        bump_data_version(g.current_user.id)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        # keep the assembled file: the client retries complete instead of re-sending it
+        if os.path.exists(fpath):
+            resumable.reopen(folder, g.current_user.id, upload_id, fpath)
+        return jsonify({'status': 'error', 'message': str(e), 'upload_id': upload_id, 'retry': True}), 500
+
+    resumable.close(folder, g.current_user.id, upload_id)
+
+    return jsonify({'status': 'success', 'uploaded': [{
+        'file_id': uf.id,
+        'filename': uf.filename,
+        'table_name': meta['table_name'],
+        'rows': rows,
+        'sha256': sha256
+    }]}), 201
+
+
+@app.route('/upload/resumable/<upload_id>', methods=['DELETE'])
+@jwt_required
+def upload_resumable_abort(upload_id):
+    try:
+        resumable.load(app.config['UPLOAD_FOLDER'], g.current_user.id, upload_id)
+    except resumable.UploadError as e:
+        return _resumable_error(e)
+    resumable.discard(app.config['UPLOAD_FOLDER'], g.current_user.id, upload_id)
+    return jsonify({'message': 'Upload discarded'}), 200
+
+## ---------------- SEARCH (protected) ----------------
+# ?sort= values → column; each has (user_id[, table_name], column) indexes
+SEARCH_SORTS = {
+    'consideration_amt': 'd.consideration_amt',
+    'marketvalue': 'd.marketvalue',
+    'registrationdate': 'd.registrationdate',
+}
+# ?<param>=amount → inclusive bound; amounts may be written like the files (12,34,567 / 50 लाख)
+SEARCH_RANGES = {
+    'consideration_min': ('consideration_amt', '>='),
+    'consideration_max': ('consideration_amt', '<='),
+    'marketvalue_min': ('marketvalue', '>='),
+    'marketvalue_max': ('marketvalue', '<='),
+}
+
+
+def build_search_filters(args, user_id):
+    """
+    Build the WHERE clauses + bind params shared by /search and /export/search
+    from the request args. Everything is scoped to the given user.
+    Raises ValueError for an unreadable amount bound, fuzzy name or property number.
     """
+    q = args.get('q', '').strip()
+    purchaser = args.get('purchaser', '').strip()
+    seller = args.get('seller', '').strip()
+    docname = args.get('docname', '').strip()
+    docname_en = args.get('docname_en', '').strip()
+    reg_year = args.get('reg_year', '').strip()
+    docno = args.get('docno', '').strip()
+    propdesc = args.get('propertydescription', '').strip()
+    reg_date = args.get('registrationdate', '').strip()
+    exact = args.get('exact', '0') == '1'
+    fuzzy = args.get('fuzzy', '0') == '1'
+    table_name = args.get("table_name", "").strip()
 
     where_clauses, params = ["d.user_id = :user_id"], {"user_id": user_id}
 
@@ -1071,11 +1968,31 @@ def search():
             where_clauses.append(f"d.{field} LIKE :{param}")
             params[param] = f"%{value}%"
 
-    add_filter('purchasername', purchaser, 'purchaser')
-    add_filter('sellername', seller, 'seller')
+    if fuzzy:
+        # ?fuzzy=1: party names by sound / transliteration via party_keys (see parties.py);
+        # fuzzy_rank lists the matched ids closest first for /search to order by
+        distances = {}
+        for role, value in (('purchaser', purchaser), ('seller', seller)):
+            if not value:
+                continue
+            try:
+                matches = fuzzy_party_matches(db.session, user_id, value, role)
+            except ValueError as e:
+                raise ValueError(f"{role}: {e}")
+            where_clauses.append(f"d.id IN (SELECT value FROM json_each(:{role}_ids))")
+            params[f'{role}_ids'] = json.dumps(list(matches))
+            for doc_id, d in matches.items():
+                distances[doc_id] = distances.get(doc_id, 0) + d
+        if distances:
+            params['fuzzy_rank'] = ',' + ','.join(str(i) for i in sorted(distances, key=distances.get)) + ','
+    else:
+        add_filter('purchasername', purchaser, 'purchaser')
+        add_filter('sellername', seller, 'seller')
     add_filter('docname', docname, 'docname_param')
+    add_filter('docname_en', docname_en, 'docname_en_param')
     add_filter('docno', docno, 'docno_param')
     add_filter('propertydescription', propdesc, 'prop_param')
+    add_filter('sroname', args.get('sroname', '').strip(), 'sroname_param')
 
     if reg_date:
         if exact:
@@ -1085,30 +2002,125 @@ def search():
             where_clauses.append("d.registrationdate LIKE :reg_date_like")
             params['reg_date_like'] = f"%{reg_date}%"
 
+    if reg_year:
+        where_clauses.append("d.reg_year = :reg_year")
+        params['reg_year'] = reg_year
+
+    # ?survey= / gat= / cts= / flat= / plot=: numbers extracted at ingestion into
+    # property_refs (see extractor.py), one (kind, number) index lookup each.
+    # Without exact=1 a number also matches its subdivisions: survey=12 finds 12/3/1.
+    for kind in PROPERTY_KINDS:
+        value = args.get(kind, '').strip()
+        if not value:
+            continue
+        number = parse_property_number(value)
+        if number is None:
+            raise ValueError(f"{kind} must be a property number, e.g. 12/3")
+        match = f"number = :{kind}_no"
+        if not exact:
+            # '/' is the only character a stored number can continue with that sorts
+            # below '0', so this one index range is the number and all its "…/…"
+            match = f"number >= :{kind}_no AND number < :{kind}_no || '0'"
+        where_clauses.append(f"d.id IN (SELECT document_id FROM property_refs "
+                             f"WHERE user_id = :user_id AND kind = '{kind}' AND {match})")
+        params[f'{kind}_no'] = number
+
+    for param, (field, op) in SEARCH_RANGES.items():
+        value = args.get(param, '').strip()
+        if not value:
+            continue
+        amount = parse_amounts([value])[0]
+        if amount is None:
+            raise ValueError(f"{param} must be an amount")
+        where_clauses.append(f"d.{field} {op} :{param}")
+        params[param] = amount
+
+    return where_clauses, params
+
+
+@app.route('/search', methods=['GET'])
+@jwt_required
+@etag_cached
+def search():
+    page = int(request.args.get('page', 1))
+    per_page = int(request.args.get('per_page', 300))
+    offset = (page - 1) * per_page
+
+    user_id = g.current_user.id
+
+    # ?sort=consideration_amt|marketvalue|registrationdate&order=desc|asc (default: newest upload first)
+    sort = request.args.get('sort', '').strip()
+    order = request.args.get('order', 'desc').strip().lower()
+    if sort and sort not in SEARCH_SORTS:
+        return jsonify({'error': f"sort must be one of {', '.join(SEARCH_SORTS)}"}), 400
+    if order not in ('asc', 'desc'):
+        return jsonify({'error': 'order must be asc or desc'}), 400
+    # id as tie-breaker keeps pages stable; the indexes end in rowid, so no sort step
+    order_by = f"{SEARCH_SORTS[sort]} {order.upper()}, d.id {order.upper()}" if sort else "d.id DESC"
+
+    base_query = """
+        SELECT d.id, d.docno, d.docname, d.registrationdate, d.sroname,
+               d.sellername, d.purchasername, d.propertydescription,
+               d.areaname, d.consideration_amt, d.marketvalue
+        FROM documents d
+    """
+
+    try:
+        where_clauses, params = build_search_filters(request.args, user_id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
     final_where = " WHERE " + " AND ".join(where_clauses) if where_clauses else ""
     params.update({'limit': per_page, 'offset': offset})
+    if 'fuzzy_rank' in params and not sort:
+        # fuzzy name search: closest matches first
+        order_by = "instr(:fuzzy_rank, ',' || d.id || ','), d.id DESC"
 
-    total_stmt = text(f"SELECT COUNT(*) FROM documents d {final_where}")
-    total = db.session.execute(total_stmt, params).scalar()
-
-    data_stmt = text(
+    total_stmt = tenant_text(f"SELECT COUNT(*) FROM documents d {final_where}")
+    data_stmt = tenant_text(
         base_query + final_where +
-        " ORDER BY d.id DESC LIMIT :limit OFFSET :offset"
+        f" ORDER BY {order_by} LIMIT :limit OFFSET :offset"
     )
-    rows = db.session.execute(data_stmt, params).fetchall()
 
-    results = [{
-        'id': r[0],
-        'docno': r[1],
-        'docname': r[2],
-        'registrationdate': r[3],
-        'sroname': r[4],
-        'sellerparty': r[5],
-        'purchaserparty': r[6],
-        'propertydescription': r[7],
-        'areaname': r[8],
-        'consideration_amt': r[9]
-    } for r in rows]
+    def to_dict(r):
+        return {
+            'id': r[0],
+            'docno': r[1],
+            'docname': r[2],
+            'registrationdate': r[3],
+            'sroname': r[4],
+            'sellerparty': r[5],
+            'purchaserparty': r[6],
+            'propertydescription': r[7],
+            'areaname': r[8],
+            'consideration_amt': r[9],
+            'marketvalue': r[10]
+        }
+
+    # ?stream=ndjson|json: send rows as they come off the cursor, total at the end
+    mode = stream_mode(request.args, request.headers)
+    if mode:
+        def page_meta():
+            return {
+                'total': db.session.execute(total_stmt, params).scalar(),
+                'page': page,
+                'per_page': per_page
+            }
+
+        def rows():
+            return iter_result_batches(db.session.execute(data_stmt, params), to_dict)
+
+        if mode == 'ndjson':
+            return streamed_response(ndjson_stream(rows(), meta=page_meta), 'application/x-ndjson')
+        return streamed_response(
+            json_array_stream({'page': page, 'per_page': per_page}, 'results', rows(),
+                              suffix=lambda: {'total': page_meta()['total']}),
+            'application/json'
+        )
+
+    total = db.session.execute(total_stmt, params).scalar()
+    rows = db.session.execute(data_stmt, params).fetchall()
+    results = [to_dict(r) for r in rows]
 
     return jsonify({
         'results': results,
@@ -1119,9 +2131,10 @@ def search():
 
 @app.route('/tables', methods=['GET'])
 @jwt_required
+@etag_cached
 def list_tables():
     # Only list tables uploaded by this user
-    sql = text("""
+    sql = tenant_text("""
         SELECT DISTINCT table_name 
         FROM uploaded_files
         WHERE user_id = :user_id
@@ -1132,6 +2145,50 @@ def list_tables():
 
     return jsonify({"tables": tables})
 
+
+# ---------------- PARTY NAME TYPEAHEAD (protected, see parties.py) ----------------
+@app.route('/parties/suggest', methods=['GET'])
+@jwt_required
+@etag_cached
+def suggest_parties():
+    # ?q=<prefix>&role=purchaser|seller&limit=10 → names starting with q, most documents first
+    role = request.args.get('role', '').strip() or None
+    if role and role not in PARTY_ROLES:
+        return jsonify({'error': f"role must be one of {', '.join(PARTY_ROLES)}"}), 400
+    try:
+        limit = int(request.args.get('limit', SUGGEST_LIMIT))
+    except ValueError:
+        return jsonify({'error': 'limit must be a number'}), 400
+
+    suggestions = suggest_party_names(db.session, g.current_user.id, request.args.get('q', ''), role, limit)
+    return jsonify({'suggestions': suggestions})
+
+
+# ---------------- CHAIN OF TITLE (protected, see chain.py) ----------------
+@app.route('/chain', methods=['GET'])
+@jwt_required
+@etag_cached
+def chain_of_title():
+    """
+    ?party=<name>[&depth=]                 → transfers to / from a party, followed both ways
+    ?kind=survey&number=12/3[&area=<गाव>]  → every transfer of one property, oldest first
+    truncated: {'up', 'down'} flags for a party walk, a flag for a property.
+    """
+    user_id = g.current_user.id
+    party = request.args.get('party', '').strip()
+    kind = request.args.get('kind', '').strip().lower()
+    try:
+        if party:
+            result = party_chain(db.session, user_id, party, int(request.args.get('depth', CHAIN_MAX_DEPTH)))
+        elif kind:
+            result = property_chain(db.session, user_id, kind, request.args.get('number', '').strip(),
+                                    request.args.get('area', '').strip() or None)
+        else:
+            return jsonify({'error': 'party or kind + number required'}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(result)
+
 # ---------------- EXPORT & EMAIL (protected) ----------------
 @app.route('/export/selected/excel', methods=['POST'])
 @jwt_required
@@ -1145,54 +2202,21 @@ def export_selected_excel():
     # Ensure ownership
     docs = Document.query.filter(Document.id.in_(ids), Document.user_id == g.current_user.id).all()
 
+    from openpyxl import Workbook
+
     wb = Workbook()
     ws = wb.active
-    ws.append(["ID", "Doc No", "Doc Name", "Purchaser", "Seller", "Reg Date", "Area", "Consideration"])
+    ws.append(["ID", "Doc No", "Doc Name", "Doc Name (English)", "SRO Code", "Year",
+               "Purchaser", "Seller", "Reg Date", "Area", "Consideration"])
 
     for d in docs:
         ws.append([
-            d.id, d.docno, d.docname, d.purchasername, d.sellername,
-            d.registrationdate, d.areaname, d.consideration_amt
+            d.id, d.docno, d.docname, d.docname_en, d.sro_code_en, d.reg_year,
+            d.purchasername, d.sellername, d.registrationdate, d.areaname, d.consideration_amt
         ])
 
     stream = BytesIO()
     wb.save(stream)
-    docx = Document()
-
-    for d in docs:
-
-        # --- English doc name ---
-        eng_docname = DOCNAME_MAP.get(d.docname.strip(), d.docname)
-
-        # --- Extract year ---
-        year = ""
-        if d.registrationdate:
-            try:
-                year = d.registrationdate.split("-")[0]
-            except:
-                year = ""
-
-        # --- Extract SRO code (Marathi → English Short code) ---
-        # Example: "हवेली 23" → "HVL 23"
-        sro_eng = ""
-        if d.sroname:
-            if "हवेली" in d.sroname:
-                num = ''.join([c for c in d.sroname if c.isdigit()])
-                sro_eng = f"HVL {num}"
-
-        # --- Title Format ---
-        title = f"{year} – {eng_docname} dated {d.registrationdate} (Reg. No {sro_eng} {d.docno}/{year})"
-
-        # Add title
-        p = docx.add_paragraph(title)
-        p.alignment = WD_ALIGN_PARAGRAPH.LEFT
-        run = p.runs[0]
-        run.bold = True
-        run.font.size = Pt(13)
-
-        # --- 3 column table ---
-        table = docx.add_table(rows=1, cols=3)
-        table.autofit = True
     stream.seek(0)
 
     return send_file(
@@ -1221,40 +2245,13 @@ def export_selected_word():
     if not docs:
         return jsonify({"error": "No matching documents"}), 400
 
-    DOCNAME_MAP = {
-        "कंफर्मेशन डीड": "Conformation Deed",
-        "करारनामा": " Agreement",
-        "गहाणखत": "Mortgage Deed",
-        "अ‍ॅफिडेव्हिट": "Affidavit",
-        "पॉवर ऑफ अटर्नी": "Power of Attorney",
-        "डेव्हलपमेंट अ‍ॅग्रीमेंट": "Development Agreement",
-        "असाइनमेंट डीड": "Assignment Deed",
-        "कमन्समेंट सर्टिफिकेट": "Commencement Certificate",
-        "कम्प्लिशन सर्टिफिकेट": "Completion Certificate",
-        "रिलीज डीड": "Release Deed",
-        "सोसायटी रजिस्ट्रेशन": "Society Registration",
-        "ऑक्युपन्सी सर्टिफिकेट": "Part Occupancy Certificate",
-        "नियमितीकरण प्रमाणपत्र": "Regularization Certificate",
-        "ना आदेश": "NA Order"
-    }
-
     docx = WordDoc()
 
     for d in docs:
-        eng_docname = DOCNAME_MAP.get(d.docname.strip(), d.docname)
-
-        year = ""
-        if d.registrationdate:
-            try:
-                year = d.registrationdate.split("-")[0]
-            except:
-                year = ""
-
-        sro_eng = ""
-        if d.sroname:
-            if "हवेली" in d.sroname:
-                num = ''.join([c for c in d.sroname if c.isdigit()])
-                sro_eng = f"HVL {num}"
+        # English fields are precomputed at ingestion (see derive_english_fields)
+        eng_docname = d.docname_en or d.docname or ""
+        year = d.reg_year or ""
+        sro_eng = d.sro_code_en or ""
 
         title = f"{year} – {eng_docname} dated {d.registrationdate} (Reg. No {sro_eng}/ {d.docno}/{year})"
 
@@ -1285,8 +2282,65 @@ def export_selected_word():
         mimetype="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
     )
 
+# ---------------- EXPORT: full search result set (streamed) ----------------
+@app.route('/export/search', methods=['GET'])
+@jwt_required
+def export_search():
+    """
+    Same filters as /search, but exports every matching row instead of one page.
+    ?format=csv (default) streams the file; ?format=parquet spools row groups to
+    a temp file. Rows are read with keyset pagination (id < last id), one batch
+    at a time, so the full result set is never held in memory.
+    """
+    fmt = request.args.get('format', 'csv').strip().lower()
+    if fmt not in ('csv', 'parquet'):
+        return jsonify({'error': 'format must be csv or parquet'}), 400
+
+    user_id = g.current_user.id
+    try:
+        where_clauses, params = build_search_filters(request.args, user_id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    columns = ", ".join(f"d.{c}" for c in EXPORT_COLUMNS)
+
+    def fetch_batch(after_id, limit):
+        clauses = list(where_clauses)
+        batch_params = dict(params, limit=limit)
+        if after_id is not None:
+            clauses.append("d.id < :after_id")
+            batch_params['after_id'] = after_id
+        sql = tenant_text(
+            f"SELECT {columns} FROM documents d WHERE " + " AND ".join(clauses) +
+            " ORDER BY d.id DESC LIMIT :limit"
+        )
+        rows = db.session.execute(sql, batch_params).fetchall()
+        # end the read transaction between batches so writers are not blocked
+        db.session.rollback()
+        return rows
+
+    stamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
+
+    if fmt == 'parquet':
+        try:
+            out = write_parquet(iter_batches(fetch_batch))
+        except RuntimeError as e:
+            return jsonify({'error': str(e)}), 501
+        return send_file(
+            out,
+            download_name=f"search_export_{stamp}.parquet",
+            as_attachment=True,
+            mimetype="application/vnd.apache.parquet"
+        )
+
+    return Response(
+        stream_with_context(stream_csv(iter_batches(fetch_batch))),
+        mimetype="text/csv",
+        headers={'Content-Disposition': f'attachment; filename="search_export_{stamp}.csv"'}
+    )
+
 # ---------------- RUN ----------------
 if __name__ == '__main__':
     os.makedirs(UPLOAD_FOLDER, exist_ok=True)    
-    start_cleanup_thread() 
+    init_database()
+    start_background_jobs()
     app.run(debug=True)
@@ -0,0 +1,118 @@
+"""
+Cold-start timing: what a fresh process (a gunicorn worker) pays before it
+can answer, measured in new interpreters against a throwaway database.
+
+    cd Backend
+    python -m benchmarks.coldstart --runs 5
+
+Reports schema bootstrap time (init_database, run once per deploy), app
+import time, which heavy libraries the import pulled in, time to the first
+/search response, and how long gunicorn takes until it answers.
+"""
+import argparse
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+from time import perf_counter
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.run import git_commit
+from benchmarks.loadtest import start_gunicorn
+
+HEAVY_MODULES = ['pandas', 'openpyxl', 'docx', 'bs4', 'xlrd', 'pyarrow', 'numpy']
+
+BOOTSTRAP_SCRIPT = """
+import json, sys
+from time import perf_counter
+sys.path.insert(0, {backend!r})
+import app
+start = perf_counter()
+app.init_database()
+json.dump({{'seconds': perf_counter() - start}}, open({out!r}, 'w'))
+"""
+
+PROBE_SCRIPT = """
+import json, sys
+from time import perf_counter
+sys.path.insert(0, {backend!r})
+start = perf_counter()
+import app
+imported = perf_counter() - start
+heavy = [m for m in {heavy!r} if m in sys.modules]
+with app.app.app_context():
+    token = app.create_token(app.User.query.filter_by(email=app.DEFAULT_USER_EMAIL).first())
+client = app.app.test_client()
+start = perf_counter()
+resp = client.get('/search', headers={{'Authorization': 'Bearer ' + token}})
+first = perf_counter() - start
+json.dump({{'import_seconds': imported, 'first_request_seconds': first, 'status': resp.status_code,
+           'heavy_modules': heavy, 'modules': len(sys.modules)}}, open({out!r}, 'w'))
+"""
+
+
+def run_script(script, workdir, **fields):
+    # results go through a file: the app's own prints (scheduler thread) share stdout
+    out = os.path.join(workdir, 'probe.json')
+    env = dict(os.environ, METRICS_DIR=os.path.join(workdir, 'metrics'))
+    subprocess.run([sys.executable, '-c', script.format(backend=BACKEND_DIR, out=out, **fields)],
+                   cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    with open(out) as f:
+        return json.load(f)
+
+
+def summary(values):
+    return {'mean': round(statistics.mean(values), 4), 'min': round(min(values), 4), 'max': round(max(values), 4)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Adoodle cold-start timing")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=3)
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--no-gunicorn', action='store_true')
+    parser.add_argument('--out')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='adoodle_cold_')
+    bootstrap = [run_script(BOOTSTRAP_SCRIPT, workdir)['seconds'] for _ in range(2)]
+    probes = [run_script(PROBE_SCRIPT, workdir, heavy=HEAVY_MODULES) for _ in range(args.runs)]
+
+    results = {
+        'meta': {'commit': git_commit(), 'at': datetime.utcnow().isoformat(),
+                 'python': sys.version.split()[0], 'runs': args.runs},
+        'bootstrap': {'first_seconds': round(bootstrap[0], 4), 'repeat_seconds': round(bootstrap[1], 4)},
+        'import_seconds': summary([p['import_seconds'] for p in probes]),
+        'first_request_seconds': summary([p['first_request_seconds'] for p in probes]),
+        'first_request_status': probes[-1]['status'],
+        'heavy_modules_after_import': probes[-1]['heavy_modules'],
+        'modules_after_first_request': probes[-1]['modules'],
+    }
+
+    if not args.no_gunicorn:
+        start = perf_counter()
+        proc = start_gunicorn(workdir, args.port, args.workers, threads=1, preload=False)
+        results['gunicorn_ready_seconds'] = round(perf_counter() - start, 4)
+        results['gunicorn_workers'] = args.workers
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(timeout=30)
+
+    out = os.path.abspath(args.out) if args.out else os.path.join(
+        BACKEND_DIR, 'benchmarks', 'results',
+        f"cold-{git_commit() or 'nogit'}-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.json")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"Results written to {out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,230 @@
+"""
+Synthetic IGR registration data in the shapes the uploader sees:
+UTF-16 HTML-as-XLS (government export), real .xls, .xlsx and .csv.
+
+    python -m benchmarks.datagen --rows 100000 --formats html,xlsx --out /tmp/adoodle_data
+
+Output is deterministic for a given --seed. Writing real .xls needs xlwt
+(benchmark-only dependency, not in requirements.txt).
+"""
+import argparse
+import csv
+import html
+import os
+import random
+from datetime import date, timedelta
+
+# Header spellings as they appear in the exports (all resolve through COLUMN_MAP)
+HEADERS = [
+    "DocNo", "DocName", "RegistrationDate", "DateOfExecution", "SROCode", "SROName",
+    "SellerParty", "PurchaserParty", "PropertyDescription", "AreaName",
+    "Consideration_Amt", "MarketValue", "InternalDocumentNumber",
+]
+
+FIRST_NAMES = [
+    "राजेश", "सुनील", "अनिल", "प्रकाश", "संजय", "विजय", "महेश", "सचिन", "गणेश", "दत्तात्रय",
+    "सुरेश", "रमेश", "अशोक", "नितीन", "प्रशांत", "ज्ञानेश्वर", "बाळासाहेब", "शंकर", "विठ्ठल", "अमोल",
+    "स्वाती", "सुनिता", "मीना", "अर्चना", "वैशाली", "कविता", "रेखा", "माधुरी", "प्रिया", "शुभांगी",
+]
+SURNAMES = [
+    "पाटील", "जाधव", "कुलकर्णी", "देशमुख", "पवार", "शिंदे", "जोशी", "गायकवाड", "चव्हाण", "भोसले",
+    "काळे", "मोरे", "साळुंखे", "कदम", "देशपांडे", "गोखले", "आपटे", "वाघ", "लोखंडे", "थोरात",
+    "घोरपडे", "निंबाळकर", "बर्वे", "खैरे", "टिळेकर", "ढमाले", "कामठे", "हगवणे",
+]
+COMPANIES = [
+    "मे. श्री गणेश बिल्डर्स अँड डेव्हलपर्स", "मे. साई प्रॉपर्टीज", "मे. सिद्धिविनायक कन्स्ट्रक्शन्स",
+    "मे. ओम लँडमार्क्स एलएलपी", "मे. मंगलमूर्ती प्रमोटर्स", "मे. श्रीराम इन्फ्रा",
+]
+DOCNAMES = [
+    "करारनामा", "खरेदीखत", "गहाणखत", "अ‍ॅफिडेव्हिट", "पॉवर ऑफ अटर्नी", "डेव्हलपमेंट अ‍ॅग्रीमेंट",
+    "असाइनमेंट डीड", "रिलीज डीड", "कंफर्मेशन डीड", "बक्षीसपत्र", "भाडेपट्टा", "ना आदेश",
+]
+DOCNAME_WEIGHTS = [30, 25, 12, 6, 6, 4, 3, 4, 2, 4, 3, 1]
+SROS = [
+    ("सह दु.नि. हवेली 23", "HVL23"), ("सह दु.नि. हवेली 11", "HVL11"), ("सह दु.नि. हवेली 3", "HVL3"),
+    ("सह दु.नि. पुणे शहर 4", "PUN4"), ("दु.नि. मावळ", "MVL1"), ("सह दु.नि. मुळशी", "MLS1"),
+]
+AREAS = [
+    "धायरी", "कोथरूड", "वडगाव बुद्रुक", "हडपसर", "बाणेर", "वाघोली", "मांजरी बुद्रुक", "नऱ्हे",
+    "आंबेगाव बुद्रुक", "कात्रज", "उंड्री", "पिसोळी", "लोहगाव", "बावधन", "हिंजवडी", "तळेगाव दाभाडे",
+]
+BUILDINGS = [
+    "साई रेसिडेन्सी", "गणेश पार्क", "श्री समर्थ अपार्टमेंट", "सिद्धिविनायक हाईट्स", "ओम शांती सोसायटी",
+    "मंगलमूर्ती कॉम्प्लेक्स", "पार्क व्ह्यू", "गोकुळधाम",
+]
+ROADS = ["सिंहगड रोड", "पौड रोड", "सोलापूर रोड", "नगर रोड", "बाणेर रोड", "कात्रज-कोंढवा रोड"]
+MUNICIPALITIES = ["पुणे म.न.पा.", "पिंपरी चिंचवड म.न.पा.", "ग्रामपंचायत"]
+FORMATS = ("html", "xls", "xlsx", "csv")
+EXTENSIONS = {"html": ".xls", "xls": ".xls", "xlsx": ".xlsx", "csv": ".csv"}
+
+XLS_SHEET_ROWS = 65535        # .xls sheet limit minus the header row
+XLSX_SHEET_ROWS = 1000000
+
+
+def person(rnd):
+    first, father, surname = rnd.choice(FIRST_NAMES), rnd.choice(FIRST_NAMES), rnd.choice(SURNAMES)
+    return f"{first} {father} {surname}"
+
+
+def party(rnd, company_share=0.0):
+    count = rnd.choices([1, 2, 3], weights=[70, 22, 8])[0]
+    parts = []
+    for i in range(count):
+        name = rnd.choice(COMPANIES) if i == 0 and rnd.random() < company_share else person(rnd)
+        parts.append(f"{i + 1}): नाव:-{name} वय:-{rnd.randint(22, 80)} पत्ता:-{rnd.choice(AREAS)}, पुणे "
+                     f"पिन कोड:-4110{rnd.randint(10, 62)}")
+    return " ".join(parts)
+
+
+def property_description(rnd):
+    muni = rnd.choice(MUNICIPALITIES)
+    kind = rnd.random()
+    if kind < 0.55:
+        unit = f"सदनिका नं: {rnd.randint(1, 20)}0{rnd.randint(1, 8)}, माळा नं: {rnd.randint(1, 20)} वा मजला, " \
+               f"इमारतीचे नाव: {rnd.choice(BUILDINGS)}"
+    elif kind < 0.8:
+        unit = f"प्लॉट नं. {rnd.randint(1, 250)}"
+    else:
+        unit = f"शेतजमीन गट नं. {rnd.randint(1, 1500)}"
+    survey = f"सर्वे नं. {rnd.randint(1, 300)}/{rnd.randint(1, 9)}"
+    if rnd.random() < 0.4:
+        survey += f"/{rnd.randint(1, 9)}"
+    extra = f", सि.स.नं. {rnd.randint(100, 5000)}" if rnd.random() < 0.3 else ""
+    area = round(rnd.uniform(30, 450), 2)
+    return (f"1) पालिकेचे नाव:{muni} इतर वर्णन :{unit}, रोड : {rnd.choice(ROADS)}, "
+            f"इतर माहिती: {survey}{extra}( ( क्षेत्रफळ: {area} चौ. मीटर ) )")
+
+
+def rupees(rnd, amount):
+    """Amounts as they show up in exports: plain, lakh-grouped or blank."""
+    style = rnd.random()
+    if style < 0.6:
+        return str(amount)
+    if style < 0.95:
+        s = str(amount)
+        head, tail = s[:-3], s[-3:]
+        groups = []
+        while len(head) > 2:
+            groups.insert(0, head[-2:])
+            head = head[:-2]
+        if head:
+            groups.insert(0, head)
+        return ",".join(groups + [tail]) if groups else tail
+    return ""
+
+
+def generate_rows(count, seed=0):
+    """Yield `count` rows as lists in HEADERS order."""
+    rnd = random.Random(seed)
+    start = date(2018, 1, 1)
+    docnos = {code: rnd.randint(1000, 5000) for _, code in SROS}
+    for _ in range(count):
+        sroname, srocode = rnd.choice(SROS)
+        docnos[srocode] += 1
+        reg = start + timedelta(days=rnd.randint(0, 365 * 7))
+        execution = reg - timedelta(days=rnd.randint(0, 30))
+        market = rnd.randrange(500000, 25000000, 1000)
+        consideration = max(0, market + rnd.randrange(-300000, 2000000, 1000))
+        docname = rnd.choices(DOCNAMES, weights=DOCNAME_WEIGHTS)[0]
+        yield [
+            str(docnos[srocode]),
+            docname,
+            reg.strftime("%d/%m/%Y"),
+            execution.strftime("%d/%m/%Y"),
+            srocode,
+            sroname,
+            party(rnd, company_share=0.3),
+            party(rnd),
+            property_description(rnd),
+            rnd.choice(AREAS),
+            rupees(rnd, consideration),
+            rupees(rnd, market),
+            f"{rnd.randint(1, 99)}{rnd.randint(10 ** 7, 10 ** 8 - 1)}",
+        ]
+
+
+# =========================================================
+# WRITERS (streamed, so 1M rows do not need 1M rows in memory)
+# =========================================================
+def write_html_xls(path, rows):
+    # UTF-16 with BOM and the table right at the start, like the IGR download
+    with open(path, "w", encoding="utf-16") as f:
+        f.write("<table border=1><tr>" + "".join(f"<th>{h}</th>" for h in HEADERS) + "</tr>\n")
+        for row in rows:
+            f.write("<tr>" + "".join(f"<td>{html.escape(v)}</td>" for v in row) + "</tr>\n")
+        f.write("</table>")
+
+
+def write_xls(path, rows):
+    try:
+        import xlwt
+    except ImportError:
+        raise RuntimeError("Writing .xls needs xlwt (pip install xlwt)")
+
+    book = xlwt.Workbook(encoding="utf-8")
+    sheets, r = 0, XLS_SHEET_ROWS + 1
+    for row in rows:
+        if r > XLS_SHEET_ROWS:
+            sheets += 1
+            sheet = book.add_sheet(f"Sheet{sheets}")
+            for c, h in enumerate(HEADERS):
+                sheet.write(0, c, h)
+            r = 1
+        for c, v in enumerate(row):
+            sheet.write(r, c, v)
+        r += 1
+    book.save(path)
+
+
+def write_xlsx(path, rows):
+    from openpyxl import Workbook
+
+    book = Workbook(write_only=True)
+    sheet, r = None, XLSX_SHEET_ROWS + 1
+    for row in rows:
+        if r > XLSX_SHEET_ROWS:
+            sheet = book.create_sheet()
+            sheet.append(HEADERS)
+            r = 1
+        sheet.append(row)
+        r += 1
+    book.save(path)
+
+
+def write_csv(path, rows):
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADERS)
+        writer.writerows(rows)
+
+
+WRITERS = {"html": write_html_xls, "xls": write_xls, "xlsx": write_xlsx, "csv": write_csv}
+
+
+def write_file(fmt, folder, count, seed=0):
+    """Write `count` rows in format `fmt` into folder; returns the file path."""
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"igr_{fmt}_{count}{EXTENSIONS[fmt]}")
+    WRITERS[fmt](path, generate_rows(count, seed))
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic registration files")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--formats", default=",".join(FORMATS))
+    parser.add_argument("--out", default="bench_data")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for fmt in args.formats.split(","):
+        try:
+            path = write_file(fmt, args.out, args.rows, args.seed)
+        except RuntimeError as e:
+            print(f"{fmt}: skipped ({e})")
+            continue
+        print(f"{fmt}: {path} ({os.path.getsize(path)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,389 @@
+"""
+Load test: replay a read/write mix against a locally started gunicorn.
+
+    cd Backend
+    python -m benchmarks.loadtest --readers 8 --writers 2 --duration 60
+    python -m benchmarks.loadtest --url http://127.0.0.1:8000 --mix search=10,upload=1
+
+Readers log in and page through /search, save/remove selections and export;
+writers upload batches of files into the same SQLite database. Reports
+p50/p95/p99 latency and throughput per endpoint plus, from the server's
+/metrics, SQLite lock contention: statements that failed with "database
+is locked" after the busy timeout, and how long write transactions held
+the write lock (count / total / mean per operation), which is what the
+other writers wait behind. Time spent inside the busy handler itself is
+not visible from Python's sqlite3. Standard library only, no network
+beyond localhost.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import uuid
+from datetime import datetime
+from http.client import HTTPConnection
+from time import monotonic, perf_counter, sleep
+from urllib.parse import urlencode, urlsplit
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks import datagen
+from benchmarks.run import git_commit
+
+ADMIN_EMAIL = os.environ.get('SUPER_ADMIN_EMAIL', 'admin@example.com')
+ADMIN_PW = os.environ.get('SUPER_ADMIN_PW', 'admin123')
+
+READER_MIX = {'search': 20, 'search_filtered': 10, 'save_selected': 3, 'remove_selected': 2,
+              'export': 1, 'login': 1}
+WRITER_MIX = {'upload': 1}
+SEARCH_FILTERS = [{'q': 'पाटील'}, {'purchaser': 'सुनील'}, {'docname': 'करारनामा'}, {'reg_year': '2021'},
+                  {'seller': 'बिल्डर्स'}, {'docname_en': 'Agreement'}]
+LOCK_RE = re.compile(r'^adoodle_sql_errors_total\{kind="locked"\} (\S+)$', re.M)
+WRITE_LOCK_RE = re.compile(r'^adoodle_write_lock_seconds_(sum|count)\{op="([^"]*)"\} (\S+)$', re.M)
+
+
+# =========================================================
+# HTTP (one keep-alive connection per virtual user)
+# =========================================================
+class Client:
+    def __init__(self, base_url, recorder):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.conn = HTTPConnection(self.host, self.port, timeout=300)
+        self.recorder = recorder
+        self.token = None
+
+    def request(self, name, method, path, body=None, headers=None, record=True):
+        headers = dict(headers or {})
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        start = perf_counter()
+        try:
+            self.conn.request(method, path, body=body, headers=headers)
+            resp = self.conn.getresponse()
+            data = resp.read()
+            status = resp.status
+        except (OSError, ValueError) as e:
+            self.conn.close()
+            self.conn = HTTPConnection(self.host, self.port, timeout=300)
+            data, status = str(e).encode(), 0
+        if record:
+            self.recorder.add(name, perf_counter() - start, status, data)
+        return status, data
+
+    def json(self, *args, **kwargs):
+        status, data = self.request(*args, **kwargs)
+        try:
+            return status, json.loads(data)
+        except ValueError:
+            return status, None
+
+
+def multipart(fields, files):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for k, v in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{k}"\r\n\r\n{v}\r\n'.encode())
+    for k, (filename, content) in files:
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{k}"; filename="{filename}"\r\n'
+                     f'Content-Type: application/octet-stream\r\n\r\n'.encode() + content + b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+# =========================================================
+# RESULTS
+# =========================================================
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {}
+
+    def add(self, name, seconds, status, body):
+        locked = status >= 500 and b'database is locked' in body
+        with self.lock:
+            s = self.samples.setdefault(name, {'latency': [], 'errors': 0, 'locked': 0, 'statuses': {}})
+            s['latency'].append(seconds)
+            s['statuses'][status] = s['statuses'].get(status, 0) + 1
+            if status == 0 or status >= 400:
+                s['errors'] += 1
+            if locked:
+                s['locked'] += 1
+
+    def report(self, elapsed):
+        out = {}
+        for name, s in sorted(self.samples.items()):
+            lat = sorted(s['latency'])
+
+            def pct(p):
+                return round(lat[min(len(lat) - 1, int(p / 100 * len(lat)))] * 1000, 2)
+            out[name] = {
+                'requests': len(lat),
+                'throughput_rps': round(len(lat) / elapsed, 2),
+                'p50_ms': pct(50), 'p95_ms': pct(95), 'p99_ms': pct(99),
+                'max_ms': round(lat[-1] * 1000, 2),
+                'errors': s['errors'],
+                'locked_errors': s['locked'],
+                'statuses': {str(k): v for k, v in s['statuses'].items()},
+            }
+        return out
+
+
+# =========================================================
+# VIRTUAL USERS
+# =========================================================
+class VirtualUser(threading.Thread):
+    def __init__(self, base_url, recorder, email, password, mix, deadline, upload_files, seed):
+        super().__init__(daemon=True)
+        self.client = Client(base_url, recorder)
+        self.email, self.password = email, password
+        self.ops, self.weights = list(mix), list(mix.values())
+        self.deadline = deadline
+        self.upload_files = upload_files
+        self.rnd = random.Random(seed)
+        self.doc_ids, self.sel_ids = [], []
+
+    def login(self):
+        self.client.token = None
+        status, body = self.client.json('login', 'POST', '/login', {'email': self.email, 'password': self.password})
+        if status == 200:
+            self.client.token = body['token']
+
+    def search(self, filters=None):
+        args = {'page': self.rnd.randint(1, 10), 'per_page': 50, **(filters or {})}
+        status, body = self.client.json('search_filtered' if filters else 'search', 'GET',
+                                        '/search?' + urlencode(args))
+        if status == 200 and body and body.get('results'):
+            self.doc_ids = [r['id'] for r in body['results']]
+
+    def save_selected(self):
+        if not self.doc_ids:
+            return self.search()
+        ids = self.rnd.sample(self.doc_ids, min(20, len(self.doc_ids)))
+        self.client.request('save_selected', 'POST', '/api/save_selected', {'entries': [{'id': i} for i in ids]})
+        status, body = self.client.json('selected_rows', 'POST', '/api/selected_rows', {})
+        if status == 200 and body:
+            self.sel_ids = [r['sel_id'] for g in body['groups'] for r in g['rows']]
+
+    def remove_selected(self):
+        if not self.sel_ids:
+            return self.save_selected()
+        sid = self.sel_ids.pop(self.rnd.randrange(len(self.sel_ids)))
+        self.client.request('remove_selected', 'POST', '/api/remove_selected', {'id': sid})
+
+    def export(self):
+        self.client.request('export', 'GET', '/export/search?' + urlencode(
+            {'format': 'csv', **self.rnd.choice(SEARCH_FILTERS)}))
+
+    def upload(self):
+        body, ctype = multipart({'table_name': f'load_{self.rnd.randint(1, 5)}'},
+                                [('files', f) for f in self.upload_files])
+        self.client.request('upload', 'POST', '/upload', body, {'Content-Type': ctype})
+
+    def run(self):
+        self.login()
+        while monotonic() < self.deadline:
+            op = self.rnd.choices(self.ops, weights=self.weights)[0]
+            if op == 'search_filtered':
+                self.search(self.rnd.choice(SEARCH_FILTERS))
+            else:
+                getattr(self, op)()
+
+
+# =========================================================
+# SERVER
+# =========================================================
+def start_gunicorn(workdir, port, workers, threads, preload=True):
+    env = dict(os.environ, METRICS_DIR=os.path.join(workdir, 'metrics'))
+    cmd = [sys.executable, '-m', 'gunicorn', 'app:app', '--pythonpath', BACKEND_DIR,
+           '--config', os.path.join(BACKEND_DIR, 'gunicorn.conf.py'),
+           '--bind', f'127.0.0.1:{port}', '--workers', str(workers), '--threads', str(threads),
+           '--timeout', '600'] + (['--preload'] if preload else [])
+    log = open(os.path.join(workdir, 'gunicorn.log'), 'wb')
+    # cwd = workdir: app.py keeps Adoodle.db and uploads/ in the working directory
+    proc = subprocess.Popen(cmd, cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    deadline = monotonic() + 60
+    while monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"gunicorn exited, see {log.name}")
+        try:
+            conn = HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/metrics')
+            conn.getresponse().read()
+            return proc
+        except OSError:
+            sleep(0.3)
+    proc.kill()
+    raise RuntimeError("gunicorn did not come up within 60s")
+
+
+def lock_stats(client):
+    """Server-side lock counters: (locked errors, {op: [write transactions, seconds holding the lock]})."""
+    status, data = client.request('metrics', 'GET', '/metrics', record=False)
+    text = data.decode(errors='ignore') if status == 200 else ''
+    m = LOCK_RE.search(text)
+    held = {}
+    for part, op, value in WRITE_LOCK_RE.findall(text):
+        held.setdefault(op, [0.0, 0.0])[0 if part == 'count' else 1] = float(value)
+    return (float(m.group(1)) if m else 0.0), held
+
+
+def lock_report(before, after, recorder):
+    (errors_before, held_before), (errors_after, held_after) = before, after
+    held = {}
+    for op, (count, seconds) in held_after.items():
+        count -= held_before.get(op, [0, 0])[0]
+        seconds -= held_before.get(op, [0, 0])[1]
+        if count:
+            held[op] = {'transactions': int(count), 'seconds': round(seconds, 3),
+                        'mean_ms': round(seconds / count * 1000, 2)}
+    return {
+        # statements that gave up with "database is locked" after the busy timeout
+        'sql_locked_errors': errors_after - errors_before,
+        'requests_failed_locked': sum(s['locked'] for s in recorder.samples.values()),
+        # write-lock hold times: what every other writer queues behind
+        'write_lock_held': held,
+    }
+
+
+def parse_mix(spec, default):
+    if not spec:
+        return default
+    mix = dict(default)
+    for part in spec.split(','):
+        name, _, weight = part.partition('=')
+        mix[name.strip()] = int(weight or 1)
+    return {k: v for k, v in mix.items() if v > 0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Adoodle load test (local gunicorn)")
+    parser.add_argument('--url', help='use an already running server instead of starting gunicorn')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=3)
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--users', type=int, default=4, help='distinct accounts shared by the virtual users')
+    parser.add_argument('--duration', type=int, default=60)
+    parser.add_argument('--seed-rows', type=int, default=5000, help='rows preloaded per account')
+    parser.add_argument('--batch-files', type=int, default=15, help='files per upload request')
+    parser.add_argument('--file-rows', type=int, default=500, help='rows per uploaded file')
+    parser.add_argument('--mix', help='reader mix overrides, e.g. search=10,export=0')
+    parser.add_argument('--writer-mix', help='writer mix overrides, e.g. upload=1,search=1')
+    parser.add_argument('--workdir')
+    parser.add_argument('--out')
+    args = parser.parse_args()
+
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix='adoodle_load_'))
+    os.makedirs(workdir, exist_ok=True)
+    proc = None
+    if not args.url:
+        proc = start_gunicorn(workdir, args.port, args.workers, args.threads)
+    base_url = args.url or f'http://127.0.0.1:{args.port}'
+
+    try:
+        setup = Recorder()
+        admin = Client(base_url, setup)
+        status, body = admin.json('login', 'POST', '/login', {'email': ADMIN_EMAIL, 'password': ADMIN_PW})
+        if status != 200:
+            raise RuntimeError(f"admin login failed ({status}); set SUPER_ADMIN_EMAIL / SUPER_ADMIN_PW")
+        admin.token = body['token']
+
+        data_dir = os.path.join(workdir, 'data')
+        seed_file = datagen.write_file('csv', data_dir, args.seed_rows, seed=1)
+        batch = []
+        for i in range(args.batch_files):
+            path = datagen.write_file('csv', os.path.join(data_dir, f'batch{i}'), args.file_rows, seed=100 + i)
+            with open(path, 'rb') as f:
+                batch.append((f'batch{i}.csv', f.read()))
+
+        accounts = []
+        run_id = uuid.uuid4().hex[:6]
+        for i in range(args.users):
+            email, password = f'load{i}-{run_id}@example.com', 'loadtest123'
+            admin.request('create_user', 'POST', '/admin/create_user',
+                          {'email': email, 'password': password, 'name': f'Load {i}'})
+            user = Client(base_url, setup)
+            status, body = user.json('login', 'POST', '/login', {'email': email, 'password': password})
+            user.token = body['token']
+            with open(seed_file, 'rb') as f:
+                payload, ctype = multipart({'table_name': 'seed'}, [('files', ('seed.csv', f.read()))])
+            status, _ = user.request('upload', 'POST', '/upload', payload, {'Content-Type': ctype})
+            if status != 201:
+                raise RuntimeError(f"seed upload failed ({status})")
+            accounts.append((email, password))
+
+        reader_mix = parse_mix(args.mix, READER_MIX)
+        writer_mix = parse_mix(args.writer_mix, WRITER_MIX)
+        locks_before = lock_stats(admin)
+
+        recorder = Recorder()
+        deadline = monotonic() + args.duration
+        vus = []
+        for i in range(args.readers + args.writers):
+            email, password = accounts[i % len(accounts)]
+            is_writer = i >= args.readers
+            vus.append(VirtualUser(base_url, recorder, email, password,
+                                   writer_mix if is_writer else reader_mix, deadline, batch, seed=i))
+        started = monotonic()
+        for vu in vus:
+            vu.start()
+        for vu in vus:
+            vu.join()
+        elapsed = monotonic() - started
+
+        results = {
+            'meta': {
+                'commit': git_commit(),
+                'at': datetime.utcnow().isoformat(),
+                'url': base_url,
+                'gunicorn': None if args.url else {'workers': args.workers, 'threads': args.threads},
+                'readers': args.readers, 'writers': args.writers, 'accounts': args.users,
+                'duration_seconds': round(elapsed, 2),
+                'reader_mix': reader_mix, 'writer_mix': writer_mix,
+                'upload_batch': {'files': args.batch_files, 'rows_per_file': args.file_rows},
+                'seed_rows': args.seed_rows,
+            },
+            'endpoints': recorder.report(elapsed),
+            'sqlite_locks': lock_report(locks_before, lock_stats(admin), recorder),
+        }
+    finally:
+        if proc:
+            proc.send_signal(signal.SIGTERM)
+            try:
+                proc.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+    out = os.path.abspath(args.out) if args.out else os.path.join(
+        BACKEND_DIR, 'benchmarks', 'results',
+        f"load-{git_commit() or 'nogit'}-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.json")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+
+    print(f"{'endpoint':<18}{'reqs':>7}{'rps':>9}{'p50':>10}{'p95':>10}{'p99':>10}{'errors':>8}")
+    for name, r in results['endpoints'].items():
+        print(f"{name:<18}{r['requests']:>7}{r['throughput_rps']:>9}{r['p50_ms']:>10}{r['p95_ms']:>10}"
+              f"{r['p99_ms']:>10}{r['errors']:>8}")
+    locks = results['sqlite_locks']
+    print(f"locked errors: {locks['sql_locked_errors']:g} server side, {locks['requests_failed_locked']} requests")
+    for op, h in locks['write_lock_held'].items():
+        print(f"write lock held by {op}: {h['transactions']} transactions, {h['seconds']}s total, {h['mean_ms']} ms mean")
+    print(f"Results written to {out} (workdir {workdir})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,262 @@
+"""
+End-to-end benchmark: extraction, ingestion, /search, selections and exports,
+all through the Flask test client against a throwaway database.
+
+    cd Backend
+    python -m benchmarks.run --rows 10000 --formats html,xlsx,csv
+    python -m benchmarks.run --rows 1000000 --formats csv --out results/big.json
+
+Results are written as JSON (with the git commit) so two runs can be diffed.
+"""
+import argparse
+import importlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+from time import perf_counter
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks import datagen
+
+SEARCH_CASES = [
+    ("all", {}),
+    ("page_20", {"page": "20", "per_page": "100"}),
+    ("q_surname", {"q": "पाटील"}),
+    ("purchaser", {"purchaser": "सुनील"}),
+    ("seller_company", {"seller": "बिल्डर्स"}),
+    ("docname", {"docname": "करारनामा"}),
+    ("docname_en", {"docname_en": "Agreement"}),
+    ("reg_year", {"reg_year": "2022"}),
+    ("docno_exact", {"docno": "4105", "exact": "1"}),
+    ("propertydescription", {"propertydescription": "सर्वे नं. 45/"}),
+    ("table_year_q", {"table_name": "{table}", "reg_year": "2021", "q": "हवेली"}),
+    ("stream_ndjson", {"stream": "ndjson", "per_page": "1000"}),
+]
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+    return {
+        'count': len(samples),
+        'mean_ms': round(statistics.mean(samples) * 1000, 3),
+        'p50_ms': round(pct(50) * 1000, 3),
+        'p95_ms': round(pct(95) * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3),
+    }
+
+
+def timed(fn):
+    start = perf_counter()
+    result = fn()
+    return result, perf_counter() - start
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Bench:
+    def __init__(self, workdir, rows, formats, repeats, seed):
+        self.workdir = workdir
+        self.rows = rows
+        self.formats = formats
+        self.repeats = repeats
+        self.seed = seed
+        self.files = {}
+        self.results = {}
+
+    # -------- setup --------
+    def boot_app(self):
+        # app.py puts the DB and uploads under the working directory
+        os.chdir(self.workdir)
+        os.environ.setdefault('METRICS_DIR', os.path.join(self.workdir, 'metrics'))
+        app_module, seconds = timed(lambda: importlib.import_module('app'))
+        app_module.init_database()
+        self.client = app_module.app.test_client()
+
+        with app_module.app.app_context():
+            user = app_module.User(email='bench@example.com', password_hash='-', name='Bench',
+                                   is_admin=False, is_active=True)
+            app_module.db.session.add(user)
+            app_module.db.session.commit()
+            self.headers = {'Authorization': 'Bearer ' + app_module.create_token(user)}
+        self.results['import_seconds'] = round(seconds, 3)
+
+    def generate(self):
+        out = {}
+        for fmt in self.formats:
+            try:
+                path, seconds = timed(lambda: datagen.write_file(fmt, os.path.join(self.workdir, 'data'),
+                                                                 self.rows, self.seed))
+            except RuntimeError as e:
+                print(f"{fmt}: skipped ({e})")
+                continue
+            self.files[fmt] = path
+            out[fmt] = {'bytes': os.path.getsize(path), 'seconds': round(seconds, 3)}
+        self.results['generate'] = out
+
+    # -------- benchmarks --------
+    def extraction(self):
+        from extractor import extract_rows_from_excel
+        out = {}
+        for fmt, path in self.files.items():
+            rows, seconds = timed(lambda: extract_rows_from_excel(path))
+            out[fmt] = {'rows': len(rows), 'seconds': round(seconds, 3),
+                        'rows_per_sec': round(len(rows) / seconds, 1) if seconds else None}
+            del rows
+        self.results['extraction'] = out
+
+    def ingestion(self):
+        out = {}
+        for fmt, path in self.files.items():
+            def upload():
+                with open(path, 'rb') as f:
+                    return self.client.post('/upload', headers=self.headers, data={
+                        'table_name': f'bench_{fmt}',
+                        'files': (f, os.path.basename(path)),
+                    }, content_type='multipart/form-data')
+            resp, seconds = timed(upload)
+            if resp.status_code != 201:
+                raise RuntimeError(f"upload of {fmt} failed: {resp.status_code} {resp.get_data(as_text=True)[:200]}")
+            out[fmt] = {'rows': self.rows, 'seconds': round(seconds, 3),
+                        'rows_per_sec': round(self.rows / seconds, 1) if seconds else None}
+        self.results['ingestion'] = out
+
+    def search(self):
+        table = f"bench_{next(iter(self.files))}"
+        out = {}
+        for name, args in SEARCH_CASES:
+            args = {k: v.format(table=table) for k, v in args.items()}
+            samples, status, total = [], None, None
+            def fetch():
+                # read the body inside the timing so streamed responses count fully
+                resp = self.client.get('/search', headers=self.headers, query_string=args)
+                resp.get_data()
+                return resp
+            for i in range(self.repeats + 1):
+                resp, seconds = timed(fetch)
+                status = resp.status_code
+                if i:
+                    samples.append(seconds)
+                elif resp.is_json:
+                    total = resp.get_json().get('total')
+            out[name] = {'status': status, 'total': total, **percentiles(samples)}
+        self.results['search'] = out
+
+    def selections(self, count=500):
+        first = self.client.get('/search', headers=self.headers, query_string={'per_page': count}).get_json()
+        ids = [r['id'] for r in first['results']]
+        out = {'ids': len(ids)}
+
+        resp, seconds = timed(lambda: self.client.post('/api/save_selected', headers=self.headers,
+                                                       json={'entries': [{'id': i} for i in ids]}))
+        out['save_selected'] = {'status': resp.status_code, 'seconds': round(seconds, 4)}
+
+        samples = []
+        for _ in range(self.repeats):
+            resp, seconds = timed(lambda: self.client.post('/api/selected_rows', headers=self.headers, json={}))
+            samples.append(seconds)
+        out['selected_rows'] = {'status': resp.status_code, **percentiles(samples)}
+
+        groups = resp.get_json()['groups']
+        sel_ids = [r['sel_id'] for g in groups for r in g['rows']][:50]
+        samples = []
+        for sid in sel_ids:
+            resp, seconds = timed(lambda: self.client.post('/api/remove_selected', headers=self.headers,
+                                                           json={'id': sid}))
+            samples.append(seconds)
+        if samples:
+            out['remove_selected'] = {'status': resp.status_code, **percentiles(samples)}
+
+        resp, seconds = timed(lambda: self.client.post('/api/remove_selected_group', headers=self.headers,
+                                                       json={'table_name': groups[0]['table_name']}))
+        out['remove_selected_group'] = {'status': resp.status_code, 'seconds': round(seconds, 4),
+                                        'deleted': resp.get_json().get('deleted')}
+        self.selected_ids = ids
+        self.results['selection'] = out
+
+    def exports(self):
+        out = {}
+        for fmt in ('csv', 'parquet'):
+            def export():
+                resp = self.client.get('/export/search', headers=self.headers, query_string={'format': fmt})
+                return resp, len(resp.get_data())
+            (resp, size), seconds = timed(export)
+            out[f'search_{fmt}'] = {'status': resp.status_code, 'bytes': size, 'seconds': round(seconds, 3)}
+
+        entries = [{'id': i} for i in self.selected_ids]
+        for kind in ('excel', 'word'):
+            def export():
+                resp = self.client.post(f'/export/selected/{kind}', headers=self.headers, json={'entries': entries})
+                return resp, len(resp.get_data())
+            (resp, size), seconds = timed(export)
+            out[f'selected_{kind}'] = {'status': resp.status_code, 'bytes': size, 'rows': len(entries),
+                                       'seconds': round(seconds, 3)}
+        self.results['export'] = out
+
+    def run(self):
+        self.boot_app()
+        self.generate()
+        self.extraction()
+        self.ingestion()
+        self.search()
+        self.selections()
+        self.exports()
+        return {
+            'meta': {
+                'commit': git_commit(),
+                'at': datetime.utcnow().isoformat(),
+                'python': sys.version.split()[0],
+                'platform': platform.platform(),
+                'rows': self.rows,
+                'formats': list(self.files),
+                'repeats': self.repeats,
+                'seed': self.seed,
+            },
+            **self.results,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Adoodle end-to-end benchmark")
+    parser.add_argument("--rows", type=int, default=10000, help="rows per generated file (10k-1M)")
+    parser.add_argument("--formats", default=",".join(datagen.FORMATS))
+    parser.add_argument("--repeats", type=int, default=20, help="timed runs per search / read case")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="where the DB, uploads and data go (default: temp dir)")
+    parser.add_argument("--out", help="result JSON path (default: benchmarks/results/<commit>-<time>.json)")
+    args = parser.parse_args()
+
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="adoodle_bench_"))
+    os.makedirs(workdir, exist_ok=True)
+    out = os.path.abspath(args.out) if args.out else os.path.join(
+        BACKEND_DIR, 'benchmarks', 'results',
+        f"{git_commit() or 'nogit'}-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.json")
+
+    bench = Bench(workdir, args.rows, args.formats.split(","), args.repeats, args.seed)
+    results = bench.run()
+
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+    print(f"Results written to {out} (workdir {workdir})")
+
+
+if __name__ == "__main__":
+    main()
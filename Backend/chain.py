@@ -0,0 +1,219 @@
+import json
+import os
+
+from extractor import extract_property_ids, parse_property_number, PROPERTY_KINDS
+from parties import split_parties, document_parties
+from models import bulk_insert
+from tenants import tenant_text
+from translit import latin_key
+
+# =========================================================
+# CHAIN OF TITLE
+# Built at ingestion, rows keyed by user:
+#   transfer_edges  seller → purchaser for every party pair of a
+#                   document, names as translit.latin_key (so a
+#                   Devanagari and a romanized spelling are one node),
+#                   with the registration date
+#   property_refs   (kind, number) pairs parsed out of
+#                   propertydescription
+# party_chain() walks the edges both ways with a recursive CTE on the
+# (user, seller, regdate) / (user, purchaser, regdate) indexes;
+# property_chain() is one index lookup on (user, kind, number).
+# Neither touches the text columns of documents except to fetch the
+# rows it returns.
+# =========================================================
+CHAIN_MAX_DEPTH = int(os.environ.get('CHAIN_MAX_DEPTH', '6'))
+CHAIN_MAX_DOCUMENTS = int(os.environ.get('CHAIN_MAX_DOCUMENTS', '500'))
+EDGES_PER_DOCUMENT = 100   # a builder selling to many buyers in one deed
+
+_CHAIN_FIELDS = ('id', 'docno', 'docname', 'docname_en', 'registrationdate', 'sroname', 'areaname',
+                 'consideration_amt', 'marketvalue')
+
+
+def _parties(value):
+    """Party text → {latin key: display name}."""
+    out = {}
+    for name in split_parties(value):
+        key = latin_key(name)
+        if key:
+            out.setdefault(key, name)
+    return out
+
+
+def transfer_pairs(parties):
+    """parties.document_parties() → [(seller, purchaser, seller name, purchaser name)] by latin key."""
+    sides = {'seller': {}, 'purchaser': {}}
+    for role, _, name in parties:
+        key = latin_key(name)
+        if key:
+            sides[role].setdefault(key, name)
+    sellers, purchasers = sides['seller'], sides['purchaser']
+    return [(s, p, sellers[s], purchasers[p]) for s in sellers for p in purchasers if s != p][:EDGES_PER_DOCUMENT]
+
+
+EDGE_COLUMNS = ['user_id', 'document_id', 'seller', 'purchaser', 'seller_name', 'purchaser_name', 'regdate']
+PROPERTY_REF_COLUMNS = ['user_id', 'document_id', 'kind', 'number']
+
+
+def chain_rows(user_id, document_id, regdate, pairs, property_ids):
+    """transfer_edges and property_refs rows (EDGE_COLUMNS / PROPERTY_REF_COLUMNS order) of one document."""
+    edges = [[user_id, document_id, s, p, sn, pn, regdate] for s, p, sn, pn in pairs]
+    refs = [[user_id, document_id, kind, number] for kind, number in property_ids]
+    return edges, refs
+
+
+def insert_chain_rows(conn, edges, refs):
+    """Rows from chain_rows(). Caller commits."""
+    bulk_insert(conn, 'transfer_edges', EDGE_COLUMNS, edges)
+    bulk_insert(conn, 'property_refs', PROPERTY_REF_COLUMNS, refs)
+
+
+def rebuild_chain_index(conn, batch_size=5000):
+    """Re-index every document. Returns (edges, property refs)."""
+    conn.execute(tenant_text("DELETE FROM transfer_edges"))
+    conn.execute(tenant_text("DELETE FROM property_refs"))
+    last_id, edge_count, ref_count = 0, 0, 0
+    while True:
+        rows = conn.execute(tenant_text("""
+            SELECT id, user_id, sellername, purchasername, registrationdate, propertydescription FROM documents
+            WHERE id > :last_id ORDER BY id LIMIT :limit
+        """), {'last_id': last_id, 'limit': batch_size}).mappings().fetchall()
+        if not rows:
+            return edge_count, ref_count
+        edges, refs = [], []
+        for r in rows:
+            e, p = chain_rows(r['user_id'], r['id'], r['registrationdate'], transfer_pairs(document_parties(r)),
+                              extract_property_ids(r['propertydescription']))
+            edges.extend(e)
+            refs.extend(p)
+        insert_chain_rows(conn, edges, refs)
+        edge_count, ref_count = edge_count + len(edges), ref_count + len(refs)
+        last_id = rows[-1]['id']
+
+
+def ensure_chain_index(conn):
+    """Build the chain tables for a database with documents from before they existed."""
+    if (conn.execute(tenant_text("SELECT 1 FROM documents LIMIT 1")).first()
+            and not conn.execute(tenant_text("SELECT 1 FROM transfer_edges LIMIT 1")).first()
+            and not conn.execute(tenant_text("SELECT 1 FROM property_refs LIMIT 1")).first()):
+        edges, refs = rebuild_chain_index(conn)
+        print(f"Chain of title indexed ({edges} transfers, {refs} property numbers).")
+    conn.commit()
+
+
+# =========================================================
+# QUERIES
+# =========================================================
+def _transfers(conn, doc_ids):
+    """
+    Documents (by id) as transfers in date order, each with its sellers,
+    purchasers and property numbers. linked = a seller bought in an earlier
+    transfer of the list, i.e. the chain is unbroken at this step.
+    """
+    if not doc_ids:
+        return []
+    params = {'ids': json.dumps(list(doc_ids))}
+    docs = conn.execute(tenant_text(f"""
+        SELECT {', '.join(_CHAIN_FIELDS)}, sellername, purchasername FROM documents
+        WHERE id IN (SELECT value FROM json_each(:ids))
+    """), params).mappings().fetchall()
+    refs = {}
+    for document_id, kind, number in conn.execute(tenant_text("""
+        SELECT document_id, kind, number FROM property_refs
+        WHERE document_id IN (SELECT value FROM json_each(:ids))
+    """), params):
+        refs.setdefault(document_id, []).append({'kind': kind, 'number': number})
+
+    transfers, owners = [], set()
+    for d in sorted(docs, key=lambda d: (d['registrationdate'] or '', d['id'])):
+        sellers, purchasers = _parties(d['sellername']), _parties(d['purchasername'])
+        transfers.append(dict(
+            {f: d[f] for f in _CHAIN_FIELDS},
+            sellers=list(sellers.values()),
+            purchasers=list(purchasers.values()),
+            properties=refs.get(d['id'], []),
+            linked=bool(owners.intersection(sellers)),
+        ))
+        owners.update(purchasers)
+    return transfers
+
+
+def party_chain(conn, user_id, name, depth=CHAIN_MAX_DEPTH, limit=CHAIN_MAX_DOCUMENTS):
+    """
+    Every transfer of a user's documents reachable from a party: backwards
+    through who sold to them (and who sold to those sellers, earlier), forwards
+    through whom they sold to (and onwards, later), up to `depth` steps. truncated tells, per direction
+    ('up' / 'down'), whether the walk stopped at `limit`. Raises ValueError
+    without a name.
+    """
+    key = latin_key(name or "")
+    if not key:
+        raise ValueError("party name required")
+    # LIMIT inside each recursive select bounds the walk itself, not just the answer
+    rows = conn.execute(tenant_text("""
+        WITH RECURSIVE
+        up(document_id, seller, regdate, depth) AS (
+            SELECT document_id, seller, regdate, 1 FROM transfer_edges WHERE user_id = :user_id AND purchaser = :key
+            UNION
+            SELECT e.document_id, e.seller, e.regdate, up.depth + 1
+            FROM up JOIN transfer_edges e ON e.user_id = :user_id AND e.purchaser = up.seller
+            WHERE up.depth < :depth AND (e.regdate <= up.regdate OR e.regdate IS NULL OR up.regdate IS NULL)
+            LIMIT :limit
+        ),
+        down(document_id, purchaser, regdate, depth) AS (
+            SELECT document_id, purchaser, regdate, 1 FROM transfer_edges WHERE user_id = :user_id AND seller = :key
+            UNION
+            SELECT e.document_id, e.purchaser, e.regdate, down.depth + 1
+            FROM down JOIN transfer_edges e ON e.user_id = :user_id AND e.seller = down.purchaser
+            WHERE down.depth < :depth AND (e.regdate >= down.regdate OR e.regdate IS NULL OR down.regdate IS NULL)
+            LIMIT :limit
+        )
+        SELECT document_id, 'up', MIN(depth) FROM up GROUP BY document_id
+        UNION ALL
+        SELECT document_id, 'down', MIN(depth) FROM down GROUP BY document_id
+        UNION ALL
+        SELECT NULL, 'up', COUNT(*) FROM up
+        UNION ALL
+        SELECT NULL, 'down', COUNT(*) FROM down
+    """), {'user_id': user_id, 'key': key, 'depth': max(1, min(depth, CHAIN_MAX_DEPTH)), 'limit': limit}).fetchall()
+
+    steps, truncated = {}, {}
+    for document_id, direction, value in rows:
+        if document_id is None:
+            # a walk that produced `limit` rows was cut by its LIMIT
+            truncated[direction] = value >= limit
+        else:
+            steps.setdefault(document_id, (direction, value))
+    ranked = sorted(steps, key=lambda i: steps[i][1])
+    doc_ids = ranked[:limit]
+    for document_id in ranked[limit:]:
+        truncated[steps[document_id][0]] = True
+    transfers = _transfers(conn, doc_ids)
+    for t in transfers:
+        t['direction'], t['depth'] = steps[t['id']]
+    return {'party': name, 'key': key, 'transfers': transfers, 'truncated': truncated}
+
+
+def property_chain(conn, user_id, kind, number, area=None, limit=CHAIN_MAX_DOCUMENTS):
+    """Every transfer of a user's documents naming a survey / gat / CTS / flat / plot number, optionally in one area."""
+    if kind not in PROPERTY_KINDS:
+        raise ValueError(f"kind must be one of {', '.join(PROPERTY_KINDS)}")
+    number = parse_property_number(number)
+    if number is None:
+        raise ValueError("number must be a property number, e.g. 12/3")
+    params = {'user_id': user_id, 'kind': kind, 'number': number, 'limit': limit + 1}
+    area_filter = ""
+    if area:
+        # before the LIMIT, so matches in the area are never cut off by matches elsewhere
+        area_filter = "AND d.areaname = :area"
+        params['area'] = area
+    doc_ids = [r[0] for r in conn.execute(tenant_text(f"""
+        SELECT DISTINCT r.document_id FROM property_refs r JOIN documents d ON d.id = r.document_id
+        WHERE r.user_id = :user_id AND r.kind = :kind AND r.number = :number {area_filter}
+        LIMIT :limit
+    """), params)]
+    return {
+        'kind': kind, 'number': number, 'area': area,
+        'transfers': _transfers(conn, doc_ids[:limit]),
+        'truncated': len(doc_ids) > limit,
+    }
@@ -0,0 +1,99 @@
+import csv
+import io
+import tempfile
+
+# =========================================================
+# EXPORT COLUMNS (order used for CSV header / Parquet schema)
+# =========================================================
+EXPORT_COLUMNS = [
+    'id', 'table_name', 'docno', 'docname', 'docname_en', 'sro_code_en', 'reg_year',
+    'registrationdate', 'dateofexecution',
+    'sroname', 'areaname', 'sellername', 'purchasername', 'propertydescription',
+    'consideration_amt', 'marketvalue',
+]
+
+EXPORT_BATCH_SIZE = 5000
+
+
+# =========================================================
+# KEYSET ITERATION
+# fetch_batch(after_id, limit) must return rows ordered by id DESC
+# with id in the first column. Only one batch is held at a time.
+# =========================================================
+def iter_batches(fetch_batch, batch_size=EXPORT_BATCH_SIZE):
+    after_id = None
+    while True:
+        rows = fetch_batch(after_id, batch_size)
+        if not rows:
+            return
+        yield rows
+        if len(rows) < batch_size:
+            return
+        after_id = rows[-1][0]
+
+
+# =========================================================
+# CSV (streamed one batch at a time)
+# =========================================================
+def stream_csv(batches):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+
+    # BOM so Excel opens Marathi text as UTF-8
+    buf.write('\ufeff')
+    writer.writerow(EXPORT_COLUMNS)
+
+    for rows in batches:
+        writer.writerows(rows)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate(0)
+
+    tail = buf.getvalue()
+    if tail:
+        yield tail
+
+
+# =========================================================
+# PARQUET (one row group per batch, spooled to a temp file)
+# =========================================================
+def write_parquet(batches):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export requires pyarrow (pip install pyarrow)")
+
+    schema = pa.schema([
+        ('id', pa.int64()),
+        ('table_name', pa.string()),
+        ('docno', pa.string()),
+        ('docname', pa.string()),
+        ('docname_en', pa.string()),
+        ('sro_code_en', pa.string()),
+        ('reg_year', pa.string()),
+        ('registrationdate', pa.string()),
+        ('dateofexecution', pa.string()),
+        ('sroname', pa.string()),
+        ('areaname', pa.string()),
+        ('sellername', pa.string()),
+        ('purchasername', pa.string()),
+        ('propertydescription', pa.string()),
+        ('consideration_amt', pa.float64()),
+        ('marketvalue', pa.float64()),
+    ])
+
+    out = tempfile.TemporaryFile()
+    writer = pq.ParquetWriter(out, schema, compression='zstd')
+    try:
+        for rows in batches:
+            columns = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(col, type=schema.field(i).type) for i, col in enumerate(columns)],
+                schema=schema
+            ))
+    finally:
+        writer.close()
+
+    out.seek(0)
+    return out
@@ -1,9 +1,15 @@
 import os
-import pandas as pd
+import re
+import csv
 import json
-import xlrd
+import difflib
 from datetime import datetime
-from bs4 import BeautifulSoup
+from time import perf_counter
+
+import metrics
+
+# pandas / openpyxl, xlrd and bs4 are imported inside the parsers that need
+# them, so importing the app (every gunicorn worker) does not pay for them.
 
 # =========================================================
 # COLUMN MAP (canonical column names for DB)
@@ -60,8 +66,26 @@ COLUMN_MAP = {
     'dateofexecution': 'dateofexecution',
     'date of execution': 'dateofexecution',
     'executiondate': 'dateofexecution',
+
+    # Index-II headings in Marathi exports
+    'दस्त क्रमांक': 'docno',
+    'दस्तऐवजाचा प्रकार': 'docname',
+    'दस्त प्रकार': 'docname',
+    'नोंदणी दिनांक': 'registrationdate',
+    'दस्त नोंदणी केल्याचा दिनांक': 'registrationdate',
+    'दस्तऐवज करुन दिल्याचा दिनांक': 'dateofexecution',
+    'लिहून देणार': 'sellername',
+    'लिहून घेणार': 'purchasername',
+    'मोबदला': 'consideration_amt',
+    'बाजारभाव': 'marketvalue',
+    'मिळकतीचे वर्णन': 'propertydescription',
+    'दुय्यम निबंधक': 'sroname',
+    'गाव': 'areaname',
 }
 
+# Fields a header can resolve to (admins may only alias onto these)
+DOCUMENT_FIELDS = sorted(set(COLUMN_MAP.values()))
+
 
 # =========================================================
 # COLUMN NORMALIZER
@@ -73,16 +97,72 @@ def normalize_colname(name: str):
     return " ".join(n.split())
 
 
-def map_dataframe_columns(df: pd.DataFrame):
-    col_map = {}
-    for c in df.columns:
-        nc = normalize_colname(c)
-        if nc in COLUMN_MAP:
-            col_map[c] = COLUMN_MAP[nc]
-        else:
-            clean = nc.replace(" ", "").replace("_", "")
-            col_map[c] = COLUMN_MAP.get(clean)
-    return col_map
+# =========================================================
+# HEADER RESOLUTION
+# Exact alias, then the compacted header (no spaces / punctuation),
+# then a fuzzy match on the compacted form. A field claimed by an
+# exact or alias match is never also given to a fuzzy one, and each
+# field is fuzzily assigned at most once. headers.py caches the
+# result per header-row fingerprint and adds admin aliases.
+# =========================================================
+HEADER_FUZZY_CUTOFF = float(os.environ.get('HEADER_FUZZY_CUTOFF', '0.85'))
+
+_COMPACT_RE = re.compile(r"[\s_.,:;/\\()\[\]#'\"-]+")
+
+
+def compact_header(header):
+    return _COMPACT_RE.sub("", header)
+
+
+class HeaderResolver:
+    def __init__(self, aliases=None):
+        self.aliases = dict(COLUMN_MAP)
+        self.aliases.update(aliases or {})
+        self.compact = {compact_header(a): f for a, f in self.aliases.items()}
+        self._choices = list(self.compact)
+
+    def match(self, header):
+        """Normalized header → (field, how) with how in exact / alias / fuzzy, or (None, None)."""
+        if not header:
+            return None, None
+        if header in self.aliases:
+            return self.aliases[header], 'exact'
+        c = compact_header(header)
+        if c in self.compact:
+            return self.compact[c], 'alias'
+        close = difflib.get_close_matches(c, self._choices, n=1, cutoff=HEADER_FUZZY_CUTOFF)
+        if close:
+            return self.compact[close[0]], 'fuzzy'
+        return None, None
+
+    def resolve(self, headers):
+        """Normalized header row → [(field, how), ...] in column order."""
+        matches = [self.match(h) for h in headers]
+        certain = {f for f, how in matches if how in ('exact', 'alias')}
+        taken, resolved = set(), []
+        for field, how in matches:
+            if how == 'fuzzy' and (field in certain or field in taken):
+                field, how = None, None
+            if how == 'fuzzy':
+                taken.add(field)
+            resolved.append((field, how))
+        return resolved
+
+
+DEFAULT_RESOLVER = HeaderResolver()
+
+
+def resolve_columns(headers, resolver=None):
+    """
+    Normalized header row → {column index: canonical field or None}.
+    resolver: anything with resolve(headers) like HeaderResolver (default: COLUMN_MAP only).
+    """
+    return {idx: field for idx, (field, _) in enumerate((resolver or DEFAULT_RESOLVER).resolve(headers))}
+
+
+def map_dataframe_columns(df, resolver=None):
+    fields = resolve_columns([normalize_colname(c) for c in df.columns], resolver)
+    return {c: fields[i] for i, c in enumerate(df.columns)}
 
 
 # =========================================================
@@ -115,12 +195,204 @@ def normalize_date(val):
 
 
 # =========================================================
-# DETECT HTML DISGUISED XLS
+# AMOUNTS
+# consideration_amt / marketvalue as floats, converted a whole
+# column at a time after parsing. Handles lakh/crore digit grouping
+# (12,34,567.00), Rs. / ₹ / INR / रु. markers, the /- suffix,
+# Devanagari numerals and "लाख" / "crore" style multipliers.
+# Anything else becomes None rather than a wrong number.
 # =========================================================
-def is_html_disguised_xls(path):
-    with open(path, "rb") as f:
-        start = f.read(200).lstrip()
+AMOUNT_FIELDS = ['consideration_amt', 'marketvalue']
+
+_AMOUNT_CHARS = str.maketrans({
+    **{d: str(i) for i, d in enumerate("०१२३४५६७८९")},
+    ",": None, " ": None, "\u00a0": None, "\u202f": None, "_": None, "\u2212": "-",
+})
+_CURRENCY_RE = re.compile(r"^(?:rs\.?|inr|₹|रु\.?|रुपये)|(?:/-|/=|rs\.?|inr|₹|रु\.?|रुपये|only|फक्त)$")
+_AMOUNT_RE = re.compile(r"^(-?(?:\d+(?:\.\d*)?|\.\d+)(?:e[+-]?\d+)?)(lakhs?|lacs?|crores?|cr|लाख|कोटी)?$")
+_MULTIPLIERS = {'lakh': 1e5, 'lakhs': 1e5, 'lac': 1e5, 'lacs': 1e5, 'लाख': 1e5,
+                'crore': 1e7, 'crores': 1e7, 'cr': 1e7, 'कोटी': 1e7}
+
+
+def parse_amounts(values):
+    """Column of raw cell values → list of float / None, same length."""
+    out = []
+    translate, strip_currency, match = _AMOUNT_CHARS, _CURRENCY_RE.sub, _AMOUNT_RE.match
+    for v in values:
+        if v is None or v == "":
+            out.append(None)
+            continue
+        if isinstance(v, (int, float)):
+            out.append(float(v))
+            continue
+        text = str(v).lower().translate(translate)
+        # markers can be stacked: "rs.12,345/-only"
+        prev = None
+        while text != prev:
+            prev, text = text, strip_currency("", text)
+        m = match(text)
+        if not m:
+            out.append(None)
+            continue
+        amount = float(m.group(1))
+        if m.group(2):
+            amount *= _MULTIPLIERS[m.group(2)]
+        out.append(amount)
+    return out
+
+
+def convert_amount_columns(rows):
+    """Replace the amount fields of parsed records with floats, column by column."""
+    for field in AMOUNT_FIELDS:
+        for rec, amount in zip(rows, parse_amounts([r.get(field) for r in rows])):
+            rec[field] = amount
+    return rows
+
 
+# =========================================================
+# ENGLISH DERIVED FIELDS
+# Defaults seed the `translations` table; the live mapping is
+# read from the DB and passed in by the caller.
+# =========================================================
+DEFAULT_DOCNAME_MAP = {
+    "कंफर्मेशन डीड": "Conformation Deed",
+    "करारनामा": "Agreement",
+    "गहाणखत": "Mortgage Deed",
+    "अ‍ॅफिडेव्हिट": "Affidavit",
+    "पॉवर ऑफ अटर्नी": "Power of Attorney",
+    "डेव्हलपमेंट अ‍ॅग्रीमेंट": "Development Agreement",
+    "असाइनमेंट डीड": "Assignment Deed",
+    "कमन्समेंट सर्टिफिकेट": "Commencement Certificate",
+    "कम्प्लिशन सर्टिफिकेट": "Completion Certificate",
+    "रिलीज डीड": "Release Deed",
+    "सोसायटी रजिस्ट्रेशन": "Society Registration",
+    "ऑक्युपन्सी सर्टिफिकेट": "Part Occupancy Certificate",
+    "नियमितीकरण प्रमाणपत्र": "Regularization Certificate",
+    "ना आदेश": "NA Order"
+}
+
+# SRO place name → short code prefix, e.g. "सह दु.नि. हवेली 23" → "HVL 23"
+DEFAULT_SRO_MAP = {
+    "हवेली": "HVL"
+}
+
+DEVANAGARI_DIGITS = str.maketrans("०१२३४५६७८९", "0123456789")
+
+
+def english_docname(docname, docname_map):
+    if not docname:
+        return None
+    docname = str(docname).strip()
+    return docname_map.get(docname, docname)
+
+
+def sro_short_code(sroname, sro_map):
+    if not sroname:
+        return None
+    for place, code in sro_map.items():
+        if place in sroname:
+            num = ''.join(c for c in sroname if c.isdigit()).translate(DEVANAGARI_DIGITS)
+            return f"{code} {num}"
+    return None
+
+
+def registration_year(regdate):
+    # registrationdate is stored as YYYY-MM-DD by normalize_date
+    if not regdate:
+        return None
+    year = str(regdate).split("-")[0].strip()
+    return year if len(year) == 4 and year.isdigit() else None
+
+
+def derive_english_fields(rec, docname_map, sro_map):
+    return {
+        "docname_en": english_docname(rec.get("docname"), docname_map),
+        "sro_code_en": sro_short_code(rec.get("sroname"), sro_map),
+        "reg_year": registration_year(rec.get("registrationdate")),
+    }
+
+
+# =========================================================
+# PROPERTY IDENTIFIERS
+# Survey / gat / CTS / flat / plot numbers out of the free-text
+# propertydescription ("सर्वे नं. 12/3/1, सि.स.नं. 1450", "Gat No 45",
+# "सदनिका नं: 1203"), as (kind, number) pairs. Numbers are kept as
+# written apart from digits (Devanagari → ASCII), spacing around "/"
+# and leading zeros, so "०१२ / ३" and "12/3" are the same number. A
+# trailing "हिस्सा नं. 3" / "Hissa No. 3" is the subdivision: "12/3".
+# Flat and plot numbers may carry a wing ("B-402", "B/402", "B402"),
+# stored as "B-402".
+# =========================================================
+PROPERTY_KINDS = ['survey', 'gat', 'cts', 'flat', 'plot']
+
+_NUMBER_WORD = r"(?:नं|नंबर|क्र(?:मांक)?|no|number)"
+# cts before survey: "सि.स.नं." must not be read as "स.नं."
+_PROPERTY_LABELS = {
+    'cts': r"(?:सि\.?\s*स\.?|सी\.?\s*टी\.?\s*एस\.?|न\.?\s*भू\.?|\bc\.?\s*t\.?\s*s\.?|\bcity\s+survey)\s*" + _NUMBER_WORD + "?",
+    # not "sr": "Sr. No." is a serial number
+    'survey': r"(?:सर्व्हे|सर्वे|भूमापन|स\.|\bs\.|\bsurvey|\bsy\.?)\s*" + _NUMBER_WORD,
+    'gat': r"(?:गट|(?<![\u0900-\u097f])ग\.\s*(?=" + _NUMBER_WORD + r")|\bgat|\bgut)\s*" + _NUMBER_WORD + "?",
+    'flat': r"(?:सदनिका|फ्लॅट|\bflat|\bapartment)\s*" + _NUMBER_WORD + "?",
+    'plot': r"(?:प्लॉट|प्लाॅट|\bplot)\s*" + _NUMBER_WORD + "?",
+}
+_WING_KINDS = ('flat', 'plot')
+_WING = r"[a-zअ-ह][\u093e-\u094c]?\s*[-/]?\s*"
+_WING_RE = re.compile(rf"({_WING})(?=\d)", re.I)
+_PROPERTY_NUMBER = rf"(?:{_WING})?\d+[a-z]?(?:\s*/\s*[0-9a-z]+)*"
+_HISSA = r"\s*,?\s*(?:हिस्सा|\bhissa)\s*" + _NUMBER_WORD + r"?\.?\s*[:\-–]*\s*(?P<hissa>\d+[a-zअ-ह]?)"
+_PROPERTY_RE = re.compile(
+    "(?:" + "|".join(f"(?P<{kind}>{label})" for kind, label in _PROPERTY_LABELS.items()) + ")" +
+    rf"\.?\s*[:\-–]*\s*(?P<numbers>{_PROPERTY_NUMBER}(?:\s*(?:,|&|\bव\b|\band\b)\s*{_PROPERTY_NUMBER})*)" +
+    f"(?:{_HISSA})?",
+    re.I
+)
+_PROPERTY_NUMBER_RE = re.compile(rf"{_PROPERTY_NUMBER}(?:/\d+[a-zअ-ह]?)?", re.I)
+_PROPERTY_SPLIT_RE = re.compile(r"\s*(?:,|&|\bव\b|\band\b)\s*", re.I)
+
+
+def normalize_property_number(raw):
+    raw = raw.strip().upper()
+    wing = _WING_RE.match(raw)
+    if wing:
+        raw = raw[wing.end():]
+    parts = re.split(r"\s*/\s*", raw)
+    number = "/".join(p.lstrip("0") or "0" for p in parts)
+    return f"{wing.group(1).rstrip(' -/')}-{number}" if wing else number
+
+
+def parse_property_number(value):
+    """A number as typed in a search ("१२/३", "12 / 3A") → its stored form, or None."""
+    value = " ".join(str(value or "").translate(DEVANAGARI_DIGITS).split())
+    if not _PROPERTY_NUMBER_RE.fullmatch(value):
+        return None
+    return normalize_property_number(value)
+
+
+def extract_property_ids(description):
+    """propertydescription → distinct [(kind, number)] in order of appearance."""
+    if not description:
+        return []
+    text = str(description).translate(DEVANAGARI_DIGITS)
+    found = []
+    for m in _PROPERTY_RE.finditer(text):
+        kind = next(k for k in PROPERTY_KINDS if m.group(k))
+        numbers = _PROPERTY_SPLIT_RE.split(m.group('numbers'))
+        if m.group('hissa'):
+            numbers[-1] += "/" + m.group('hissa')
+        for raw in numbers:
+            if kind not in _WING_KINDS and _WING_RE.match(raw):
+                continue
+            pair = (kind, normalize_property_number(raw))
+            if pair not in found:
+                found.append(pair)
+    return found
+
+
+# =========================================================
+# DETECT HTML DISGUISED XLS
+# =========================================================
+def _looks_like_html(start):
+    start = start.lstrip()
     return (
         start.startswith(b"<")
         or start.startswith(b"\xff\xfe<")
@@ -128,10 +400,17 @@ def is_html_disguised_xls(path):
     )
 
 
+def is_html_disguised_xls(path):
+    with open(path, "rb") as f:
+        return _looks_like_html(f.read(200))
+
+
 # =========================================================
 # PARSE HTML TABLES (UTF-16 or UTF-8)
 # =========================================================
-def parse_html_xls(path):
+def parse_html_xls(path, resolver=None):
+    from bs4 import BeautifulSoup
+
     # Most government files are UTF-16
     try:
         with open(path, "r", encoding="utf-16") as f:
@@ -152,13 +431,7 @@ def parse_html_xls(path):
     header_cells = trs[0].find_all(["td", "th"])
     headers = [normalize_colname(th.get_text(strip=True)) for th in header_cells]
 
-    col_map = {}
-    for idx, h in enumerate(headers):
-        if h in COLUMN_MAP:
-            col_map[idx] = COLUMN_MAP[h]
-        else:
-            clean = h.replace(" ", "").replace("_", "")
-            col_map[idx] = COLUMN_MAP.get(clean)
+    col_map = resolve_columns(headers, resolver)
 
     # Body rows
     for tr in trs[1:]:
@@ -187,7 +460,9 @@ def parse_html_xls(path):
 # =========================================================
 # PARSE REAL .XLS (xlrd)
 # =========================================================
-def parse_xls_manual(path):
+def parse_xls_manual(path, resolver=None):
+    import xlrd
+
     book = xlrd.open_workbook(path)
     all_rows = []
 
@@ -195,13 +470,7 @@ def parse_xls_manual(path):
         header = [normalize_colname(str(c)) for c in sheet.row_values(0)]
         raw_header = sheet.row_values(0)
 
-        col_map = {}
-        for idx, h in enumerate(header):
-            if h in COLUMN_MAP:
-                col_map[idx] = COLUMN_MAP[h]
-            else:
-                clean = h.replace(" ", "").replace("_", "")
-                col_map[idx] = COLUMN_MAP.get(clean)
+        col_map = resolve_columns(header, resolver)
 
         for r in range(1, sheet.nrows):
             row = sheet.row_values(r)
@@ -226,13 +495,15 @@ def parse_xls_manual(path):
 # =========================================================
 # PARSE .XLSX (pandas)
 # =========================================================
-def parse_xlsx(path):
+def parse_xlsx(path, resolver=None):
+    import pandas as pd
+
     xls = pd.ExcelFile(path, engine="openpyxl")
     all_rows = []
 
     for sheet in xls.sheet_names:
         df = xls.parse(sheet, dtype=str).fillna('')
-        col_map = map_dataframe_columns(df)
+        col_map = map_dataframe_columns(df, resolver)
 
         for _, row in df.iterrows():
             rec, raw_row = {}, {}
@@ -254,21 +525,185 @@ def parse_xlsx(path):
     return all_rows
 
 
+# =========================================================
+# PARSE .CSV (UTF-8, optional BOM as written by Excel)
+# =========================================================
+def parse_csv(path, resolver=None):
+    all_rows = []
+
+    with open(path, "r", encoding="utf-8-sig", errors="ignore", newline="") as f:
+        reader = csv.reader(f)
+        raw_header = next(reader, None)
+        if not raw_header:
+            return []
+        header = [normalize_colname(c) for c in raw_header]
+
+        col_map = resolve_columns(header, resolver)
+
+        for row in reader:
+            rec, raw_row = {}, {}
+
+            for col_index, value in enumerate(row):
+                val = value.strip()
+                raw_row[raw_header[col_index] if col_index < len(raw_header) else f"col{col_index}"] = val
+                canon = col_map.get(col_index)
+                if canon:
+                    rec[canon] = val
+
+            rec["registrationdate"] = normalize_date(rec.get("registrationdate"))
+            rec["dateofexecution"] = normalize_date(rec.get("dateofexecution"))
+            rec["raw_json"] = json.dumps(raw_row, ensure_ascii=False)
+
+            all_rows.append(rec)
+
+    return all_rows
+
+
+# =========================================================
+# PREVIEW: header mapping + first rows, reading only the start
+# of the file (HTML / CSV are decoded until enough rows were
+# seen, xlsx is streamed by openpyxl in read-only mode).
+# Each _head_* returns [header values, row values, ...].
+# =========================================================
+PREVIEW_ROWS = int(os.environ.get('PREVIEW_ROWS', '20'))
+PREVIEW_MAX_ROWS = int(os.environ.get('PREVIEW_MAX_ROWS', '500'))
+PREVIEW_READ_CHUNK = 64 * 1024
+
+
+def _head_html(stream, limit):
+    import codecs
+    from bs4 import BeautifulSoup
+
+    start = stream.read(2)
+    stream.seek(0)
+    # government files are UTF-16 (usually with BOM); plain HTML exports are UTF-8
+    utf16 = start in (b"\xff\xfe", b"\xfe\xff") or (len(start) == 2 and start[1:] == b"\x00")
+    decoder = codecs.getincrementaldecoder("utf-16" if utf16 else "utf-8")(errors="ignore")
+
+    parts, rows_seen = [], 0
+    while rows_seen <= limit:
+        chunk = stream.read(PREVIEW_READ_CHUNK)
+        text = decoder.decode(chunk, final=not chunk)
+        parts.append(text)
+        rows_seen += text.lower().count("</tr")
+        if not chunk:
+            break
+
+    # html.parser closes the tags cut off at the end of the prefix
+    table = BeautifulSoup("".join(parts), "html.parser").find("table")
+    if not table:
+        return []
+    return [[td.get_text(strip=True) for td in tr.find_all(["td", "th"])]
+            for tr in table.find_all("tr")[:limit + 1]]
+
+
+def _head_xls(stream, limit):
+    import xlrd
+
+    book = xlrd.open_workbook(file_contents=stream.read(), on_demand=True)
+    sheet = book.sheet_by_index(0)
+    return [[str(v).strip() for v in sheet.row_values(r)] for r in range(min(sheet.nrows, limit + 1))]
+
+
+def _head_xlsx(stream, limit):
+    from openpyxl import load_workbook
+
+    wb = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0]
+        return [["" if v is None else str(v).strip() for v in row]
+                for row in ws.iter_rows(max_row=limit + 1, values_only=True)]
+    finally:
+        wb.close()
+
+
+def _head_csv(stream, limit):
+    import io
+    from itertools import islice
+
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", errors="ignore", newline="")
+    try:
+        return [[v.strip() for v in row] for row in islice(csv.reader(text), limit + 1)]
+    finally:
+        text.detach()
+
+
+def build_record(values, raw_header, col_map):
+    """One row of cell values → record with canonical fields (as the parsers produce)."""
+    rec, raw = {}, {}
+    for i, val in enumerate(values):
+        raw[raw_header[i] if i < len(raw_header) else f"col{i}"] = val
+        canon = col_map.get(i)
+        if canon:
+            rec[canon] = val
+    rec["registrationdate"] = normalize_date(rec.get("registrationdate"))
+    rec["dateofexecution"] = normalize_date(rec.get("dateofexecution"))
+    rec["raw_json"] = json.dumps(raw, ensure_ascii=False)
+    return rec
+
+
+def preview_file(stream, filename, limit=PREVIEW_ROWS, resolver=None):
+    """
+    Header mapping and the first `limit` records of an upload (a seekable binary
+    stream). For HTML / CSV files a leading slice of the file is enough.
+    """
+    limit = max(1, min(limit, PREVIEW_MAX_ROWS))
+    ext = os.path.splitext(filename)[1].lower()
+    if ext == ".xls":
+        start = stream.read(200)
+        stream.seek(0)
+        parser, head = ("html", _head_html) if _looks_like_html(start) else ("xlrd", _head_xls)
+    elif ext == ".xlsx":
+        parser, head = "openpyxl", _head_xlsx
+    elif ext == ".csv":
+        parser, head = "csv", _head_csv
+    else:
+        raise ValueError("Unsupported file format. Upload .xls, .xlsx or .csv")
+
+    started = perf_counter()
+    rows = head(stream, limit)
+    raw_header = rows[0] if rows else []
+    resolved = (resolver or DEFAULT_RESOLVER).resolve([normalize_colname(h) for h in raw_header])
+    col_map = {i: field for i, (field, _) in enumerate(resolved)}
+    mapped = {f for f in col_map.values() if f}
+
+    return {
+        "parser": parser,
+        "columns": [{"header": h, "field": resolved[i][0], "match": resolved[i][1]}
+                    for i, h in enumerate(raw_header)],
+        "unmapped": [h for i, h in enumerate(raw_header) if h and not col_map[i]],
+        "missing_fields": sorted(set(COLUMN_MAP.values()) - mapped),
+        "records": convert_amount_columns([build_record(r, raw_header, col_map) for r in rows[1:]]),
+        "seconds": round(perf_counter() - started, 4),
+    }
+
+
 # =========================================================
 # MAIN ENTRY
 # =========================================================
-def extract_rows_from_excel(path):
+def _timed_parse(parser_name, parse, path, resolver=None):
+    start = perf_counter()
+    rows = convert_amount_columns(parse(path, resolver))
+    metrics.observe('adoodle_extract_duration_seconds', perf_counter() - start, parser=parser_name)
+    metrics.inc('adoodle_extract_rows_total', len(rows), parser=parser_name)
+    return rows
+
+
+def extract_rows_from_excel(path, resolver=None):
     ext = os.path.splitext(path)[1].lower()
 
     if ext == ".xls":
         if is_html_disguised_xls(path):
             print("⚠ Detected HTML-based XLS → Parsing as HTML")
-            return parse_html_xls(path)
+            return _timed_parse("html", parse_html_xls, path, resolver)
 
         print("⚠ Using manual xlrd parser for real .xls")
-        return parse_xls_manual(path)
+        return _timed_parse("xlrd", parse_xls_manual, path, resolver)
 
     if ext == ".xlsx":
-        return parse_xlsx(path)
+        return _timed_parse("openpyxl", parse_xlsx, path, resolver)
+
+    if ext == ".csv":
+        return _timed_parse("csv", parse_csv, path, resolver)
 
-    raise ValueError("Unsupported file format. Upload .xls or .xlsx")
+    raise ValueError("Unsupported file format. Upload .xls, .xlsx or .csv")
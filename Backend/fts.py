@@ -0,0 +1,87 @@
+from tenants import tenant_text
+
+# =========================================================
+# documents_fts: contentless FTS5 index over the searchable columns.
+# Rows are keyed by rowid = documents.id. A contentless table keeps no
+# copy of the text, so deleting an entry means replaying the original
+# values through the special 'delete' command.
+# =========================================================
+FTS_COLUMNS = ['purchasername', 'sellername', 'propertydescription', 'docname', 'docno']
+
+FTS_DDL = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts
+    USING fts5(
+        docid UNINDEXED,
+        purchasername,
+        sellername,
+        propertydescription,
+        docname,
+        docno,
+        content=''
+    );
+"""
+
+# PRAGMA user_version at which FTS rowids match documents.id
+FTS_ROWID_VERSION = 1
+
+
+def _fts_params(row):
+    # row: mapping with id + FTS_COLUMNS
+    params = {'rowid': row['id'], 'docid': str(row['id'])}
+    for c in FTS_COLUMNS:
+        params[c] = row.get(c) or ''
+    return params
+
+
+def fts_insert(session, rows):
+    if not rows:
+        return
+    session.execute(tenant_text("""
+        INSERT INTO documents_fts(rowid, docid, purchasername, sellername, propertydescription, docname, docno)
+        VALUES (:rowid, :docid, :purchasername, :sellername, :propertydescription, :docname, :docno)
+    """), [_fts_params(r) for r in rows])
+
+
+def fts_insert_file(session, file_id):
+    """Index every document of one upload in a single INSERT ... SELECT (same values as fts_insert)."""
+    session.execute(tenant_text(f"""
+        INSERT INTO documents_fts(rowid, docid, {', '.join(FTS_COLUMNS)})
+        SELECT id, CAST(id AS TEXT), {', '.join(f"COALESCE({c}, '')" for c in FTS_COLUMNS)}
+        FROM documents WHERE file_id = :file_id
+    """), {'file_id': file_id})
+
+
+def fts_delete(session, rows):
+    if not rows:
+        return
+    session.execute(tenant_text("""
+        INSERT INTO documents_fts(documents_fts, rowid, docid, purchasername, sellername, propertydescription, docname, docno)
+        VALUES ('delete', :rowid, :docid, :purchasername, :sellername, :propertydescription, :docname, :docno)
+    """), [_fts_params(r) for r in rows])
+
+
+def rebuild_fts(session, batch_size=5000):
+    """Drop every FTS entry and re-index all documents with rowid = documents.id."""
+    session.execute(tenant_text("INSERT INTO documents_fts(documents_fts) VALUES ('delete-all')"))
+    last_id, total = 0, 0
+    while True:
+        rows = session.execute(tenant_text(f"""
+            SELECT id, {', '.join(FTS_COLUMNS)} FROM documents
+            WHERE id > :last_id ORDER BY id LIMIT :limit
+        """), {'last_id': last_id, 'limit': batch_size}).mappings().fetchall()
+        if not rows:
+            break
+        fts_insert(session, rows)
+        total += len(rows)
+        last_id = rows[-1]['id']
+    return total
+
+
+def ensure_fts(session):
+    """Create documents_fts and, for databases indexed before rowids were keyed, rebuild it once."""
+    session.execute(tenant_text(FTS_DDL))
+    if session.execute(tenant_text("PRAGMA user_version")).scalar() < FTS_ROWID_VERSION:
+        count = rebuild_fts(session)
+        session.execute(tenant_text(f"PRAGMA user_version = {FTS_ROWID_VERSION}"))
+        print(f"FTS rebuilt with document ids as rowids ({count} documents).")
+    session.commit()
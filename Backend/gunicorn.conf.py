@@ -0,0 +1,11 @@
+# gunicorn reads ./gunicorn.conf.py by default (Procfile / render.yaml run from Backend/).
+
+
+def on_starting(server):
+    # Schema bootstrap runs once in the master, before any worker is forked,
+    # instead of in every worker at import time.
+    from app import init_database
+    import metrics
+    # snapshots of the previous run's workers would be merged into /metrics
+    metrics.clear_snapshots()
+    init_database()
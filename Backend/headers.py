@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+from threading import Lock
+from time import monotonic
+
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import db, HeaderAlias, HeaderLayout
+from extractor import HeaderResolver
+import metrics
+
+# =========================================================
+# HEADER LAYOUTS
+# A file's normalized header row is fingerprinted and resolved
+# once; the mapping is kept in header_layouts so every later file
+# with the same layout (same export source) skips matching.
+# Admin aliases (header_aliases) are compiled into the resolver;
+# changing them clears the stored layouts. Workers reload aliases
+# after HEADER_CACHE_TTL seconds. Each layout row records the alias
+# set it was resolved with (alias_version) and only a resolver with
+# the same aliases trusts it, so a worker still on the old aliases
+# cannot leave a stale layout behind for the others.
+# =========================================================
+HEADER_CACHE_TTL = int(os.environ.get('HEADER_CACHE_TTL', '60'))
+HEADER_LAYOUT_MEMORY = int(os.environ.get('HEADER_LAYOUT_MEMORY', '512'))
+LAYOUT_LIST_MAX_LIMIT = 500   # /admin/header_layouts page size cap
+
+_lock = Lock()
+_state = {'loaded_at': 0.0, 'resolver': None}
+
+
+def fingerprint(headers):
+    return hashlib.sha1("\x1f".join(headers).encode('utf-8')).hexdigest()
+
+
+def alias_version(aliases):
+    return hashlib.sha1(json.dumps(sorted(aliases.items()), ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+class CachedHeaderResolver:
+    """HeaderResolver.resolve() cached per fingerprint: in this process, then in header_layouts."""
+
+    def __init__(self, resolver, version):
+        self.resolver = resolver
+        self.version = version
+        self.layouts = {}
+
+    def _load(self, fp):
+        with db.engine.connect() as conn:
+            row = conn.execute(select(HeaderLayout.mapping_json).where(
+                HeaderLayout.fingerprint == fp, HeaderLayout.alias_version == self.version)).first()
+        return [tuple(m) for m in json.loads(row[0])] if row else None
+
+    def _store(self, fp, headers, resolved):
+        # own short transaction: callers parse files with no session transaction open
+        stmt = sqlite_insert(HeaderLayout.__table__).values(
+            fingerprint=fp,
+            headers_json=json.dumps(headers, ensure_ascii=False),
+            mapping_json=json.dumps(resolved),
+            alias_version=self.version,
+            created_at=datetime.utcnow()
+        )
+        with db.engine.begin() as conn:
+            # a row from other aliases is replaced, not kept: it would never be read again
+            conn.execute(stmt.on_conflict_do_update(
+                index_elements=['fingerprint'],
+                set_={c: stmt.excluded[c] for c in ('headers_json', 'mapping_json', 'alias_version', 'created_at')},
+                where=HeaderLayout.__table__.c.alias_version.is_distinct_from(stmt.excluded.alias_version)
+            ))
+
+    def resolve(self, headers):
+        fp = fingerprint(headers)
+        resolved = self.layouts.get(fp)
+        if resolved is None:
+            resolved = self._load(fp)
+        metrics.cache_result('header_layouts', resolved is not None)
+        if resolved is None:
+            resolved = self.resolver.resolve(headers)
+            self._store(fp, headers, resolved)
+        if len(self.layouts) >= HEADER_LAYOUT_MEMORY:
+            self.layouts.clear()
+        self.layouts[fp] = resolved
+        return resolved
+
+
+def header_resolver():
+    """The resolver for this process: COLUMN_MAP + admin aliases, reloaded every HEADER_CACHE_TTL."""
+    now = monotonic()
+    resolver = _state['resolver']
+    if resolver is not None and now - _state['loaded_at'] <= HEADER_CACHE_TTL:
+        return resolver
+    with _lock:
+        if _state['resolver'] is resolver:
+            with db.engine.connect() as conn:
+                aliases = dict(conn.execute(select(HeaderAlias.alias, HeaderAlias.field)).all())
+            _state['resolver'] = CachedHeaderResolver(HeaderResolver(aliases), alias_version(aliases))
+            _state['loaded_at'] = now
+        return _state['resolver']
+
+
+def invalidate_header_layouts():
+    """After an alias change: drop stored layouts (caller commits) and this process's resolver."""
+    db.session.execute(HeaderLayout.__table__.delete())
+    _state['resolver'] = None
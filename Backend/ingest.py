@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+import tempfile
+from time import perf_counter
+
+from sqlalchemy import insert
+
+from models import db, UploadedFile, Document
+from tenants import tenant_text
+from extractor import extract_rows_from_excel, derive_english_fields, extract_property_ids
+from fts import fts_insert_file
+from parties import document_parties, party_keys, party_key_rows, insert_party_keys, apply_party_counts
+from chain import transfer_pairs, chain_rows, insert_chain_rows
+import metrics
+
+# =========================================================
+# INGESTION
+# An uploaded file goes through three stages:
+#   1. save + hash          (disk only)
+#   2. parse + normalize    (into a JSON-lines staging file, no DB;
+#                            party / chain-of-title index entries too)
+#   3. bulk load            (one short write transaction)
+# Only stage 3 holds SQLite's write lock, so parsing a large file
+# no longer blocks the user's other writers.
+# =========================================================
+INGEST_BATCH = int(os.environ.get('INGEST_BATCH', '2000'))
+COPY_CHUNK = 1024 * 1024
+
+# values copied from the extractor row as stripped strings
+TEXT_FIELDS = ['sr_code', 'internal_document_number', 'docno', 'docname', 'purchasername', 'sellername',
+               'propertydescription', 'areaname', 'sroname']
+
+
+def unique_path(folder, filename):
+    """folder/filename, or folder/<name>_<n><ext> if that is taken."""
+    fpath = os.path.join(folder, filename)
+    stem, ext = os.path.splitext(filename)
+    i = 1
+    while os.path.exists(fpath):
+        fpath = os.path.join(folder, f"{stem}_{i}{ext}")
+        i += 1
+    return fpath
+
+
+def save_upload(stream, fpath):
+    """Copy an upload stream to fpath, hashing on the way. Returns (size, sha256 hex)."""
+    digest = hashlib.sha256()
+    size = 0
+    with open(fpath, 'wb') as out:
+        while True:
+            chunk = stream.read(COPY_CHUNK)
+            if not chunk:
+                break
+            digest.update(chunk)
+            out.write(chunk)
+            size += len(chunk)
+    return size, digest.hexdigest()
+
+
+def document_values(r, docname_map, sro_map):
+    """
+    One extractor row → column values for the documents table (without user / file ids).
+    Amounts arrive as floats already (extractor.convert_amount_columns).
+    """
+    values = {f: (str(r.get(f)).strip() if r.get(f) else None) for f in TEXT_FIELDS}
+    values.update(derive_english_fields(r, docname_map, sro_map))
+    values.update(
+        registrationdate=r.get('registrationdate'),
+        dateofexecution=r.get('dateofexecution'),
+        consideration_amt=r.get('consideration_amt'),
+        marketvalue=r.get('marketvalue'),
+        raw_json=r.get('raw_json'),
+    )
+    return values
+
+
+def document_index(values):
+    """Party names, fuzzy keys, transfer pairs and property numbers of one document (no ids yet)."""
+    parties = document_parties(values)
+    return {
+        'parties': parties,
+        'keys': party_keys(parties),
+        'pairs': transfer_pairs(parties),
+        'property_ids': extract_property_ids(values.get('propertydescription')),
+    }
+
+
+def stage_file(fpath, docname_map, sro_map, resolver=None):
+    """
+    Parse fpath and write the normalized rows, each with its index entries
+    under '_index', to a staging file next to it.
+    Returns (staging path, row count); the caller removes the staging file.
+    """
+    rows = extract_rows_from_excel(fpath, resolver)
+    fd, staging_path = tempfile.mkstemp(prefix='.stage-', suffix='.jsonl', dir=os.path.dirname(fpath))
+    with os.fdopen(fd, 'w', encoding='utf-8') as out:
+        for r in rows:
+            values = document_values(r, docname_map, sro_map)
+            values['_index'] = document_index(values)
+            out.write(json.dumps(values, ensure_ascii=False))
+            out.write('\n')
+    return staging_path, len(rows)
+
+
+def _write_index(batch, ids, indexes, party_counts):
+    keys, edges, refs = [], [], []
+    for row, doc_id, ix in zip(batch, ids, indexes):
+        user_id = row['user_id']
+        for role, key, name in ix['parties']:
+            party_counts.setdefault((user_id, role, key), [name, 0])[1] += 1
+        keys.extend(party_key_rows(user_id, doc_id, ix['keys']))
+        e, r = chain_rows(user_id, doc_id, row.get('registrationdate'), ix['pairs'], ix['property_ids'])
+        edges.extend(e)
+        refs.extend(r)
+    insert_party_keys(db.session, keys)
+    insert_chain_rows(db.session, edges, refs)
+
+
+def _staged_batches(staging_path, extra):
+    batch = []
+    with open(staging_path, encoding='utf-8') as f:
+        for line in f:
+            batch.append(dict(json.loads(line), **extra))
+            if len(batch) >= INGEST_BATCH:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def load_staged(user_id, table_name, filename, fpath, filesize, sha256, staging_path):
+    """
+    Stage 3: the upload row, its documents, their FTS entries and the party /
+    chain-of-title indexes in one transaction. Returns the new UploadedFile.
+    Caller handles rollback.
+    """
+    start = perf_counter()
+    uf = UploadedFile(user_id=user_id, filename=filename, filepath=fpath, filesize=filesize,
+                      sha256=sha256, table_name=table_name)
+    db.session.add(uf)
+    db.session.flush()
+
+    extra = {'user_id': user_id, 'file_id': uf.id, 'table_name': table_name}
+    # The flush above holds the database's write lock, so ids can be handed out
+    # here (MAX + 1, as SQLite would) and the staged index entries written
+    # against them without reading the documents back.
+    next_id = db.session.execute(tenant_text("SELECT COALESCE(MAX(id), 0) + 1 FROM documents")).scalar()
+    party_counts = {}
+    for batch in _staged_batches(staging_path, extra):
+        indexes = [row.pop('_index') for row in batch]
+        ids = range(next_id, next_id + len(batch))
+        for row, doc_id in zip(batch, ids):
+            row['id'] = doc_id
+        next_id += len(batch)
+        db.session.execute(insert(Document.__table__), batch)
+        _write_index(batch, ids, indexes, party_counts)
+    apply_party_counts(db.session, party_counts)
+
+    try:
+        fts_insert_file(db.session, uf.id)
+    except Exception as e:
+        # FTS may not be available for this DB; search falls back to LIKE
+        print("FTS skipped:", e)
+
+    db.session.commit()
+    metrics.observe('adoodle_write_lock_seconds', perf_counter() - start, op='ingest')
+    return uf
+
+
+def ingest_file(user_id, table_name, filename, fpath, sha256, docname_map, sro_map, resolver=None):
+    """Stages 2 + 3 for a file already on disk. Returns (UploadedFile, row count)."""
+    ingest_start = perf_counter()
+    staging_path, count = stage_file(fpath, docname_map, sro_map, resolver)
+    print(f"Parsed {count} rows from {filename}")
+    try:
+        uf = load_staged(user_id, table_name, filename, fpath, os.path.getsize(fpath), sha256, staging_path)
+    finally:
+        os.remove(staging_path)
+
+    elapsed = perf_counter() - ingest_start
+    metrics.inc('adoodle_ingest_rows_total', count)
+    metrics.observe('adoodle_ingest_file_duration_seconds', elapsed)
+    if count and elapsed > 0:
+        metrics.observe('adoodle_ingest_rows_per_second', count / elapsed)
+    return uf, count
@@ -0,0 +1,120 @@
+import json
+import os
+import socket
+from datetime import datetime, timedelta
+from threading import Thread
+from time import sleep
+
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import db, ScheduledJob
+
+# =========================================================
+# PERIODIC JOBS SHARED BY ALL GUNICORN WORKERS
+# Every worker runs the same scheduler thread; a row in
+# scheduled_jobs acts as the lock, so each due job runs in
+# exactly one worker and its last result is kept for admins.
+# =========================================================
+JOB_TICK_SECONDS = int(os.environ.get('JOB_TICK_SECONDS', '60'))
+
+_jobs = {}
+
+
+def register_job(name, interval_seconds, fn, lock_seconds=3600, when=None):
+    """
+    fn() runs inside an app context and returns a JSON-serializable result (or None).
+    when() is an optional extra condition (e.g. an off-peak window) for scheduled runs.
+    """
+    _jobs[name] = {'interval': interval_seconds, 'fn': fn, 'lock': lock_seconds, 'when': when}
+
+
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def try_acquire(name, interval_seconds, lock_seconds, force=False):
+    """Claim the job if it is due and not locked. Returns True if this worker owns it now."""
+    now = datetime.utcnow()
+    table = ScheduledJob.__table__
+
+    db.session.execute(sqlite_insert(table).values(name=name).on_conflict_do_nothing())
+    stmt = table.update().where(
+        table.c.name == name,
+        (table.c.locked_until.is_(None)) | (table.c.locked_until < now)
+    )
+    if not force:
+        stmt = stmt.where(
+            (table.c.last_finished_at.is_(None)) |
+            (table.c.last_finished_at < now - timedelta(seconds=interval_seconds))
+        )
+    result = db.session.execute(stmt.values(
+        locked_by=worker_id(),
+        locked_until=now + timedelta(seconds=lock_seconds),
+        last_started_at=now
+    ))
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def release(name, result):
+    table = ScheduledJob.__table__
+    db.session.execute(table.update().where(
+        table.c.name == name,
+        table.c.locked_by == worker_id()
+    ).values(
+        locked_by=None,
+        locked_until=None,
+        last_finished_at=datetime.utcnow(),
+        last_result=json.dumps(result, default=str) if result is not None else None
+    ))
+    db.session.commit()
+
+
+def run_job(app, name, force=False, **kwargs):
+    """
+    Run one registered job under its lock. Returns its result, or None if it is not
+    due / another worker has it. force=True ignores the schedule but not the lock.
+    """
+    job = _jobs[name]
+    if not force and job['when'] and not job['when']():
+        return None
+    with app.app_context():
+        try:
+            if not try_acquire(name, job['interval'], job['lock'], force=force):
+                return None
+        except Exception as e:
+            db.session.rollback()
+            print(f"Job {name}: lock error:", e)
+            return None
+
+        try:
+            result = job['fn'](**kwargs)
+        except Exception as e:
+            db.session.rollback()
+            result = {'error': str(e)}
+            print(f"Job {name} failed:", e)
+
+        try:
+            release(name, result)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Job {name}: release error:", e)
+        return result
+
+
+def start_scheduler(app):
+    def loop():
+        while True:
+            for name in list(_jobs):
+                run_job(app, name)
+            sleep(JOB_TICK_SECONDS)
+    Thread(target=loop, daemon=True, name="adoodle-jobs").start()
+
+
+def job_status():
+    out = []
+    for j in ScheduledJob.query.order_by(ScheduledJob.name).all():
+        d = j.as_dict()
+        d['interval_seconds'] = _jobs.get(j.name, {}).get('interval')
+        out.append(d)
+    return out
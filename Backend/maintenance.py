@@ -0,0 +1,168 @@
+import os
+from datetime import datetime
+from time import monotonic
+
+from models import db
+from tenants import tenant_ids, tenant_engine
+
+# =========================================================
+# DATABASE MAINTENANCE
+# Planner statistics, FTS segment merging and freelist
+# reclamation, all bounded by a time budget and normally run
+# inside the off-peak window (server local time). The central
+# database goes first, then the per-user files in turn. User
+# files are created with auto_vacuum=incremental (tenants.py);
+# older files and the central database only get incremental
+# vacuum after enable_incremental_vacuum switches them once.
+# =========================================================
+MAINTENANCE_WINDOW = os.environ.get('MAINTENANCE_WINDOW', '1-5')   # hours, start-end
+MAINTENANCE_TIME_BUDGET = float(os.environ.get('MAINTENANCE_TIME_BUDGET', '120'))
+FTS_MERGE_PAGES = int(os.environ.get('FTS_MERGE_PAGES', '500'))
+VACUUM_STEP_PAGES = int(os.environ.get('VACUUM_STEP_PAGES', '2000'))
+
+AUTO_VACUUM_MODES = {0: 'none', 1: 'full', 2: 'incremental'}
+
+
+def in_maintenance_window(now=None):
+    try:
+        start, end = (int(x) for x in MAINTENANCE_WINDOW.split('-'))
+    except ValueError:
+        return True
+    hour = (now or datetime.now()).hour
+    if start <= end:
+        return start <= hour < end
+    return hour >= start or hour < end
+
+
+def _pragma(conn, name):
+    return conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+
+
+def database_stats(conn):
+    page_size = _pragma(conn, 'page_size')
+    page_count = _pragma(conn, 'page_count')
+    freelist = _pragma(conn, 'freelist_count')
+    try:
+        fts_blocks = conn.exec_driver_sql("SELECT COUNT(*) FROM documents_fts_data").scalar()
+    except Exception:
+        fts_blocks = None
+    return {
+        'size_bytes': page_size * page_count,
+        'free_bytes': page_size * freelist,
+        'page_count': page_count,
+        'freelist_count': freelist,
+        'auto_vacuum': AUTO_VACUUM_MODES.get(_pragma(conn, 'auto_vacuum'), 'unknown'),
+        'fts_data_blocks': fts_blocks,
+    }
+
+
+def run_maintenance(time_budget=MAINTENANCE_TIME_BUDGET, enable_incremental_vacuum=False):
+    """
+    One maintenance pass over the central database and every user database.
+    Each step is skipped once the time budget is used up; databases not reached
+    are listed in 'skipped'; the order of user databases rotates daily so each gets its turn.
+    enable_incremental_vacuum switches an auto_vacuum=none database to
+    incremental mode; that needs a full VACUUM, so it is only done on request.
+    """
+    started = monotonic()
+    deadline = started + time_budget
+
+    users = tenant_ids()
+    if users:
+        offset = datetime.now().toordinal() % len(users)
+        users = users[offset:] + users[:offset]
+
+    databases, skipped = {}, []
+    targets = [('central', lambda: db.engine)] + [(f"user_{u}", lambda u=u: tenant_engine(u)) for u in users]
+    for name, get_engine in targets:
+        if monotonic() >= deadline:
+            skipped.append(name)
+            continue
+        databases[name] = maintain_database(get_engine(), started, deadline, enable_incremental_vacuum)
+
+    return {
+        'databases': databases,
+        'skipped': skipped,
+        'reclaimed_bytes': sum(d['reclaimed_bytes'] for d in databases.values()),
+        'seconds': round(monotonic() - started, 3),
+        'budget_exhausted': monotonic() >= deadline,
+    }
+
+
+def maintain_database(engine, started, deadline, enable_incremental_vacuum=False):
+    """ANALYZE / FTS merge / incremental vacuum on one database file."""
+    db_started = monotonic()
+    steps = {}
+
+    # VACUUM / incremental_vacuum cannot run inside a transaction
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        before = database_stats(conn)
+
+        # 1. planner statistics
+        t = monotonic()
+        has_stats = conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"
+        ).scalar()
+        conn.exec_driver_sql("PRAGMA analysis_limit = 1000")
+        if has_stats:
+            conn.exec_driver_sql("PRAGMA optimize")
+            steps['analyze'] = {'mode': 'optimize'}
+        else:
+            conn.exec_driver_sql("ANALYZE")
+            steps['analyze'] = {'mode': 'full'}
+        steps['analyze']['seconds'] = round(monotonic() - t, 3)
+
+        # 2. FTS (user databases only): incremental merges, then a full optimize if time allows
+        t = monotonic()
+        merges = 0
+        has_fts = conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE name = 'documents_fts'"
+        ).scalar()
+        if not has_fts:
+            steps['fts'] = {'skipped': True}
+        else:
+            try:
+                while monotonic() < deadline:
+                    before_changes = conn.exec_driver_sql("SELECT total_changes()").scalar()
+                    conn.exec_driver_sql(
+                        f"INSERT INTO documents_fts(documents_fts, rank) VALUES ('merge', {FTS_MERGE_PAGES})"
+                    )
+                    merges += 1
+                    if conn.exec_driver_sql("SELECT total_changes()").scalar() - before_changes <= 1:
+                        break
+                optimized = False
+                if monotonic() < started + (deadline - started) / 2:
+                    conn.exec_driver_sql("INSERT INTO documents_fts(documents_fts) VALUES ('optimize')")
+                    optimized = True
+                steps['fts'] = {'merges': merges, 'optimized': optimized}
+            except Exception as e:
+                steps['fts'] = {'error': str(e)}
+        steps['fts']['seconds'] = round(monotonic() - t, 3)
+
+        # 3. reclaim free pages
+        t = monotonic()
+        mode = _pragma(conn, 'auto_vacuum')
+        if mode == 0 and enable_incremental_vacuum:
+            conn.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.exec_driver_sql("VACUUM")
+            steps['vacuum'] = {'mode': 'full vacuum, switched to incremental'}
+        elif mode == 2:
+            pages = 0
+            while monotonic() < deadline and _pragma(conn, 'freelist_count') > 0:
+                # the pragma frees one page per result row, so step through all of them
+                conn.exec_driver_sql(f"PRAGMA incremental_vacuum({VACUUM_STEP_PAGES})").fetchall()
+                pages += VACUUM_STEP_PAGES
+            steps['vacuum'] = {'mode': 'incremental', 'max_pages': pages}
+        else:
+            steps['vacuum'] = {'mode': 'skipped', 'reason': f"auto_vacuum={AUTO_VACUUM_MODES.get(mode)}"}
+        steps['vacuum']['seconds'] = round(monotonic() - t, 3)
+
+        after = database_stats(conn)
+
+    return {
+        'before': before,
+        'after': after,
+        'reclaimed_bytes': before['size_bytes'] - after['size_bytes'],
+        'steps': steps,
+        'seconds': round(monotonic() - db_started, 3),
+    }
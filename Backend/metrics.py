@@ -0,0 +1,195 @@
+import glob
+import json
+import os
+import tempfile
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import Lock
+from time import monotonic, perf_counter
+
+# =========================================================
+# PROMETHEUS-STYLE METRICS
+# Each process keeps its own counters / histograms and writes a
+# snapshot to METRICS_DIR every few seconds; /metrics merges the
+# snapshots of all gunicorn workers into one exposition.
+# =========================================================
+METRICS_DIR = os.environ.get('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'adoodle_metrics'))
+METRICS_FLUSH_SECONDS = float(os.environ.get('METRICS_FLUSH_SECONDS', '5'))
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+RATE_BUCKETS = (100, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000)
+
+# name → (type, help, buckets)
+METRICS = {
+    'adoodle_http_requests_total': ('counter', 'HTTP requests by endpoint, method and status.', None),
+    'adoodle_http_request_duration_seconds': ('histogram', 'Time to produce the response, by endpoint.', DEFAULT_BUCKETS),
+    'adoodle_sql_queries_total': ('counter', 'SQL statements executed, by endpoint.', None),
+    'adoodle_sql_query_duration_seconds': ('histogram', 'Duration of single SQL statements, by endpoint.', DEFAULT_BUCKETS),
+    'adoodle_sql_queries_per_request': ('histogram', 'SQL statements per HTTP request, by endpoint.', COUNT_BUCKETS),
+    'adoodle_sql_errors_total': ('counter', 'SQL errors by kind (locked = SQLite busy / lock wait timeout).', None),
+    'adoodle_extract_duration_seconds': ('histogram', 'Time to parse one uploaded file, by parser.', DEFAULT_BUCKETS),
+    'adoodle_extract_rows_total': ('counter', 'Rows produced by the extractor, by parser.', None),
+    'adoodle_ingest_rows_total': ('counter', 'Document rows ingested.', None),
+    'adoodle_ingest_rows_per_second': ('histogram', 'Ingestion throughput per uploaded file.', RATE_BUCKETS),
+    'adoodle_ingest_file_duration_seconds': ('histogram', 'Parse + load time per uploaded file.', DEFAULT_BUCKETS),
+    'adoodle_write_lock_seconds': ('histogram', 'Time a write transaction holds the SQLite write lock, by operation.', DEFAULT_BUCKETS),
+    'adoodle_cache_requests_total': ('counter', 'Cache lookups by cache and result (hit / miss).', None),
+}
+
+_lock = Lock()
+_counters = {}     # (name, labels) → value
+_histograms = {}   # (name, labels) → [bucket counts..., sum, count]
+_last_flush = [0.0]
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _buckets(name):
+    spec = METRICS.get(name)
+    return (spec[2] if spec and spec[2] else DEFAULT_BUCKETS)
+
+
+def inc(name, value=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, value, **labels):
+    key = _key(name, labels)
+    buckets = _buckets(name)
+    with _lock:
+        h = _histograms.get(key)
+        if h is None:
+            h = _histograms[key] = [0] * (len(buckets) + 2)
+        idx = bisect_left(buckets, value)
+        if idx < len(buckets):
+            h[idx] += 1
+        h[-2] += value
+        h[-1] += 1
+
+
+@contextmanager
+def timer(name, **labels):
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, perf_counter() - start, **labels)
+
+
+def cache_result(cache, hit):
+    inc('adoodle_cache_requests_total', cache=cache, result='hit' if hit else 'miss')
+
+
+# =========================================================
+# MULTI-PROCESS SNAPSHOTS
+# =========================================================
+def _snapshot_path(pid=None):
+    return os.path.join(METRICS_DIR, f"metrics_{pid or os.getpid()}.json")
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:   # exists, owned by someone else
+        return True
+    return True
+
+
+def clear_snapshots():
+    """Drop every snapshot (gunicorn on_starting: totals from a previous run must not be merged)."""
+    for path in glob.glob(os.path.join(METRICS_DIR, 'metrics_*.json*')):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def flush(force=False):
+    now = monotonic()
+    if not force and now - _last_flush[0] < METRICS_FLUSH_SECONDS:
+        return
+    _last_flush[0] = now
+    with _lock:
+        data = {
+            'counters': [[k[0], k[1], v] for k, v in _counters.items()],
+            'histograms': [[k[0], k[1], v] for k, v in _histograms.items()],
+        }
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        tmp = _snapshot_path() + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, _snapshot_path())
+    except OSError as e:
+        print("Metrics flush failed:", e)
+
+
+def _merged():
+    flush(force=True)
+    counters, histograms = {}, {}
+    for path in glob.glob(os.path.join(METRICS_DIR, 'metrics_*.json')):
+        pid = os.path.basename(path)[len('metrics_'):-len('.json')]
+        if pid.isdigit() and not _pid_alive(int(pid)):
+            # a dead worker: its totals would linger, and a new process with the same pid would overwrite them
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for name, labels, value in data.get('counters', []):
+            key = (name, tuple(tuple(p) for p in labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, values in data.get('histograms', []):
+            key = (name, tuple(tuple(p) for p in labels))
+            cur = histograms.get(key)
+            histograms[key] = values if cur is None else [a + b for a, b in zip(cur, values)]
+    return counters, histograms
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _fmt_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def render():
+    """Prometheus text exposition (format 0.0.4) of all workers' metrics."""
+    counters, histograms = _merged()
+    lines = []
+    for name, (mtype, help_text, _) in METRICS.items():
+        series = [(k, v) for k, v in counters.items() if k[0] == name] if mtype == 'counter' else \
+                 [(k, v) for k, v in histograms.items() if k[0] == name]
+        if not series:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {mtype}")
+        for (_, labels), value in sorted(series):
+            if mtype == 'counter':
+                lines.append(f"{name}{_fmt_labels(labels)} {value}")
+                continue
+            buckets = _buckets(name)
+            cumulative = 0
+            for i, le in enumerate(buckets):
+                cumulative += value[i]
+                lines.append(f"{name}_bucket{_fmt_labels(labels, [('le', le)])} {cumulative}")
+            lines.append(f"{name}_bucket{_fmt_labels(labels, [('le', '+Inf')])} {value[-1]}")
+            lines.append(f"{name}_sum{_fmt_labels(labels)} {value[-2]}")
+            lines.append(f"{name}_count{_fmt_labels(labels)} {value[-1]}")
+    return "\n".join(lines) + "\n"
@@ -1,7 +1,12 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import inspect, text
 from datetime import datetime
+import json
 
-db = SQLAlchemy()
+from tenants import TenantSession, tenant_text
+
+# Tables listed in tenants.TENANT_TABLES live in one SQLite file per user
+db = SQLAlchemy(session_options={'class_': TenantSession})
 
 # File metadata table: stores raw uploaded file info and path
 class UploadedFile(db.Model):
@@ -12,10 +17,9 @@ class UploadedFile(db.Model):
     filepath = db.Column(db.String, nullable=False)
     upload_date = db.Column(db.DateTime, default=datetime.utcnow)
     filesize = db.Column(db.Integer)
+    sha256 = db.Column(db.String(64), index=True)   # content hash, computed while saving
     table_name = db.Column(db.String, nullable=False)
 
-    user = db.relationship('User', backref=db.backref('uploaded_files', lazy='dynamic'))
-
 
 # Documents table: one row per extracted Excel row / record
 class Document(db.Model):
@@ -45,11 +49,77 @@ class Document(db.Model):
     areaname = db.Column(db.String)
     sroname = db.Column(db.String)
 
+    # --- English derived fields (filled at ingestion, see extractor.derive_english_fields) ---
+    docname_en = db.Column(db.String, index=True)
+    sro_code_en = db.Column(db.String)
+    reg_year = db.Column(db.String(4), index=True)
+
     # --- Other ---
     raw_json = db.Column(db.Text)
 
     uploaded_file = db.relationship('UploadedFile', backref=db.backref('documents', lazy='dynamic'))
-    user = db.relationship('User', backref=db.backref('documents', lazy='dynamic'))
+
+    # /search range filters + sort: top-N by amount / date straight from an index,
+    # with or without a table (and a year, for amounts) in the filter
+    __table_args__ = (
+        db.Index('ix_documents_user_consideration', 'user_id', 'consideration_amt'),
+        db.Index('ix_documents_user_table_consideration', 'user_id', 'table_name', 'consideration_amt'),
+        db.Index('ix_documents_user_year_consideration', 'user_id', 'reg_year', 'consideration_amt'),
+        db.Index('ix_documents_user_marketvalue', 'user_id', 'marketvalue'),
+        db.Index('ix_documents_user_table_marketvalue', 'user_id', 'table_name', 'marketvalue'),
+        db.Index('ix_documents_user_regdate', 'user_id', 'registrationdate'),
+        db.Index('ix_documents_user_table_regdate', 'user_id', 'table_name', 'registrationdate'),
+    )
+
+
+# === Marathi → English dictionary used for exports / English search ===
+# kind = 'docname' (full document type name) or 'sro' (SRO place → short code prefix)
+class Translation(db.Model):
+    __tablename__ = 'translations'
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)
+    source = db.Column(db.String, nullable=False)
+    target = db.Column(db.String, nullable=False)
+
+    __table_args__ = (db.UniqueConstraint('kind', 'source', name='uq_translation_kind_source'),)
+
+    def as_dict(self):
+        return {"id": self.id, "kind": self.kind, "source": self.source, "target": self.target}
+
+
+# === Header aliases added by admins (normalized header → document field),
+# on top of extractor.COLUMN_MAP ===
+class HeaderAlias(db.Model):
+    __tablename__ = 'header_aliases'
+    id = db.Column(db.Integer, primary_key=True)
+    alias = db.Column(db.String, nullable=False, unique=True)
+    field = db.Column(db.String(64), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def as_dict(self):
+        return {"id": self.id, "alias": self.alias, "field": self.field,
+                "created_at": self.created_at.isoformat() if self.created_at else None}
+
+
+# === Resolved header layouts, keyed by a fingerprint of the normalized header
+# row (see headers.py); cleared whenever the aliases change ===
+class HeaderLayout(db.Model):
+    __tablename__ = 'header_layouts'
+    fingerprint = db.Column(db.String(40), primary_key=True)
+    headers_json = db.Column(db.Text, nullable=False)
+    mapping_json = db.Column(db.Text, nullable=False)   # [[field, how], ...] per column
+    alias_version = db.Column(db.String(40))             # headers.alias_version() it was resolved with
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def as_dict(self):
+        headers = json.loads(self.headers_json)
+        mapping = json.loads(self.mapping_json)
+        return {
+            "fingerprint": self.fingerprint,
+            "columns": [{"header": h, "field": m[0], "match": m[1]} for h, m in zip(headers, mapping)],
+            "unmapped": [h for h, m in zip(headers, mapping) if h and not m[0]],
+            "created_at": self.created_at.isoformat() if self.created_at else None
+        }
 
 
 # === New: persistent selected entries (one row per saved selection) ===
@@ -63,7 +133,70 @@ class SelectedEntry(db.Model):
     table_name = db.Column(db.String, nullable=False)
 
     document = db.relationship('Document', backref=db.backref('selected_entries', lazy='dynamic'))
-    user = db.relationship('User', backref=db.backref('selected_entries', lazy='dynamic'))
+
+
+# === Distinct party names of a user with the number of documents they appear
+# in, kept in step with documents by ingestion / retention (see parties.py);
+# name_key is the case-folded form the typeahead matches prefixes on ===
+class PartyName(db.Model):
+    __tablename__ = 'party_names'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    role = db.Column(db.String(16), nullable=False)    # 'purchaser' / 'seller'
+    name = db.Column(db.String, nullable=False)
+    name_key = db.Column(db.String, nullable=False)
+    doc_count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'role', 'name_key', name='uq_party_names_user_role_key'),
+        db.Index('ix_party_names_user_key', 'user_id', 'name_key'),
+    )
+
+
+# === Fuzzy party index: one row per phonetic key of each party name of a
+# document, with the transliterated name for re-ranking (see parties.py) ===
+class PartyKey(db.Model):
+    __tablename__ = 'party_keys'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    document_id = db.Column(db.Integer, db.ForeignKey('documents.id', ondelete='CASCADE'), nullable=False, index=True)
+    role = db.Column(db.String(16), nullable=False)
+    key = db.Column(db.String(32), nullable=False)     # translit.phonetic_key
+    latin = db.Column(db.String, nullable=False)       # translit.latin_key of the whole name
+
+    __table_args__ = (db.Index('ix_party_keys_user_key_role', 'user_id', 'key', 'role'),)
+
+
+# === Chain of title (see chain.py): one edge per seller → purchaser pair of
+# a document, names as translit.latin_key so both scripts meet ===
+class TransferEdge(db.Model):
+    __tablename__ = 'transfer_edges'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    document_id = db.Column(db.Integer, db.ForeignKey('documents.id', ondelete='CASCADE'), nullable=False, index=True)
+    seller = db.Column(db.String, nullable=False)
+    purchaser = db.Column(db.String, nullable=False)
+    seller_name = db.Column(db.String)
+    purchaser_name = db.Column(db.String)
+    regdate = db.Column(db.String(10))     # documents.registrationdate (YYYY-MM-DD)
+
+    __table_args__ = (
+        db.Index('ix_transfer_edges_user_seller', 'user_id', 'seller', 'regdate'),
+        db.Index('ix_transfer_edges_user_purchaser', 'user_id', 'purchaser', 'regdate'),
+    )
+
+
+# === Property identifiers parsed from propertydescription
+# (extractor.extract_property_ids) ===
+class PropertyRef(db.Model):
+    __tablename__ = 'property_refs'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    document_id = db.Column(db.Integer, db.ForeignKey('documents.id', ondelete='CASCADE'), nullable=False, index=True)
+    kind = db.Column(db.String(16), nullable=False)    # survey / gat / cts / flat / plot
+    number = db.Column(db.String(64), nullable=False)
+
+    __table_args__ = (db.Index('ix_property_refs_user_kind_number', 'user_id', 'kind', 'number'),)
 
 
 # === New: search history records ===
@@ -77,6 +210,36 @@ class SearchHistory(db.Model):
     user = db.relationship('User', backref=db.backref('search_history', lazy='dynamic'))
 
 
+# === Per-user data version: bumped whenever a user's documents, uploads or
+# selections change; used to build ETags for the polling endpoints ===
+class UserDataVersion(db.Model):
+    __tablename__ = 'user_data_versions'
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+# === Periodic job lock + last run (see jobs.py) ===
+class ScheduledJob(db.Model):
+    __tablename__ = 'scheduled_jobs'
+    name = db.Column(db.String(64), primary_key=True)
+    locked_by = db.Column(db.String(128))
+    locked_until = db.Column(db.DateTime)
+    last_started_at = db.Column(db.DateTime)
+    last_finished_at = db.Column(db.DateTime)
+    last_result = db.Column(db.Text)   # JSON
+
+    def as_dict(self):
+        return {
+            "name": self.name,
+            "locked_by": self.locked_by,
+            "locked_until": self.locked_until.isoformat() if self.locked_until else None,
+            "last_started_at": self.last_started_at.isoformat() if self.last_started_at else None,
+            "last_finished_at": self.last_finished_at.isoformat() if self.last_finished_at else None,
+            "last_result": json.loads(self.last_result) if self.last_result else None
+        }
+
+
 # --- New: User model for authentication ---
 class User(db.Model):
     __tablename__ = 'user'
@@ -91,6 +254,7 @@ class User(db.Model):
     is_admin = db.Column(db.Boolean, default=False)   # Super Admin flag
     is_active = db.Column(db.Boolean, default=True)   # Active/Inactive
     expiry_date = db.Column(db.DateTime, nullable=True)
+    auth_version = db.Column(db.Integer, default=0)   # bumped on admin changes, checked by the auth cache
 
     def as_dict(self):
         return {
@@ -105,3 +269,44 @@ class User(db.Model):
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "expiry_date": self.expiry_date.isoformat() if self.expiry_date else None
         }
+
+
+# --- Bulk insert through one JSON parameter ---
+def bulk_insert(conn, table, columns, rows, on_conflict=None):
+    """
+    Insert rows (sequences in `columns` order) with a single INSERT ... SELECT
+    over json_each(): one bound parameter instead of one set per row, which
+    keeps large index writes cheap. For tenant tables only (see tenants.py).
+    conn: session or connection; caller commits.
+    """
+    if not rows:
+        return 0
+    values = ", ".join(f"json_extract(value, '$[{i}]')" for i in range(len(columns)))
+    # "WHERE true" lets SQLite parse an upsert after INSERT ... SELECT
+    upsert = f" WHERE true {on_conflict}" if on_conflict else ""
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) SELECT {values} FROM json_each(:rows){upsert}"
+    conn.execute(tenant_text(sql), {'rows': json.dumps(rows, ensure_ascii=False)})
+    return len(rows)
+
+
+# --- Schema upgrade for existing databases ---
+def upgrade_schema(engine=None, tables=None):
+    """
+    db.create_all() only creates missing tables. Add any columns / indexes
+    declared on the models that an older database file does not have yet.
+    """
+    engine = engine or db.engine
+    insp = inspect(engine)
+    with engine.begin() as conn:
+        for table in tables or db.metadata.sorted_tables:
+            if not insp.has_table(table.name):
+                continue
+            existing = {c['name'] for c in insp.get_columns(table.name)}
+            for col in table.columns:
+                if col.name in existing:
+                    continue
+                coltype = col.type.compile(dialect=conn.dialect)
+                conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{col.name}" {coltype}'))
+                print(f"Schema upgrade: added {table.name}.{col.name}")
+            for idx in table.indexes:
+                idx.create(conn, checkfirst=True)
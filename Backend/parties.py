@@ -0,0 +1,226 @@
+import os
+import re
+from collections import Counter
+
+from models import bulk_insert
+from tenants import tenant_text
+from translit import latin_key, phonetic_keys, name_distance
+
+# =========================================================
+# PARTY NAMES
+# purchasername / sellername hold every party of a document in one
+# text ("1): नाव:-… वय:-… पत्ता:-… 2): नाव:-…"). split_parties()
+# pulls out the names; party_names keeps one row per (user, role, name)
+# with the number of documents it appears in. Rows are added in the
+# ingestion transaction and subtracted when retention purges
+# documents, so the typeahead never scans documents.
+#
+# party_keys is the fuzzy index: each name's words as phonetic keys
+# (translit.py), so Devanagari and romanized spellings of a name meet
+# on the same keys. A fuzzy lookup fetches candidates by key through
+# the index and re-ranks them by edit distance on the transliterated
+# name.
+# =========================================================
+PARTY_ROLES = {'purchaser': 'purchasername', 'seller': 'sellername'}
+PARTY_NAME_MAX = 160
+SUGGEST_LIMIT = int(os.environ.get('SUGGEST_LIMIT', '10'))
+SUGGEST_MAX_LIMIT = 50
+FUZZY_MAX_DISTANCE = float(os.environ.get('FUZZY_MAX_DISTANCE', '0.35'))
+FUZZY_MAX_CANDIDATES = int(os.environ.get('FUZZY_MAX_CANDIDATES', '5000'))
+
+_PARTY_SPLIT_RE = re.compile(r"(?:^|\s)\d{1,2}\)\s*:?\s*")
+_NAME_LABEL_RE = re.compile(r"(?:नाव|\bname\b)\s*[:：]?\s*-?\s*", re.I)
+_STOP_RE = re.compile(r"\s*(?:वय|पत्ता|पॅन|पिन|\bage\b|\baddress\b|\bpan\b|\bpin\b)\s*[:：-]", re.I)
+_KEY_DROP = str.maketrans({c: None for c in ".,;:'\"()"})
+
+# upper bound for a prefix range on BINARY-collated text
+_PREFIX_END = "\U0010ffff"
+
+
+def split_parties(value):
+    """Party text of one document → distinct names in order of appearance."""
+    if not value:
+        return []
+    names = []
+    for part in _PARTY_SPLIT_RE.split(str(value)):
+        m = _NAME_LABEL_RE.search(part)
+        if m:
+            part = part[m.end():]
+        stop = _STOP_RE.search(part)
+        if stop:
+            part = part[:stop.start()]
+        name = " ".join(part.strip(" ,;:-").split())[:PARTY_NAME_MAX]
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def name_key(name):
+    """Lookup key: case-folded, punctuation dropped, single spaces."""
+    return " ".join(name.casefold().translate(_KEY_DROP).split())
+
+
+def document_parties(row):
+    """Distinct parties of one document: [(role, name_key, name)]."""
+    out = []
+    for role, field in PARTY_ROLES.items():
+        seen = set()
+        for name in split_parties(row.get(field)):
+            key = name_key(name)
+            if key and key not in seen:
+                seen.add(key)
+                out.append((role, key, name))
+    return out
+
+
+def party_keys(parties):
+    """document_parties() → [(role, phonetic key, latin name)] for party_keys."""
+    out = []
+    for role, _, name in parties:
+        latin = latin_key(name)
+        for key in phonetic_keys(name):
+            if (role, key, latin) not in out:
+                out.append((role, key, latin))
+    return out
+
+
+def count_party_names(rows):
+    """rows with user_id, purchasername / sellername → {(user_id, role, key): [display name, documents]}."""
+    counts = {}
+    for r in rows:
+        for role, key, name in document_parties(r):
+            counts.setdefault((r['user_id'], role, key), [name, 0])[1] += 1
+    return counts
+
+
+def apply_party_counts(conn, counts, sign=1):
+    """Add (sign=1) or subtract (sign=-1) document counts. conn: session or connection; caller commits."""
+    if not counts:
+        return
+    if sign > 0:
+        bulk_insert(conn, 'party_names', ['user_id', 'role', 'name_key', 'name', 'doc_count'],
+                    [[user_id, role, key, name, n] for (user_id, role, key), (name, n) in counts.items()],
+                    on_conflict="ON CONFLICT(user_id, role, name_key) "
+                                "DO UPDATE SET doc_count = doc_count + excluded.doc_count")
+        return
+    conn.execute(tenant_text("""
+        UPDATE party_names SET doc_count = doc_count - :n
+        WHERE user_id = :user_id AND role = :role AND name_key = :name_key
+    """), [{'user_id': user_id, 'role': role, 'name_key': key, 'n': n}
+           for (user_id, role, key), (_, n) in counts.items()])
+    conn.execute(tenant_text("DELETE FROM party_names WHERE doc_count <= 0"))
+
+
+def rebuild_party_names(conn, batch_size=5000):
+    """Recount every name from documents. Returns the number of names."""
+    conn.execute(tenant_text("DELETE FROM party_names"))
+    counts, last_id = Counter(), 0
+    names = {}
+    while True:
+        rows = conn.execute(tenant_text("""
+            SELECT id, user_id, purchasername, sellername FROM documents
+            WHERE id > :last_id ORDER BY id LIMIT :limit
+        """), {'last_id': last_id, 'limit': batch_size}).mappings().fetchall()
+        if not rows:
+            break
+        for k, (name, n) in count_party_names(rows).items():
+            names.setdefault(k, name)
+            counts[k] += n
+        last_id = rows[-1]['id']
+    apply_party_counts(conn, {k: [names[k], n] for k, n in counts.items()})
+    return len(counts)
+
+
+PARTY_KEY_COLUMNS = ['user_id', 'document_id', 'role', 'key', 'latin']
+
+
+def party_key_rows(user_id, document_id, keys):
+    """party_keys() of one document → rows in PARTY_KEY_COLUMNS order."""
+    return [[user_id, document_id, role, key, latin] for role, key, latin in keys]
+
+
+def insert_party_keys(conn, rows):
+    """Rows from party_key_rows(). Caller commits."""
+    return bulk_insert(conn, 'party_keys', PARTY_KEY_COLUMNS, rows)
+
+
+def rebuild_party_keys(conn, batch_size=5000):
+    """Re-index every document. Returns the number of keys."""
+    conn.execute(tenant_text("DELETE FROM party_keys"))
+    last_id, total = 0, 0
+    while True:
+        rows = conn.execute(tenant_text("""
+            SELECT id, user_id, purchasername, sellername FROM documents
+            WHERE id > :last_id ORDER BY id LIMIT :limit
+        """), {'last_id': last_id, 'limit': batch_size}).mappings().fetchall()
+        if not rows:
+            return total
+        total += insert_party_keys(conn, [p for r in rows for p in party_key_rows(
+            r['user_id'], r['id'], party_keys(document_parties(r)))])
+        last_id = rows[-1]['id']
+
+
+def ensure_party_index(conn):
+    """Fill party_names / party_keys for a database with documents from before the tables existed."""
+    if conn.execute(tenant_text("SELECT 1 FROM documents LIMIT 1")).first():
+        if not conn.execute(tenant_text("SELECT 1 FROM party_names LIMIT 1")).first():
+            print(f"Party names indexed ({rebuild_party_names(conn)} names).")
+        if not conn.execute(tenant_text("SELECT 1 FROM party_keys LIMIT 1")).first():
+            print(f"Fuzzy party index built ({rebuild_party_keys(conn)} keys).")
+    conn.commit()
+
+
+def fuzzy_party_matches(conn, user_id, name, role=None):
+    """
+    A user's documents with a party (of role, if given) whose name sounds like `name`:
+    {document_id: distance 0..1}, only those within FUZZY_MAX_DISTANCE.
+    Raises ValueError when the name has no usable key.
+    """
+    keys = phonetic_keys(name)
+    if not keys:
+        raise ValueError("name too short for a fuzzy match")
+    query = latin_key(name)
+    placeholders = ", ".join(f":k{i}" for i in range(len(keys)))
+    params = {f"k{i}": k for i, k in enumerate(keys)}
+    # one misspelt word may miss its key when the name has three or more
+    params.update(user_id=user_id, need=len(keys) - (1 if len(keys) >= 3 else 0), limit=FUZZY_MAX_CANDIDATES)
+    role_filter = ""
+    if role:
+        role_filter = "AND role = :role"
+        params['role'] = role
+    rows = conn.execute(tenant_text(f"""
+        SELECT document_id, latin FROM party_keys
+        WHERE user_id = :user_id AND key IN ({placeholders}) {role_filter}
+        GROUP BY document_id, role, latin
+        HAVING COUNT(DISTINCT key) >= :need
+        LIMIT :limit
+    """), params).fetchall()
+
+    distances, matches = {}, {}
+    for document_id, latin in rows:
+        if latin not in distances:
+            distances[latin] = name_distance(query, latin)
+        d = distances[latin]
+        if d <= FUZZY_MAX_DISTANCE and d < matches.get(document_id, 2):
+            matches[document_id] = d
+    return matches
+
+
+def suggest_party_names(conn, user_id, prefix, role=None, limit=SUGGEST_LIMIT):
+    """A user's names starting with prefix, most documents first: [{'name', 'documents'}]."""
+    key = name_key(prefix or "")
+    if not key:
+        return []
+    params = {'user_id': user_id, 'lo': key, 'hi': key + _PREFIX_END, 'limit': max(1, min(limit, SUGGEST_MAX_LIMIT))}
+    role_filter = ""
+    if role:
+        role_filter = "AND role = :role"
+        params['role'] = role
+    rows = conn.execute(tenant_text(f"""
+        SELECT MIN(name), SUM(doc_count) AS documents FROM party_names
+        WHERE user_id = :user_id AND name_key >= :lo AND name_key < :hi {role_filter}
+        GROUP BY name_key
+        ORDER BY documents DESC, name_key
+        LIMIT :limit
+    """), params).fetchall()
+    return [{'name': r[0], 'documents': r[1]} for r in rows]
@@ -0,0 +1,128 @@
+import cProfile
+import glob
+import json
+import os
+import pstats
+import uuid
+from datetime import datetime
+from time import perf_counter
+
+from metrics import METRICS_DIR
+
+# =========================================================
+# PER-REQUEST PROFILER (admin opt-in)
+# Enabled with the X-Adoodle-Profile: 1 header or ?_profile=1.
+# The request (and, for streamed responses, the body generator)
+# runs under cProfile; the top-N functions are stored under an
+# id returned in the X-Profile-Id response header.
+# =========================================================
+PROFILE_HEADER = 'X-Adoodle-Profile'
+PROFILE_ARG = '_profile'
+PROFILE_TOP_N = int(os.environ.get('PROFILE_TOP_N', '40'))
+PROFILE_KEEP = int(os.environ.get('PROFILE_KEEP', '50'))
+
+
+def requested(req):
+    return req.headers.get(PROFILE_HEADER) == '1' or req.args.get(PROFILE_ARG) == '1'
+
+
+class RequestProfile:
+    def __init__(self, method, path, user_id):
+        self.id = uuid.uuid4().hex[:12]
+        self.method = method
+        self.path = path
+        self.user_id = user_id
+        self.started_at = datetime.utcnow()
+        self.profiler = cProfile.Profile()
+        self._t0 = perf_counter()
+
+    def enable(self):
+        self.profiler.enable()
+
+    def disable(self):
+        self.profiler.disable()
+
+    def finish(self, status):
+        self.disable()
+        save(self._summary(status))
+
+    def _summary(self, status):
+        stats = pstats.Stats(self.profiler)
+        rows = []
+        for (filename, line, func), (cc, nc, tt, ct, _) in stats.stats.items():
+            rows.append({
+                'function': f"{func} ({os.path.basename(filename)}:{line})" if line else func,
+                'calls': nc,
+                'primitive_calls': cc,
+                'tottime': round(tt, 6),
+                'cumtime': round(ct, 6),
+            })
+        return {
+            'id': self.id,
+            'at': self.started_at.isoformat(),
+            'method': self.method,
+            'path': self.path,
+            'user_id': self.user_id,
+            'status': status,
+            'wall_seconds': round(perf_counter() - self._t0, 6),
+            'total_calls': stats.total_calls,
+            'top_cumulative': sorted(rows, key=lambda r: r['cumtime'], reverse=True)[:PROFILE_TOP_N],
+            'top_tottime': sorted(rows, key=lambda r: r['tottime'], reverse=True)[:PROFILE_TOP_N],
+        }
+
+
+def profiled_iter(iterable, profile, status):
+    """Wrap a streamed body so the generator work is profiled too."""
+    profile.enable()
+    try:
+        for chunk in iterable:
+            profile.disable()
+            yield chunk
+            profile.enable()
+    finally:
+        profile.enable()
+        if hasattr(iterable, 'close'):
+            iterable.close()
+        profile.finish(status)
+
+
+# =========================================================
+# STORAGE (shared dir, so any worker can serve the result)
+# =========================================================
+def _path(profile_id):
+    return os.path.join(METRICS_DIR, f"profile_{profile_id}.json")
+
+
+def save(summary):
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        with open(_path(summary['id']), 'w', encoding='utf-8') as f:
+            json.dump(summary, f)
+        files = sorted(glob.glob(os.path.join(METRICS_DIR, 'profile_*.json')), key=os.path.getmtime)
+        for old in files[:-PROFILE_KEEP]:
+            os.remove(old)
+    except OSError as e:
+        print("Profile save failed:", e)
+
+
+def load(profile_id):
+    if not profile_id.isalnum():
+        return None
+    try:
+        with open(_path(profile_id), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def list_profiles():
+    out = []
+    for path in glob.glob(os.path.join(METRICS_DIR, 'profile_*.json')):
+        try:
+            with open(path, encoding='utf-8') as f:
+                p = json.load(f)
+        except (OSError, ValueError):
+            continue
+        out.append({k: p[k] for k in ('id', 'at', 'method', 'path', 'user_id', 'status', 'wall_seconds')})
+    out.sort(key=lambda p: p['at'], reverse=True)
+    return out
@@ -0,0 +1,234 @@
+import glob
+import hashlib
+import json
+import os
+import secrets
+from collections import OrderedDict
+from datetime import datetime
+from threading import Lock
+from time import time
+
+try:
+    import fcntl
+except ImportError:   # Windows dev machines: only the in-process lock applies
+    fcntl = None
+
+# =========================================================
+# RESUMABLE (CHUNKED) UPLOADS
+#   init      → upload id, stored as <id>.json + <id>.part under
+#               UPLOAD_FOLDER/<user>/.partial/
+#   PUT chunk → appended at an explicit offset, streamed to disk
+#   status    → current offset, so a client can resume after a drop
+#   complete  → .part renamed into the table folder (no copy) and
+#               handed to ingestion; the session is closed only once
+#               ingestion succeeded, after a failure the file goes back
+#               to .part so complete can simply be retried
+# The .part file size is the source of truth for the offset, so any
+# gunicorn worker can take the next chunk. The running SHA-256 is
+# kept per process and rebuilt from disk when a chunk lands on a
+# worker that has not seen the previous one.
+# =========================================================
+CHUNK_MAX_BYTES = int(os.environ.get('UPLOAD_CHUNK_MAX_BYTES', str(16 * 1024 * 1024)))
+CHUNK_SIZE_HINT = int(os.environ.get('UPLOAD_CHUNK_SIZE', str(8 * 1024 * 1024)))
+UPLOAD_MAX_BYTES = int(os.environ.get('UPLOAD_MAX_BYTES', str(2 * 1024 * 1024 * 1024)))
+UPLOAD_SESSION_TTL = int(os.environ.get('UPLOAD_SESSION_TTL', str(24 * 60 * 60)))
+HASHER_CACHE = int(os.environ.get('UPLOAD_HASHER_CACHE', '64'))
+COPY_CHUNK = 1024 * 1024
+
+_lock = Lock()
+_hashers = OrderedDict()   # upload id → (offset, sha256 object)
+
+
+class UploadError(Exception):
+    """Raised with an HTTP status for the route to return."""
+
+    def __init__(self, message, status=400, **extra):
+        super().__init__(message)
+        self.status = status
+        self.extra = extra
+
+
+def partial_dir(upload_folder, user_id):
+    return os.path.join(upload_folder, str(user_id), '.partial')
+
+
+def _paths(upload_folder, user_id, upload_id):
+    # ids are generated by token_hex; anything else cannot name a session
+    if not upload_id or not all(c in '0123456789abcdef' for c in upload_id):
+        raise UploadError('Upload not found', 404)
+    base = os.path.join(partial_dir(upload_folder, user_id), upload_id)
+    return base + '.json', base + '.part'
+
+
+def create(upload_folder, user_id, filename, table_name, size, sha256=None):
+    if size is None or size <= 0:
+        raise UploadError('size (total bytes) required')
+    if size > UPLOAD_MAX_BYTES:
+        raise UploadError(f'File too large (max {UPLOAD_MAX_BYTES} bytes)', 413)
+
+    upload_id = secrets.token_hex(16)
+    folder = partial_dir(upload_folder, user_id)
+    os.makedirs(folder, exist_ok=True)
+    meta_path, part_path = _paths(upload_folder, user_id, upload_id)
+    meta = {
+        'upload_id': upload_id,
+        'filename': filename,
+        'table_name': table_name,
+        'size': size,
+        'sha256': sha256.lower() if sha256 else None,
+        'created_at': datetime.utcnow().isoformat(),
+    }
+    open(part_path, 'wb').close()
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    return dict(meta, offset=0, chunk_size=CHUNK_SIZE_HINT)
+
+
+def load(upload_folder, user_id, upload_id):
+    meta_path, part_path = _paths(upload_folder, user_id, upload_id)
+    try:
+        with open(meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        raise UploadError('Upload not found', 404)
+    meta['offset'] = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    return meta
+
+
+def _hasher_at(upload_id, part_path, offset):
+    """Running hash of the first `offset` bytes: cached, or rebuilt from the .part file."""
+    with _lock:
+        cached = _hashers.pop(upload_id, None)
+    if cached and cached[0] == offset:
+        return cached[1]
+    digest = hashlib.sha256()
+    with open(part_path, 'rb') as f:
+        remaining = offset
+        while remaining:
+            block = f.read(min(COPY_CHUNK, remaining))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+    return digest
+
+
+def _remember(upload_id, offset, digest):
+    with _lock:
+        _hashers[upload_id] = (offset, digest)
+        while len(_hashers) > HASHER_CACHE:
+            _hashers.popitem(last=False)
+
+
+def write_chunk(upload_folder, user_id, upload_id, offset, stream, length):
+    """
+    Append `length` bytes from stream at `offset`. A wrong offset (chunk lost or
+    sent twice) is refused with 409 and the current offset, so the client resumes
+    from there. Returns the new offset.
+    """
+    meta = load(upload_folder, user_id, upload_id)
+    if length is None:
+        raise UploadError('Content-Length required', 411)
+    if length > CHUNK_MAX_BYTES:
+        raise UploadError(f'Chunk too large (max {CHUNK_MAX_BYTES} bytes)', 413)
+    if offset + length > meta['size']:
+        raise UploadError('Chunk goes past the declared size', 416, offset=meta['offset'])
+
+    _, part_path = _paths(upload_folder, user_id, upload_id)
+    with open(part_path, 'r+b') as f:
+        if fcntl is not None:
+            # one writer per upload across workers; a parallel duplicate waits, then sees the new offset
+            fcntl.flock(f, fcntl.LOCK_EX)
+        current = os.fstat(f.fileno()).st_size
+        if offset != current:
+            raise UploadError('Offset mismatch', 409, offset=current)
+
+        digest = _hasher_at(upload_id, part_path, current)
+        f.seek(current)
+        written = 0
+        try:
+            while written < length:
+                block = stream.read(min(COPY_CHUNK, length - written))
+                if not block:
+                    break
+                f.write(block)
+                digest.update(block)
+                written += len(block)
+            if written < length:
+                raise UploadError('Chunk ended early', 400)
+            f.flush()
+        except BaseException:
+            # drop the partial chunk so the offset stays on a chunk boundary
+            f.truncate(current)
+            raise
+    _remember(upload_id, current + written, digest)
+    return current + written
+
+
+def finish(upload_folder, user_id, upload_id, dest_path):
+    """
+    Check size and hash, then move the .part file to dest_path (a rename on
+    the same filesystem, no copy). Returns (meta, sha256 hex). The session
+    stays open: close() it after ingestion, or reopen() it when that failed.
+    """
+    meta = load(upload_folder, user_id, upload_id)
+    meta_path, part_path = _paths(upload_folder, user_id, upload_id)
+    if not os.path.exists(part_path):
+        raise UploadError('Upload is already being completed', 409)
+    if meta['offset'] != meta['size']:
+        raise UploadError('Upload incomplete', 409, offset=meta['offset'])
+
+    sha256 = _hasher_at(upload_id, part_path, meta['offset']).hexdigest()
+    if meta['sha256'] and meta['sha256'] != sha256:
+        discard(upload_folder, user_id, upload_id)
+        raise UploadError('Checksum mismatch, upload discarded', 422, sha256=sha256)
+
+    try:
+        os.replace(part_path, dest_path)
+    except FileNotFoundError:
+        # a parallel complete moved it first
+        raise UploadError('Upload is already being completed', 409)
+    return meta, sha256
+
+
+def reopen(upload_folder, user_id, upload_id, moved_path):
+    """Undo finish(): the file goes back to .part, complete can be retried without re-uploading."""
+    _, part_path = _paths(upload_folder, user_id, upload_id)
+    os.replace(moved_path, part_path)
+
+
+def close(upload_folder, user_id, upload_id):
+    """End a finished session (its file now belongs to the ingested upload)."""
+    with _lock:
+        _hashers.pop(upload_id, None)
+    meta_path, _ = _paths(upload_folder, user_id, upload_id)
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+
+
+def discard(upload_folder, user_id, upload_id):
+    with _lock:
+        _hashers.pop(upload_id, None)
+    for path in _paths(upload_folder, user_id, upload_id):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def expire_sessions(upload_folder, ttl=UPLOAD_SESSION_TTL):
+    """Remove upload sessions untouched for ttl seconds. Returns (sessions, bytes) removed."""
+    cutoff = time() - ttl
+    removed, freed = 0, 0
+    for meta_path in glob.glob(os.path.join(upload_folder, '*', '.partial', '*.json')):
+        part_path = meta_path[:-len('.json')] + '.part'
+        try:
+            last = max(os.path.getmtime(p) for p in (meta_path, part_path) if os.path.exists(p))
+            if last >= cutoff:
+                continue
+            if os.path.exists(part_path):
+                freed += os.path.getsize(part_path)
+                os.remove(part_path)
+            os.remove(meta_path)
+            removed += 1
+        except OSError as e:
+            print("Upload session cleanup error:", e)
+    return removed, freed
@@ -0,0 +1,228 @@
+import os
+from datetime import datetime, timedelta
+from time import monotonic
+
+from sqlalchemy import text, bindparam, DateTime
+
+from models import db
+from fts import FTS_COLUMNS, fts_delete
+from parties import count_party_names, apply_party_counts
+from tenants import sharded, tenant_ids, tenant_scope, tenant_db_path, drop_tenant, tenant_text
+import metrics
+
+# =========================================================
+# RETENTION
+# Uploaded files older than RETENTION_DAYS are removed together
+# with their documents, FTS entries and selections. Work is done
+# in bounded batches, each in its own short transaction, so the
+# SQLite write lock is never held for long. Runs over every
+# per-user database; files of deleted users are dropped whole. In
+# shared mode (no TENANT_DB_DIR) one pass covers the central
+# database, rows of deleted users included.
+# =========================================================
+RETENTION_DAYS = int(os.environ.get('RETENTION_DAYS', '30'))
+RETENTION_FILE_BATCH = int(os.environ.get('RETENTION_FILE_BATCH', '20'))
+RETENTION_DOC_BATCH = int(os.environ.get('RETENTION_DOC_BATCH', '2000'))
+RETENTION_TIME_BUDGET = float(os.environ.get('RETENTION_TIME_BUDGET', '300'))
+
+# Tables holding one or more rows per document (column document_id),
+# purged together with the document
+DOCUMENT_CHILD_TABLES = ['selected_entries', 'party_keys', 'transfer_edges', 'property_refs']
+
+
+def _in_params(ids, prefix):
+    placeholders = ", ".join(f":{prefix}{i}" for i in range(len(ids)))
+    return placeholders, {f"{prefix}{i}": v for i, v in enumerate(ids)}
+
+
+def purge_documents(rows, stats):
+    """
+    Delete documents plus their FTS entries, child rows and party name counts.
+    rows are mappings with id + FTS_COLUMNS (needed to remove contentless FTS
+    entries; the party names are among them). Caller commits.
+    """
+    if not rows:
+        return
+    ids = [r['id'] for r in rows]
+    placeholders, params = _in_params(ids, "d")
+
+    fts_delete(db.session, rows)
+    stats['fts_rows'] += len(rows)
+    apply_party_counts(db.session, count_party_names(rows), sign=-1)
+
+    for table in DOCUMENT_CHILD_TABLES:
+        result = db.session.execute(tenant_text(f"DELETE FROM {table} WHERE document_id IN ({placeholders})"),
+                                    params)
+        stats.setdefault(table, 0)
+        stats[table] += max(result.rowcount, 0)
+
+    result = db.session.execute(tenant_text(f"DELETE FROM documents WHERE id IN ({placeholders})"), params)
+    stats['documents'] += max(result.rowcount, 0)
+
+
+def _purge_where(where, params, stats, deadline):
+    """Purge documents matching a WHERE clause on alias d, one batch per transaction."""
+    while monotonic() < deadline:
+        rows = db.session.execute(tenant_text(f"""
+            SELECT d.id, d.user_id, {', '.join('d.' + c for c in FTS_COLUMNS)}
+            FROM documents d WHERE {where}
+            LIMIT :doc_batch
+        """), dict(params, doc_batch=RETENTION_DOC_BATCH)).mappings().fetchall()
+        if not rows:
+            return True
+        stats['users'].update(r['user_id'] for r in rows)
+        with metrics.timer('adoodle_write_lock_seconds', op='retention'):
+            purge_documents(rows, stats)
+            db.session.commit()
+    return False
+
+
+def _remove_file(path, stats):
+    try:
+        if os.path.exists(path):
+            size = os.path.getsize(path)
+            os.remove(path)
+            stats['bytes'] += size
+    except Exception as e:
+        print("File delete error:", e)
+
+
+def purge_user_data(user_id, stats=None):
+    """
+    Delete a (deleted) user's uploaded files and their whole database file.
+    In shared mode the next retention pass removes their rows and files.
+    """
+    stats = stats if stats is not None else {'files': 0, 'bytes': 0, 'documents': 0}
+    if not sharded() or not os.path.exists(tenant_db_path(user_id)):
+        return stats
+    with tenant_scope(user_id):
+        try:
+            paths = [r[0] for r in db.session.execute(tenant_text("SELECT filepath FROM uploaded_files"))]
+            stats['documents'] += db.session.execute(tenant_text("SELECT COUNT(*) FROM documents")).scalar()
+        finally:
+            db.session.close()
+    for path in paths:
+        _remove_file(path, stats)
+    stats['files'] += len(paths)
+    stats['bytes'] += drop_tenant(user_id)
+    return stats
+
+
+def run_retention(retention_days=RETENTION_DAYS, time_budget=RETENTION_TIME_BUDGET):
+    """
+    One retention pass over every user's database. Returns stats (rows / bytes
+    reclaimed, affected user ids). Stops early when the time budget runs out;
+    the next pass continues.
+    """
+    started = monotonic()
+    deadline = started + time_budget
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    stats = {
+        'files': 0, 'bytes': 0, 'documents': 0, 'fts_rows': 0,
+        'orphan_documents': 0, 'dropped_databases': 0, 'users': set(), 'complete': False
+    }
+
+    live_users = {r[0] for r in db.session.execute(text("SELECT id FROM user"))}
+    db.session.commit()
+
+    done = True
+    if not sharded():
+        done = _retain_tenant(cutoff, stats, deadline, deleted_users=True)
+    for user_id in tenant_ids():
+        if monotonic() >= deadline:
+            done = False
+            break
+        if user_id not in live_users and not _user_exists(user_id):
+            # user deleted: nothing in the file is reachable any more
+            purge_user_data(user_id, stats)
+            stats['dropped_databases'] += 1
+            continue
+        with tenant_scope(user_id):
+            try:
+                done = _retain_tenant(cutoff, stats, deadline) and done
+            finally:
+                db.session.close()
+
+    stats['complete'] = done and monotonic() < deadline
+    stats['seconds'] = round(monotonic() - started, 3)
+    stats['users'] = sorted(stats['users'])
+    return stats
+
+
+def _user_exists(user_id):
+    """Fresh check right before a drop: live_users is read once and the pass can be long."""
+    try:
+        return db.session.execute(text("SELECT 1 FROM user WHERE id = :id"), {'id': user_id}).first() is not None
+    finally:
+        db.session.commit()
+
+
+def _retain_tenant(cutoff, stats, deadline, deleted_users=False):
+    """
+    Retention inside the current tenant's database. deleted_users: also purge
+    rows of users no longer in the user table (shared mode, where both tables
+    are in one database). True when it finished in time.
+    """
+    gone_files = " OR NOT EXISTS (SELECT 1 FROM user u WHERE u.id = uploaded_files.user_id)" if deleted_users else ""
+    gone_documents = " OR NOT EXISTS (SELECT 1 FROM user u WHERE u.id = d.user_id)" if deleted_users else ""
+
+    # 1. expired uploads, a few files at a time
+    while monotonic() < deadline:
+        files = db.session.execute(tenant_text(f"""
+            SELECT id, user_id, filepath, filesize FROM uploaded_files
+            WHERE upload_date < :cutoff{gone_files}
+            ORDER BY id LIMIT :file_batch
+        """).bindparams(bindparam('cutoff', type_=DateTime)),
+            {'cutoff': cutoff, 'file_batch': RETENTION_FILE_BATCH}).fetchall()
+        if not files:
+            break
+
+        file_ids = [f[0] for f in files]
+        placeholders, params = _in_params(file_ids, "f")
+        if not _purge_where(f"d.file_id IN ({placeholders})", params, stats, deadline):
+            break
+
+        db.session.execute(tenant_text(f"DELETE FROM uploaded_files WHERE id IN ({placeholders})"), params)
+        db.session.commit()
+
+        # remove from disk only after the rows are gone
+        for _, user_id, path, filesize in files:
+            stats['users'].add(user_id)
+            _remove_file(path, stats)
+        stats['files'] += len(files)
+
+    # 2. documents whose upload row (or user) is already gone (file_id SET NULL)
+    before = stats['documents']
+    done = _purge_where(f"""
+        d.file_id IS NULL
+        OR NOT EXISTS (SELECT 1 FROM uploaded_files f WHERE f.id = d.file_id){gone_documents}
+    """, {}, stats, deadline)
+    stats['orphan_documents'] += stats['documents'] - before
+
+    # 3. child rows pointing at documents that no longer exist
+    for table in DOCUMENT_CHILD_TABLES:
+        done = done and _purge_orphans(table, stats, deadline)
+    return done
+
+
+def _purge_orphans(table, stats, deadline):
+    """Child rows of deleted documents, one batch per transaction, walking rowids forward."""
+    last_rowid = 0
+    while monotonic() < deadline:
+        rowids = [r[0] for r in db.session.execute(tenant_text(f"""
+            SELECT rowid FROM {table} t
+            WHERE rowid > :last_rowid AND NOT EXISTS (SELECT 1 FROM documents d WHERE d.id = t.document_id)
+            ORDER BY rowid LIMIT :doc_batch
+        """), {'last_rowid': last_rowid, 'doc_batch': RETENTION_DOC_BATCH})]
+        if not rowids:
+            db.session.commit()
+            return True
+        with metrics.timer('adoodle_write_lock_seconds', op='retention'):
+            placeholders, params = _in_params(rowids, "r")
+            result = db.session.execute(tenant_text(f"DELETE FROM {table} WHERE rowid IN ({placeholders})"),
+                                        params)
+            db.session.commit()
+        stats.setdefault(table, 0)
+        stats[table] += max(result.rowcount, 0)
+        last_rowid = rowids[-1]
+    return False
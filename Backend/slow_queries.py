@@ -0,0 +1,116 @@
+import glob
+import json
+import os
+from collections import deque
+from datetime import datetime
+from threading import Lock
+
+from metrics import METRICS_DIR
+
+# =========================================================
+# SLOW QUERY LOG
+# Statements slower than SLOW_QUERY_MS are kept with redacted
+# parameters and their EXPLAIN QUERY PLAN in a per-process ring
+# buffer. Each process mirrors its buffer to METRICS_DIR so the
+# admin view covers every gunicorn worker.
+# =========================================================
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '200'))
+SLOW_QUERY_BUFFER = int(os.environ.get('SLOW_QUERY_BUFFER', '100'))
+RECENT_MAX_LIMIT = 1000
+
+_lock = Lock()
+_buffer = deque(maxlen=SLOW_QUERY_BUFFER)
+
+
+def _path(pid=None):
+    return os.path.join(METRICS_DIR, f"slow_{pid or os.getpid()}.json")
+
+
+def redact(value):
+    """Keep numbers (ids, limits, amounts); hide text, which may hold party names."""
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, str):
+        return f"<str len={len(value)}>"
+    return f"<{type(value).__name__}>"
+
+
+def redact_params(parameters):
+    if isinstance(parameters, dict):
+        return {k: redact(v) for k, v in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [redact(v) for v in parameters]
+    return redact(parameters)
+
+
+def explain(dbapi_connection, statement, parameters):
+    """EXPLAIN QUERY PLAN on the raw sqlite3 connection (bypasses SQLAlchemy events)."""
+    head = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ''
+    if head not in ('SELECT', 'WITH'):
+        return None
+    try:
+        rows = dbapi_connection.execute("EXPLAIN QUERY PLAN " + statement, parameters or ()).fetchall()
+    except Exception as e:
+        return [f"explain failed: {e}"]
+
+    depth = {0: -1}
+    plan = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        plan.append("  " * depth[node_id] + detail)
+    return plan
+
+
+def record(dbapi_connection, statement, parameters, elapsed, endpoint, executemany=False):
+    entry = {
+        'at': datetime.utcnow().isoformat(),
+        'pid': os.getpid(),
+        'endpoint': endpoint,
+        'duration_ms': round(elapsed * 1000, 2),
+        'statement': " ".join(statement.split()),
+        'parameters': None if executemany else redact_params(parameters),
+        'executemany': executemany,
+        'plan': None if executemany else explain(dbapi_connection, statement, parameters),
+    }
+    with _lock:
+        _buffer.append(entry)
+        snapshot = list(_buffer)
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        tmp = _path() + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+        os.replace(tmp, _path())
+    except OSError as e:
+        print("Slow query log write failed:", e)
+
+
+def _cleared_at():
+    try:
+        with open(os.path.join(METRICS_DIR, 'slow_cleared'), encoding='utf-8') as f:
+            return f.read().strip()
+    except OSError:
+        return ''
+
+
+def recent(limit=50):
+    cleared = _cleared_at()
+    entries = []
+    for path in glob.glob(os.path.join(METRICS_DIR, 'slow_*.json')):
+        try:
+            with open(path, encoding='utf-8') as f:
+                entries.extend(json.load(f))
+        except (OSError, ValueError):
+            continue
+    entries = [e for e in entries if e['at'] > cleared]
+    entries.sort(key=lambda e: e['at'], reverse=True)
+    return entries[:max(1, min(limit, RECENT_MAX_LIMIT))]
+
+
+def clear():
+    # other workers still hold older entries in memory, so hide by timestamp
+    with _lock:
+        _buffer.clear()
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    with open(os.path.join(METRICS_DIR, 'slow_cleared'), 'w', encoding='utf-8') as f:
+        f.write(datetime.utcnow().isoformat())
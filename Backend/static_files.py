@@ -0,0 +1,141 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from threading import Lock
+
+from flask import Response, request, send_file
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+
+from streaming import accepted_encodings, brotli, compress_body, MIN_COMPRESS_SIZE
+
+# =========================================================
+# STATIC FILES FOR THE VITE BUNDLE (dist/)
+# Hashed assets are immutable and cached for a year; everything
+# else revalidates with its ETag. Precompressed .br / .gz files
+# written by `flask precompress-assets` are sent when the client
+# accepts them. index.html is kept in memory, compressed once.
+# =========================================================
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE = 'no-cache'
+
+# Vite names build output like index-B3xk9Q2a.js / logo-4f1c0d2e.svg
+HASHED_NAME = re.compile(r'-[A-Za-z0-9_-]{8,}\.[A-Za-z0-9]+$')
+COMPRESSIBLE = ('.js', '.mjs', '.css', '.html', '.svg', '.json', '.map', '.txt', '.xml', '.ico', '.wasm')
+VARIANTS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def is_hashed(path):
+    return bool(HASHED_NAME.search(os.path.basename(path)))
+
+
+def _pick_variant(full_path):
+    """(path to send, content-encoding) for the best precompressed file the client accepts."""
+    accepted = accepted_encodings(request.headers.get('Accept-Encoding'))
+    for encoding, suffix in VARIANTS:
+        if accepted.get(encoding, 0) > 0 and os.path.isfile(full_path + suffix):
+            return full_path + suffix, encoding
+    return full_path, None
+
+
+def send_static(directory, path):
+    """
+    send_file with conditional=True gives ETag / Last-Modified / 304 and
+    Range (206) handling; the range applies to the variant actually sent.
+    """
+    full_path = safe_join(directory, path)
+    if full_path is None or not os.path.isfile(full_path):
+        raise NotFound()
+
+    send_path, encoding = _pick_variant(full_path)
+    mimetype = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+    resp = send_file(send_path, mimetype=mimetype, conditional=True, etag=True)
+    if encoding:
+        resp.headers['Content-Encoding'] = encoding
+    if full_path.endswith(COMPRESSIBLE):
+        resp.vary.add('Accept-Encoding')
+    resp.headers['Cache-Control'] = IMMUTABLE_CACHE if is_hashed(path) else REVALIDATE_CACHE
+    return resp
+
+
+class IndexCache:
+    """index.html in memory; reloaded when the file on disk changes (new deploy)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = Lock()
+        self._stamp = None
+        self._body = None
+        self._etag = None
+        self._variants = {}
+
+    def _load(self):
+        st = os.stat(self.path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        if stamp == self._stamp:
+            return
+        with self._lock:
+            if stamp == self._stamp:
+                return
+            with open(self.path, 'rb') as f:
+                body = f.read()
+            variants = {'gzip': compress_body(body, 'gzip')}
+            if brotli is not None:
+                variants['br'] = compress_body(body, 'br')
+            self._body, self._variants = body, variants
+            self._etag = hashlib.sha1(body).hexdigest()[:20]
+            self._stamp = stamp
+
+    def response(self):
+        try:
+            self._load()
+        except OSError:
+            raise NotFound()
+
+        body, encoding = self._body, None
+        if len(body) >= MIN_COMPRESS_SIZE:
+            accepted = accepted_encodings(request.headers.get('Accept-Encoding'))
+            for enc, _ in VARIANTS:
+                if accepted.get(enc, 0) > 0 and enc in self._variants:
+                    body, encoding = self._variants[enc], enc
+                    break
+        # each encoded representation gets its own strong ETag
+        etag = f"{self._etag}-{encoding}" if encoding else self._etag
+
+        if request.if_none_match.contains(etag):
+            resp = Response(status=304)
+        else:
+            resp = Response(body, mimetype='text/html')
+            if encoding:
+                resp.headers['Content-Encoding'] = encoding
+        resp.set_etag(etag)
+        resp.vary.add('Accept-Encoding')
+        resp.headers['Cache-Control'] = REVALIDATE_CACHE
+        return resp
+
+
+def precompress(directory, min_size=MIN_COMPRESS_SIZE):
+    """Write .gz (and .br if brotli is installed) next to each compressible file. Returns files written."""
+    written = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if not name.endswith(COMPRESSIBLE):
+                continue
+            src = os.path.join(root, name)
+            if os.path.getsize(src) < min_size:
+                continue
+            with open(src, 'rb') as f:
+                data = f.read()
+            targets = [('.gz', lambda d: gzip.compress(d, compresslevel=9, mtime=0))]
+            if brotli is not None:
+                targets.append(('.br', lambda d: brotli.compress(d, quality=11)))
+            for suffix, compress in targets:
+                dst = src + suffix
+                if os.path.exists(dst) and os.path.getmtime(dst) >= os.path.getmtime(src):
+                    continue
+                with open(dst, 'wb') as f:
+                    f.write(compress(data))
+                written += 1
+    return written
@@ -0,0 +1,142 @@
+import gzip
+import json
+import zlib
+
+try:
+    import brotli
+except ImportError:  # optional: only gzip is offered without it
+    brotli = None
+
+# Skip compression for small bodies, the headers cost more than they save
+MIN_COMPRESS_SIZE = 1024
+
+
+def json_line(obj):
+    return json.dumps(obj, ensure_ascii=False, default=str)
+
+
+# =========================================================
+# RESPONSE MODE / ENCODING NEGOTIATION
+# =========================================================
+def stream_mode(args, headers):
+    """
+    'ndjson' for ?stream=ndjson or Accept: application/x-ndjson,
+    'json' for ?stream=json (one JSON document sent in chunks),
+    None for the normal buffered jsonify response.
+    """
+    mode = (args.get('stream') or '').strip().lower()
+    if mode in ('ndjson', 'json'):
+        return mode
+    if 'application/x-ndjson' in headers.get('Accept', ''):
+        return 'ndjson'
+    return None
+
+
+def accepted_encodings(accept_encoding):
+    """Accept-Encoding header → {coding: q}."""
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        token, _, params = part.strip().partition(';')
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token] = q
+    return accepted
+
+
+def negotiate_encoding(accept_encoding):
+    accepted = accepted_encodings(accept_encoding)
+    if brotli is not None and accepted.get('br', 0) > 0:
+        return 'br'
+    if accepted.get('gzip', 0) > 0:
+        return 'gzip'
+    return None
+
+
+# =========================================================
+# STREAMING COMPRESSION
+# Each chunk is flushed so the client can decode rows as they arrive.
+# =========================================================
+def compress_chunks(chunks, encoding):
+    if encoding == 'br':
+        comp = brotli.Compressor(quality=4)
+        for chunk in chunks:
+            out = comp.process(chunk.encode('utf-8')) + comp.flush()
+            if out:
+                yield out
+        yield comp.finish()
+        return
+
+    comp = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 → gzip container
+    for chunk in chunks:
+        out = comp.compress(chunk.encode('utf-8')) + comp.flush(zlib.Z_SYNC_FLUSH)
+        if out:
+            yield out
+    yield comp.flush()
+
+
+def compress_body(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=5)
+    return gzip.compress(data, 6)
+
+
+# =========================================================
+# ROW STREAMS
+# batches: iterable of lists of dicts (rows as they come off the cursor)
+# =========================================================
+def ndjson_stream(batches, meta=None):
+    for batch in batches:
+        if batch:
+            yield "".join(json_line(row) + "\n" for row in batch)
+    if meta is not None:
+        yield json_line({"_meta": meta() if callable(meta) else meta}) + "\n"
+
+
+def json_array_stream(prefix, key, batches, suffix=None):
+    """
+    Stream {<prefix fields>, "<key>": [ ...rows... ], <suffix fields>} without
+    building the list. suffix may be a callable evaluated after the rows.
+    """
+    head = json_line(prefix)[:-1]
+    yield head + ("," if prefix else "") + json.dumps(key) + ":["
+    first = True
+    for batch in batches:
+        if not batch:
+            continue
+        body = ",".join(json_line(row) for row in batch)
+        yield body if first else "," + body
+        first = False
+    tail = suffix() if callable(suffix) else (suffix or {})
+    yield "]" + ("," + json_line(tail)[1:] if tail else "}")
+
+
+def grouped_json_stream(key, batches, group_of, group_header):
+    """
+    Stream {"<key>": [{<group header>, "rows": [...]}, ...]} from rows already
+    ordered by group. group_of(row) gives the group value, group_header(value)
+    the dict written before that group's rows.
+    """
+    yield "{" + json.dumps(key) + ":["
+    current, first_group, first_row = object(), True, True
+    for batch in batches:
+        out = []
+        for row in batch:
+            gval = group_of(row)
+            if gval != current:
+                if not first_group:
+                    out.append("]},")
+                out.append(json_line(group_header(gval))[:-1] + ',"rows":[')
+                current, first_group, first_row = gval, False, True
+            out.append(("" if first_row else ",") + json_line(row))
+            first_row = False
+        if out:
+            yield "".join(out)
+    yield ("]}" if not first_group else "") + "]}"
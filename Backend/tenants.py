@@ -0,0 +1,332 @@
+import os
+import re
+from collections import OrderedDict
+from contextlib import contextmanager
+from threading import Lock
+
+import sqlalchemy as sa
+from flask import current_app, g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy.schema import CreateIndex, CreateTable
+from sqlalchemy.sql.util import find_tables
+
+try:
+    import fcntl
+except ImportError:   # Windows dev machines: only the in-process lock applies
+    fcntl = None
+
+# =========================================================
+# PER-USER DATABASES (opt-in)
+# With TENANT_DB_DIR set, each user's uploads, documents, FTS index,
+# selections and the party / chain indexes live in their own SQLite
+# file (TENANT_DB_DIR/user_<id>.db); users, auth, translations and job
+# state stay in the central database. Without it (shared mode) every
+# table is in the central database, as before sharding.
+# db.session sends ORM and Core statements on a tenant table to the
+# file of the current tenant: g.current_user in a request, or the user
+# selected with tenant_scope() in jobs / CLI. Raw SQL is never routed
+# by its text: statements on tenant tables are written with
+# tenant_text() instead of text(); plain text() always runs centrally.
+# =========================================================
+TENANT_TABLES = ['uploaded_files', 'documents', 'documents_fts', 'selected_entries', 'party_names',
+                 'party_keys', 'transfer_edges', 'property_refs']
+# derived per-document indexes; rows carry user_id so they can share one database
+USER_INDEX_TABLES = ['party_names', 'party_keys', 'transfer_edges', 'property_refs']
+TENANT_ENGINE_CACHE = int(os.environ.get('TENANT_ENGINE_CACHE', '64'))
+
+_DB_FILE_RE = re.compile(r'^user_(\d+)\.db$')
+
+_engines = OrderedDict()   # user_id → Engine, least recently used first
+_engines_lock = Lock()
+_init_locks = {}           # user_id → Lock held while that file is created / upgraded
+
+
+class NoTenantError(RuntimeError):
+    pass
+
+
+class TenantText(sa.TextClause):
+    """A text() statement on tenant tables (see tenant_text)."""
+    inherit_cache = True
+
+
+def tenant_text(sql):
+    """text() for raw SQL on tenant tables: db.session runs it in the current tenant's database."""
+    return TenantText(sql)
+
+
+def sharded():
+    """True when per-user databases are enabled (TENANT_DB_DIR set)."""
+    return bool(current_app.config.get('TENANT_DB_DIR'))
+
+
+def _is_tenant_statement(mapper, clause):
+    if mapper is not None:
+        return sa.inspect(mapper).local_table.name in TENANT_TABLES
+    if clause is None:
+        return False
+    if isinstance(clause, sa.TextClause):
+        return isinstance(clause, TenantText)
+    try:
+        tables = find_tables(clause, include_crud=True, include_aliases=True, include_joins=True)
+    except Exception:
+        return False
+    return any(getattr(t, 'name', None) in TENANT_TABLES for t in tables)
+
+
+class TenantSession(Session):
+    """db.session: tenant tables go to the current user's database, everything else to the central one."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and _is_tenant_statement(mapper, clause) and sharded():
+            return tenant_engine(current_tenant())
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def current_tenant():
+    tenant_id = g.get('tenant_id') if has_app_context() else None
+    if tenant_id is None and has_app_context():
+        user = g.get('current_user')
+        tenant_id = user.id if user is not None else None
+    if tenant_id is None:
+        raise NoTenantError("Statement on a per-user table outside of a tenant scope")
+    return int(tenant_id)
+
+
+@contextmanager
+def tenant_scope(user_id):
+    """Route tenant tables to user_id's database (background jobs, CLI, admin tools)."""
+    previous = g.get('tenant_id')
+    g.tenant_id = int(user_id)
+    try:
+        yield
+    finally:
+        g.tenant_id = previous
+
+
+# =========================================================
+# FILES AND ENGINES
+# =========================================================
+def tenant_dir():
+    return current_app.config['TENANT_DB_DIR']
+
+
+def tenant_db_path(user_id):
+    return os.path.join(tenant_dir(), f"user_{int(user_id)}.db")
+
+
+def tenant_ids():
+    """User ids that have a database file (none in shared mode)."""
+    if not sharded():
+        return []
+    try:
+        names = os.listdir(tenant_dir())
+    except FileNotFoundError:
+        return []
+    return sorted(int(m.group(1)) for m in map(_DB_FILE_RE.match, names) if m)
+
+
+def init_tenant_db(engine):
+    """
+    Create / upgrade the tenant tables, the FTS index and the party / chain
+    indexes in one tenant file (or in the central database in shared mode).
+    """
+    from models import db, upgrade_schema
+    from fts import FTS_ROWID_VERSION, ensure_fts
+    from parties import ensure_party_index
+    from chain import ensure_chain_index
+
+    tables = [t for t in db.metadata.sorted_tables if t.name in TENANT_TABLES]
+    insp = sa.inspect(engine)
+    is_new = not insp.has_table('documents')
+    if is_new:
+        # only takes effect before the first table; lets maintenance.py reclaim
+        # free pages with incremental_vacuum instead of a full VACUUM
+        with engine.connect() as conn:
+            conn.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+    with engine.begin() as conn:
+        for name in USER_INDEX_TABLES:
+            if insp.has_table(name) and 'user_id' not in {c['name'] for c in insp.get_columns(name)}:
+                # built before the indexes carried user_id: derived from documents,
+                # so recreate the table and let ensure_* below rebuild it
+                conn.exec_driver_sql(f"DROP TABLE {name}")
+        for table in tables:
+            conn.execute(CreateTable(table, if_not_exists=True))
+            for idx in table.indexes:
+                conn.execute(CreateIndex(idx, if_not_exists=True))
+    upgrade_schema(engine, tables=tables)
+    with engine.connect() as conn:
+        if is_new:
+            # nothing to re-key in a fresh file
+            conn.exec_driver_sql(f"PRAGMA user_version = {FTS_ROWID_VERSION}")
+        ensure_fts(conn)
+        ensure_party_index(conn)
+        ensure_chain_index(conn)
+
+
+@contextmanager
+def _init_lock(user_id):
+    """
+    Serialize the first open of one tenant file: between threads of this
+    process, and between workers / the scheduler through an flock on
+    user_<id>.db.lock, so create / upgrade never runs twice at once.
+    """
+    with _engines_lock:
+        lock = _init_locks.setdefault(user_id, Lock())
+    with lock:
+        if fcntl is None:
+            yield
+            return
+        with open(tenant_db_path(user_id) + '.lock', 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+
+def tenant_engine(user_id):
+    """The engine of user_id's database file; the central engine in shared mode."""
+    if not sharded():
+        from models import db
+        return db.engine
+    with _engines_lock:
+        engine = _engines.get(user_id)
+        if engine is not None:
+            _engines.move_to_end(user_id)
+            return engine
+
+    os.makedirs(tenant_dir(), exist_ok=True)
+    with _init_lock(user_id):
+        with _engines_lock:
+            engine = _engines.get(user_id)
+            if engine is not None:
+                # another thread opened it while this one waited
+                return engine
+        engine = sa.create_engine(f"sqlite:///{tenant_db_path(user_id)}")
+        init_tenant_db(engine)
+
+        with _engines_lock:
+            _engines[user_id] = engine
+            while len(_engines) > TENANT_ENGINE_CACHE:
+                # checked-out connections stay valid; only idle pooled ones close
+                _, old = _engines.popitem(last=False)
+                old.dispose()
+    return engine
+
+
+def dispose_tenant_engines():
+    """Close every pooled tenant connection (before a fork, or in tests)."""
+    with _engines_lock:
+        engines = list(_engines.values())
+        _engines.clear()
+    for engine in engines:
+        engine.dispose()
+
+
+def drop_tenant(user_id):
+    """Delete a user's database file. Returns its size in bytes."""
+    with _engines_lock:
+        engine = _engines.pop(user_id, None)
+    if engine is not None:
+        engine.dispose()
+    size = 0
+    path = tenant_db_path(user_id)
+    for p in (path, path + '-wal', path + '-shm', path + '-journal'):
+        if os.path.exists(p):
+            size += os.path.getsize(p)
+            os.remove(p)
+    return size
+
+
+def for_each_tenant(fn, user_ids=None):
+    """
+    Call fn(user_id) inside tenant_scope for every tenant database. The session
+    is committed and closed between tenants so no transaction spans two files
+    and the identity map never mixes rows with the same id from different users.
+    In shared mode fn(None) runs once, over the rows of every user.
+    """
+    from models import db
+
+    def run(user_id):
+        try:
+            result = fn(user_id)
+            db.session.commit()
+            return result
+        except Exception:
+            db.session.rollback()
+            raise
+        finally:
+            db.session.close()
+
+    if not sharded():
+        return {None: run(None)}
+    results = {}
+    for user_id in (tenant_ids() if user_ids is None else user_ids):
+        with tenant_scope(user_id):
+            results[user_id] = run(user_id)
+    return results
+
+
+# =========================================================
+# ONE-TIME MIGRATION FROM THE SHARED DATABASE
+# Run by hand (`flask --app app migrate-tenants`) after setting
+# TENANT_DB_DIR on an install that started in shared mode.
+# =========================================================
+def has_shared_documents(engine):
+    """True while the central database still has the shared-mode document tables."""
+    return sa.inspect(engine).has_table('documents')
+
+
+def migrate_shared_database(engine):
+    """
+    Move rows of the tenant tables still in the central database (shared-mode
+    installs) into per-user files, keeping ids so selections and FTS rowids stay
+    valid, then drop the shared tables. Safe to re-run: copies use INSERT OR
+    IGNORE and each user's central rows are deleted only after their file is
+    committed. Returns users moved.
+    """
+    from fts import rebuild_fts
+    from parties import rebuild_party_names, rebuild_party_keys
+    from chain import rebuild_chain_index
+
+    insp = sa.inspect(engine)
+    legacy = [t for t in ('uploaded_files', 'documents', 'selected_entries') if insp.has_table(t)]
+    if not legacy:
+        return 0
+    if not sharded():
+        raise RuntimeError("TENANT_DB_DIR is not set: there are no per-user databases to move into")
+
+    central_path = engine.url.database
+    with engine.connect() as conn:
+        user_ids = sorted({r[0] for t in legacy
+                           for r in conn.execute(sa.text(f"SELECT DISTINCT user_id FROM {t}"))})
+        legacy_columns = {t: [c['name'] for c in insp.get_columns(t)] for t in legacy}
+
+    for user_id in user_ids:
+        tenant = tenant_engine(user_id)
+        tenant_columns = {t: {c['name'] for c in sa.inspect(tenant).get_columns(t)} for t in legacy}
+        with tenant.connect() as conn:
+            conn.exec_driver_sql("ATTACH DATABASE ? AS central", (central_path,))
+            for table in legacy:
+                cols = ", ".join(f'"{c}"' for c in legacy_columns[table] if c in tenant_columns[table])
+                conn.exec_driver_sql(
+                    f"INSERT OR IGNORE INTO main.{table} ({cols}) SELECT {cols} FROM central.{table} WHERE user_id = ?",
+                    (user_id,)
+                )
+            conn.commit()
+            conn.exec_driver_sql("DETACH DATABASE central")
+
+            rebuild_fts(conn)
+            rebuild_party_names(conn)
+            rebuild_party_keys(conn)
+            rebuild_chain_index(conn)
+            conn.commit()
+
+        with engine.begin() as conn:
+            for table in legacy:
+                conn.execute(sa.text(f"DELETE FROM {table} WHERE user_id = :uid"), {'uid': user_id})
+        print(f"Moved user {user_id} data into {tenant_db_path(user_id)}")
+
+    # Everything moved: drop the shared tables (the indexes are rebuilt per file above)
+    with engine.begin() as conn:
+        for table in ['documents_fts'] + USER_INDEX_TABLES + ['selected_entries', 'documents', 'uploaded_files']:
+            conn.exec_driver_sql(f"DROP TABLE IF EXISTS {table}")
+    return len(user_ids)
@@ -0,0 +1,81 @@
+import json
+import os
+import sys
+
+import pytest
+from flask import Flask
+
+# the backend modules are imported flat, as app.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """
+    make_app(sharded=True) → a bare Flask app on a temporary central database
+    (tables created as init_database does), with per-user files under
+    tmp_path/tenants unless sharded=False.
+    """
+    from models import db
+    from tenants import TENANT_TABLES, init_tenant_db, dispose_tenant_engines
+
+    apps = []
+
+    def make(sharded=True):
+        app = Flask(__name__)
+        app.config.update(
+            SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'central.db'}",
+            UPLOAD_FOLDER=str(tmp_path / 'uploads'),
+            TENANT_DB_DIR=str(tmp_path / 'tenants') if sharded else None,
+        )
+        os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+        db.init_app(app)
+        with app.app_context():
+            central = [t for t in db.metadata.sorted_tables if t.name not in TENANT_TABLES]
+            db.metadata.create_all(db.engine, tables=central)
+            if not sharded:
+                init_tenant_db(db.engine)
+        apps.append(app)
+        return app
+
+    yield make
+    # cached tenant engines are keyed by user id only: never reuse them across tests
+    dispose_tenant_engines()
+    for app in apps:
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+
+
+@pytest.fixture
+def seed_upload():
+    """
+    seed_upload(app, user_id, rows, size=100) → id of a new upload of `rows`
+    (documents columns, e.g. docno / purchasername / propertydescription),
+    loaded through ingest.load_staged with its FTS and party / chain entries.
+    The file on disk holds `size` bytes.
+    """
+    from models import db
+    from ingest import document_index, load_staged, unique_path
+    from tenants import tenant_scope
+
+    def seed(app, user_id, rows, size=100):
+        folder = app.config['UPLOAD_FOLDER']
+        fpath = unique_path(folder, f"user{user_id}.csv")
+        with open(fpath, 'wb') as f:
+            f.write(b'x' * size)
+        staging_path = fpath + '.jsonl'
+        with open(staging_path, 'w', encoding='utf-8') as f:
+            for row in rows:
+                values = dict(row)
+                values['_index'] = document_index(values)
+                f.write(json.dumps(values, ensure_ascii=False) + '\n')
+        with app.app_context(), tenant_scope(user_id):
+            try:
+                uf = load_staged(user_id, 'T1', os.path.basename(fpath), fpath, size, '0' * 64, staging_path)
+                return uf.id
+            finally:
+                db.session.close()
+                os.remove(staging_path)
+
+    return seed
@@ -0,0 +1,10 @@
+from extractor import parse_amounts
+
+
+def test_currency_markers_before_and_after():
+    assert parse_amounts(['₹ 12,34,567.00', '1,000.50 INR', '1,000 ₹', '१,००० रु.', 'Rs. 5 lakh', '5 crore INR/-']) == \
+        [1234567.0, 1000.5, 1000.0, 1000.0, 500000.0, 50000000.0]
+
+
+def test_unreadable_amounts_are_none():
+    assert parse_amounts(['INR', 'abc', '', None]) == [None, None, None, None]
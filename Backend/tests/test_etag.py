@@ -0,0 +1,122 @@
+import csv
+import importlib
+import os
+
+import bcrypt
+import pytest
+
+HEADERS = ["DocNo", "DocName", "RegistrationDate", "SellerParty", "PurchaserParty", "PropertyDescription",
+           "AreaName", "Consideration_Amt"]
+ROWS = [
+    ["101", "खरेदीखत", "01/02/2015", "1) Name: Ramchandra Bhosale", "1) Name: Sudhir Kelkar", "Gat No 777",
+     "धायरी", "10,00,000"],
+    ["102", "खरेदीखत", "05/06/2018", "1) Name: Sudhir Kelkar", "1) Name: Meera Apte", "Gat No 777",
+     "धायरी", "12,00,000"],
+]
+
+
+@pytest.fixture(scope='module')
+def app_module(tmp_path_factory):
+    """app.py on a temporary DB_ROOT (app.py derives its paths from the working directory at import)."""
+    root = tmp_path_factory.mktemp('app')
+    cwd = os.getcwd()
+    os.environ['TENANT_DB_DIR'] = str(root / 'tenants')
+    os.chdir(root)
+    try:
+        module = importlib.import_module('app')
+    finally:
+        os.chdir(cwd)
+        del os.environ['TENANT_DB_DIR']
+    assert module.DB_ROOT == str(root)
+    module._background_pid = os.getpid()   # no scheduler thread in tests
+    module.init_database()
+    with module.app.app_context():
+        module.db.session.add(module.User(email='other@example.com', name='Other', is_active=True,
+                                          password_hash=bcrypt.hashpw(b'other123', bcrypt.gensalt()).decode()))
+        module.db.session.commit()
+    return module
+
+
+@pytest.fixture(scope='module')
+def client(app_module):
+    return app_module.app.test_client()
+
+
+def _auth(client, email, password):
+    token = client.post('/login', json={'email': email, 'password': password}).get_json()['token']
+    return {'Authorization': f'Bearer {token}'}
+
+
+@pytest.fixture(scope='module')
+def user(app_module, client):
+    return _auth(client, app_module.DEFAULT_USER_EMAIL, app_module.DEFAULT_USER_PW)
+
+
+@pytest.fixture(scope='module')
+def other(client):
+    return _auth(client, 'other@example.com', 'other123')
+
+
+def _get(client, headers, url, etag=None):
+    if etag:
+        headers = dict(headers, **{'If-None-Match': etag})
+    return client.get(url, headers=headers)
+
+
+def _upload(client, headers, tmp_path, table_name):
+    path = tmp_path / f'{table_name}.csv'
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        csv.writer(f).writerows([HEADERS] + ROWS)
+    with open(path, 'rb') as f:
+        resp = client.post('/upload', data={'table_name': table_name, 'files': (f, path.name)},
+                           headers=headers, content_type='multipart/form-data')
+    assert resp.status_code == 201, resp.get_json()
+
+
+def test_matching_if_none_match_gets_304(client, user):
+    first = _get(client, user, '/tables')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert etag.startswith('W/') and first.headers['Cache-Control'] == 'private, no-cache'
+
+    again = _get(client, user, '/tables', etag)
+    assert again.status_code == 304
+    assert again.headers['ETag'] == etag and again.data == b''
+
+    # the ETag covers the request: another query string is another resource
+    other_query = _get(client, user, '/tables?x=1', etag)
+    assert other_query.status_code == 200 and other_query.headers['ETag'] != etag
+    assert _get(client, user, '/tables', 'W/"nope"').status_code == 200
+
+
+def test_upload_invalidates_only_the_uploaders_etags(client, user, other, tmp_path):
+    before = _get(client, user, '/tables')
+    others = _get(client, other, '/tables')
+
+    _upload(client, user, tmp_path, 'T1')
+
+    after = _get(client, user, '/tables', before.headers['ETag'])
+    assert after.status_code == 200
+    assert after.headers['ETag'] != before.headers['ETag']
+    assert 'T1' in after.get_json()['tables']
+    assert _get(client, user, '/tables', after.headers['ETag']).status_code == 304
+    # another user's data did not change
+    assert _get(client, other, '/tables', others.headers['ETag']).status_code == 304
+
+
+def test_selection_change_invalidates_the_etag(client, user, tmp_path):
+    _upload(client, user, tmp_path, 'T2')
+    doc_id = _get(client, user, '/search?table_name=T2').get_json()['results'][0]['id']
+    body = {'ids': [doc_id]}
+
+    first = client.post('/api/selected_rows', json=body, headers=user)
+    assert first.status_code == 200 and first.get_json()['groups'] == []
+    etag = first.headers['ETag']
+    assert client.post('/api/selected_rows', json=body, headers=dict(user, **{'If-None-Match': etag})).status_code == 304
+
+    saved = client.post('/api/save_selected', json={'entries': [{'id': doc_id}]}, headers=user)
+    assert saved.get_json()['added'] == 1
+
+    after = client.post('/api/selected_rows', json=body, headers=dict(user, **{'If-None-Match': etag}))
+    assert after.status_code == 200 and after.headers['ETag'] != etag
+    assert [r['document_id'] for g in after.get_json()['groups'] for r in g['rows']] == [doc_id]
@@ -0,0 +1,32 @@
+import pytest
+
+from extractor import extract_property_ids, parse_property_number
+
+
+@pytest.mark.parametrize("description, expected", [
+    ("सदनिका नं: 1203, सर्वे नं. 12/3/1, सि.स.नं. 1450",
+     [('flat', '1203'), ('survey', '12/3/1'), ('cts', '1450')]),
+    ("गट नं. ४५ व ४६", [('gat', '45'), ('gat', '46')]),
+    ("ग.नं. ४५", [('gat', '45')]),
+    ("सर्वे नं. 12 हिस्सा नं. 3", [('survey', '12/3')]),
+    ("Survey No. 7, 8 & 9", [('survey', '7'), ('survey', '8'), ('survey', '9')]),
+    ("Flat No. B-402", [('flat', 'B-402')]),
+    ("Flat No. A/101, A-102", [('flat', 'A-101'), ('flat', 'A-102')]),
+    ("Plot No. C 12", [('plot', 'C-12')]),
+    ("Sr. No. 5, Survey No. 12", [('survey', '12')]),
+    ("", []),
+])
+def test_extract_property_ids(description, expected):
+    assert extract_property_ids(description) == expected
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("१२ / ३", "12/3"),
+    ("012/3a", "12/3A"),
+    ("b/402", "B-402"),
+    ("B402", "B-402"),
+    ("abc", None),
+    ("12/", None),
+])
+def test_parse_property_number(value, expected):
+    assert parse_property_number(value) == expected
@@ -0,0 +1,121 @@
+import hashlib
+import os
+from io import BytesIO
+
+import pytest
+
+import resumable
+from resumable import UploadError
+
+DATA = bytes(range(256)) * 40   # 10 KiB
+SHA256 = hashlib.sha256(DATA).hexdigest()
+USER = 7
+
+
+@pytest.fixture
+def upload_folder(tmp_path):
+    return str(tmp_path / 'uploads')
+
+
+def _create(upload_folder, sha256=None):
+    return resumable.create(upload_folder, USER, 'igr.csv', 'T1', len(DATA), sha256)['upload_id']
+
+
+def _put(upload_folder, upload_id, start, end, stream=None):
+    body = stream if stream is not None else BytesIO(DATA[start:end])
+    return resumable.write_chunk(upload_folder, USER, upload_id, start, body, end - start)
+
+
+def test_chunks_are_assembled_and_moved(upload_folder, tmp_path):
+    upload_id = _create(upload_folder, SHA256)
+    assert _put(upload_folder, upload_id, 0, 4096) == 4096
+    assert _put(upload_folder, upload_id, 4096, len(DATA)) == len(DATA)
+    assert resumable.load(upload_folder, USER, upload_id)['offset'] == len(DATA)
+
+    dest = str(tmp_path / 'igr.csv')
+    meta, sha256 = resumable.finish(upload_folder, USER, upload_id, dest)
+    assert sha256 == SHA256 and meta['filename'] == 'igr.csv'
+    with open(dest, 'rb') as f:
+        assert f.read() == DATA
+
+    resumable.close(upload_folder, USER, upload_id)
+    with pytest.raises(UploadError) as e:
+        resumable.load(upload_folder, USER, upload_id)
+    assert e.value.status == 404
+
+
+def test_wrong_offset_is_refused_with_the_current_offset(upload_folder):
+    upload_id = _create(upload_folder)
+    _put(upload_folder, upload_id, 0, 1000)
+
+    for start in (0, 2000):   # chunk sent twice / chunk lost
+        with pytest.raises(UploadError) as e:
+            _put(upload_folder, upload_id, start, start + 500)
+        assert e.value.status == 409
+        assert e.value.extra == {'offset': 1000}
+    assert resumable.load(upload_folder, USER, upload_id)['offset'] == 1000
+
+    with pytest.raises(UploadError) as e:
+        _put(upload_folder, upload_id, 1000, len(DATA) + 1, BytesIO(b'x' * (len(DATA) + 1 - 1000)))
+    assert e.value.status == 416 and e.value.extra == {'offset': 1000}
+
+
+def test_short_chunk_is_truncated_back_to_the_chunk_boundary(upload_folder, tmp_path):
+    upload_id = _create(upload_folder, SHA256)
+    _put(upload_folder, upload_id, 0, 1000)
+
+    # the connection drops after 300 of 2000 bytes
+    with pytest.raises(UploadError) as e:
+        _put(upload_folder, upload_id, 1000, 3000, BytesIO(DATA[1000:1300]))
+    assert e.value.status == 400
+    assert resumable.load(upload_folder, USER, upload_id)['offset'] == 1000
+
+    # resuming from the reported offset still yields the right file and hash
+    _put(upload_folder, upload_id, 1000, len(DATA))
+    _, sha256 = resumable.finish(upload_folder, USER, upload_id, str(tmp_path / 'igr.csv'))
+    assert sha256 == SHA256
+
+
+def test_checksum_mismatch_discards_the_upload(upload_folder, tmp_path):
+    upload_id = _create(upload_folder, '0' * 64)
+    _put(upload_folder, upload_id, 0, len(DATA))
+
+    dest = str(tmp_path / 'igr.csv')
+    with pytest.raises(UploadError) as e:
+        resumable.finish(upload_folder, USER, upload_id, dest)
+    assert e.value.status == 422 and e.value.extra == {'sha256': SHA256}
+    assert not os.path.exists(dest)
+    assert os.listdir(resumable.partial_dir(upload_folder, USER)) == []
+    with pytest.raises(UploadError) as e:
+        resumable.load(upload_folder, USER, upload_id)
+    assert e.value.status == 404
+
+
+def test_incomplete_upload_cannot_be_finished(upload_folder, tmp_path):
+    upload_id = _create(upload_folder)
+    _put(upload_folder, upload_id, 0, 1000)
+    with pytest.raises(UploadError) as e:
+        resumable.finish(upload_folder, USER, upload_id, str(tmp_path / 'igr.csv'))
+    assert e.value.status == 409 and e.value.extra == {'offset': 1000}
+
+
+def test_reopen_after_failed_ingest_allows_a_retry(upload_folder, tmp_path):
+    upload_id = _create(upload_folder, SHA256)
+    _put(upload_folder, upload_id, 0, len(DATA))
+    dest = str(tmp_path / 'igr.csv')
+    resumable.finish(upload_folder, USER, upload_id, dest)
+
+    # while the first complete is ingesting, a second one is refused
+    with pytest.raises(UploadError) as e:
+        resumable.finish(upload_folder, USER, upload_id, str(tmp_path / 'other.csv'))
+    assert e.value.status == 409
+
+    # ingestion failed: the file goes back to .part, nothing is re-uploaded
+    resumable.reopen(upload_folder, USER, upload_id, dest)
+    assert not os.path.exists(dest)
+    assert resumable.load(upload_folder, USER, upload_id)['offset'] == len(DATA)
+
+    _, sha256 = resumable.finish(upload_folder, USER, upload_id, dest)
+    assert sha256 == SHA256
+    with open(dest, 'rb') as f:
+        assert f.read() == DATA
@@ -0,0 +1,149 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import db, User, SelectedEntry
+from retention import run_retention, purge_documents, DOCUMENT_CHILD_TABLES
+from fts import FTS_COLUMNS
+from tenants import tenant_scope, tenant_text, tenant_db_path
+
+ROWS = [
+    {'docno': '1', 'purchasername': '1) Name: Sudhir Kelkar', 'sellername': '1) Name: Ramchandra Bhosale',
+     'propertydescription': 'Gat No 777', 'registrationdate': '2015-02-01'},
+    {'docno': '2', 'purchasername': '1) Name: Meera Apte', 'sellername': '1) Name: Sudhir Kelkar',
+     'propertydescription': 'Survey No 12/3', 'registrationdate': '2018-06-05'},
+]
+ORPHAN = {'docno': '3', 'purchasername': '1) Name: Anil Apte', 'sellername': '1) Name: Meera Apte',
+          'propertydescription': 'Plot No 4', 'registrationdate': '2021-07-08'}
+TABLES = ['uploaded_files', 'documents', 'party_names'] + DOCUMENT_CHILD_TABLES
+
+
+def _add_users(app, *user_ids):
+    with app.app_context():
+        for user_id in user_ids:
+            db.session.add(User(id=user_id, email=f"u{user_id}@example.com", password_hash='x', is_active=True))
+        db.session.commit()
+
+
+def _execute(app, user_id, sql, params=None):
+    with app.app_context(), tenant_scope(user_id):
+        try:
+            result = db.session.execute(tenant_text(sql), params or {})
+            rows = result.fetchall() if result.returns_rows else None
+            db.session.commit()
+            return rows
+        finally:
+            db.session.close()
+
+
+def _counts(app, user_id):
+    counts = {t: _execute(app, user_id, f"SELECT COUNT(*) FROM {t}")[0][0] for t in TABLES}
+    # contentless FTS keeps no text: count what a search can still find
+    counts['documents_fts'] = _execute(app, user_id, "SELECT COUNT(*) FROM documents_fts "
+                                                     "WHERE documents_fts MATCH 'apte OR kelkar'")[0][0]
+    return counts
+
+
+def _expire(app, user_id, file_id, days=400):
+    _execute(app, user_id, "UPDATE uploaded_files SET upload_date = :d WHERE id = :id",
+             {'d': datetime.utcnow() - timedelta(days=days), 'id': file_id})
+
+
+def _orphan(app, user_id, file_id):
+    # what ON DELETE SET NULL leaves behind when an upload row goes away on its own
+    _execute(app, user_id, "UPDATE documents SET file_id = NULL WHERE file_id = :id", {'id': file_id})
+    _execute(app, user_id, "DELETE FROM uploaded_files WHERE id = :id", {'id': file_id})
+
+
+def _select(app, user_id, document_id):
+    with app.app_context(), tenant_scope(user_id):
+        db.session.add(SelectedEntry(user_id=user_id, document_id=document_id, table_name='T1'))
+        db.session.commit()
+        db.session.close()
+
+
+@pytest.mark.parametrize('sharded', [True, False])
+def test_expired_uploads_and_orphans_are_purged(make_app, seed_upload, sharded):
+    app = make_app(sharded=sharded)
+    _add_users(app, 1)
+    expired = seed_upload(app, 1, ROWS, size=300)
+    orphaned = seed_upload(app, 1, [ORPHAN], size=50)
+    _expire(app, 1, expired)
+    _orphan(app, 1, orphaned)
+    _select(app, 1, 1)
+    expired_path = _execute(app, 1, "SELECT filepath FROM uploaded_files WHERE id = :id", {'id': expired})[0][0]
+
+    before = _counts(app, 1)
+    assert before['documents'] == 3 and before['documents_fts'] == 3 and before['selected_entries'] == 1
+
+    with app.app_context():
+        stats = run_retention(retention_days=30)
+
+    assert _counts(app, 1) == dict.fromkeys(TABLES + ['documents_fts'], 0)
+    assert not os.path.exists(expired_path)
+    assert stats['complete']
+    assert stats['files'] == 1
+    assert stats['bytes'] == 300
+    assert stats['documents'] == 3
+    assert stats['fts_rows'] == 3
+    assert stats['orphan_documents'] == 1
+    assert stats['selected_entries'] == 1
+    assert stats['party_keys'] == before['party_keys']
+    assert stats['transfer_edges'] == before['transfer_edges']
+    assert stats['property_refs'] == before['property_refs']
+    assert stats['users'] == [1]
+
+
+@pytest.mark.parametrize('sharded', [True, False])
+def test_fresh_uploads_are_kept(make_app, seed_upload, sharded):
+    app = make_app(sharded=sharded)
+    _add_users(app, 1)
+    kept = seed_upload(app, 1, ROWS[:1])
+    _expire(app, 1, kept, days=5)
+    before = _counts(app, 1)
+
+    with app.app_context():
+        stats = run_retention(retention_days=30)
+
+    assert _counts(app, 1) == before
+    assert stats['files'] == 0 and stats['documents'] == 0 and stats['users'] == []
+    assert _execute(app, 1, "SELECT doc_count FROM party_names WHERE name_key = 'sudhir kelkar'") == [(1,)]
+
+
+@pytest.mark.parametrize('sharded', [True, False])
+def test_rows_of_deleted_users_are_purged(make_app, seed_upload, sharded):
+    app = make_app(sharded=sharded)
+    _add_users(app, 1)
+    seed_upload(app, 1, ROWS[:1])
+    seed_upload(app, 2, ROWS, size=200)   # user 2 has no user row any more
+
+    with app.app_context():
+        stats = run_retention(retention_days=30)
+        if sharded:
+            assert not os.path.exists(tenant_db_path(2))
+
+    assert stats['documents'] == 2
+    assert stats['bytes'] >= 200
+    assert stats['dropped_databases'] == (1 if sharded else 0)
+    assert _counts(app, 1)['documents'] == 1
+    if not sharded:
+        assert _execute(app, 2, "SELECT COUNT(*) FROM documents WHERE user_id = 2") == [(0,)]
+
+
+def test_purge_documents_keeps_shared_party_counts(make_app, seed_upload):
+    app = make_app()
+    _add_users(app, 1)
+    seed_upload(app, 1, ROWS)
+    rows = _execute(app, 1, f"SELECT id, user_id, {', '.join(FTS_COLUMNS)} FROM documents WHERE docno = '1'")
+    stats = {'documents': 0, 'fts_rows': 0}
+
+    with app.app_context(), tenant_scope(1):
+        purge_documents([r._mapping for r in rows], stats)
+        db.session.commit()
+        db.session.close()
+
+    assert stats['documents'] == 1 and stats['fts_rows'] == 1
+    # Sudhir Kelkar is still a party of document 2; Ramchandra Bhosale was only in document 1
+    names = dict(_execute(app, 1, "SELECT name_key, doc_count FROM party_names"))
+    assert names == {'sudhir kelkar': 1, 'meera apte': 1}
@@ -0,0 +1,121 @@
+import os
+import sqlite3
+
+import pytest
+import sqlalchemy as sa
+
+from models import db, Document, User
+from tenants import (NoTenantError, tenant_text, tenant_scope, tenant_engine, tenant_db_path, tenant_ids,
+                     migrate_shared_database, has_shared_documents)
+from parties import suggest_party_names
+
+ROWS = [
+    {'docno': '1', 'purchasername': '1) Name: Sudhir Kelkar', 'sellername': '1) Name: Ramchandra Bhosale',
+     'propertydescription': 'Gat No 777', 'registrationdate': '2015-02-01'},
+    {'docno': '2', 'purchasername': '1) Name: Meera Apte', 'sellername': '1) Name: Sudhir Kelkar',
+     'propertydescription': 'Gat No 777', 'registrationdate': '2018-06-05'},
+]
+
+
+def _counts(path):
+    con = sqlite3.connect(path)
+    try:
+        return {t: con.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+                for t in ('uploaded_files', 'documents', 'party_names', 'party_keys', 'transfer_edges',
+                          'property_refs')}
+    finally:
+        con.close()
+
+
+def test_get_bind_routes_tenant_statements_to_the_scoped_user(make_app):
+    app = make_app()
+    with app.app_context(), tenant_scope(7):
+        session = db.session
+        tenant = tenant_engine(7)
+        assert session.get_bind(mapper=Document) is tenant
+        assert session.get_bind(clause=sa.select(Document.__table__)) is tenant
+        assert session.get_bind(clause=tenant_text("SELECT COUNT(*) FROM documents")) is tenant
+        assert session.get_bind(mapper=User) is db.engine
+        # raw SQL is routed by how it was declared, never by the tables it names
+        assert session.get_bind(clause=sa.text("SELECT COUNT(*) FROM documents")) is db.engine
+        with tenant_scope(8):
+            assert session.get_bind(mapper=Document) is tenant_engine(8)
+        assert session.get_bind(mapper=Document) is tenant
+        assert os.path.exists(tenant_db_path(7))
+
+
+def test_tenant_statement_outside_a_scope_raises(make_app):
+    app = make_app()
+    with app.app_context():
+        with pytest.raises(NoTenantError):
+            db.session.get_bind(mapper=Document)
+        with pytest.raises(NoTenantError):
+            db.session.execute(tenant_text("SELECT COUNT(*) FROM documents"))
+        # central statements need no tenant
+        assert db.session.get_bind(mapper=User) is db.engine
+
+
+def test_shared_mode_keeps_everything_in_the_central_database(make_app, seed_upload):
+    app = make_app(sharded=False)
+    seed_upload(app, 1, ROWS)
+    seed_upload(app, 2, ROWS[:1])
+    with app.app_context():
+        assert db.session.get_bind(mapper=Document) is db.engine
+        assert db.session.get_bind(clause=tenant_text("SELECT 1")) is db.engine
+        assert tenant_ids() == []
+        assert db.session.execute(tenant_text("SELECT COUNT(*) FROM documents")).scalar() == 3
+        # one database, but each user only sees their own names
+        assert suggest_party_names(db.session, 1, 'sudhir') == [{'name': 'Sudhir Kelkar', 'documents': 2}]
+        assert suggest_party_names(db.session, 2, 'sudhir') == [{'name': 'Sudhir Kelkar', 'documents': 1}]
+        assert suggest_party_names(db.session, 2, 'meera') == []
+    assert not os.path.exists(os.path.join(os.path.dirname(app.config['UPLOAD_FOLDER']), 'tenants'))
+
+
+def test_migration_moves_shared_rows_and_can_be_rerun(make_app, seed_upload):
+    app = make_app(sharded=False)
+    seed_upload(app, 1, ROWS)
+    seed_upload(app, 2, ROWS[:1])
+    central = app.config['SQLALCHEMY_DATABASE_URI'][len('sqlite:///'):]
+    shared = _counts(central)
+
+    app.config['TENANT_DB_DIR'] = os.path.join(os.path.dirname(central), 'tenants')
+    with app.app_context():
+        assert has_shared_documents(db.engine)
+        assert migrate_shared_database(db.engine) == 2
+        assert not has_shared_documents(db.engine)
+        assert tenant_ids() == [1, 2]
+        paths = {u: tenant_db_path(u) for u in (1, 2)}
+        with tenant_scope(1):
+            assert suggest_party_names(db.session, 1, 'sudhir') == [{'name': 'Sudhir Kelkar', 'documents': 2}]
+        db.session.close()
+
+    first = {u: _counts(p) for u, p in paths.items()}
+    assert first[1]['documents'] == 2 and first[2]['documents'] == 1
+    assert sum(c['party_names'] for c in first.values()) == shared['party_names']
+    assert sum(c['transfer_edges'] for c in first.values()) == shared['transfer_edges']
+
+    # nothing left to move: a second run changes nothing
+    with app.app_context():
+        assert migrate_shared_database(db.engine) == 0
+    assert {u: _counts(p) for u, p in paths.items()} == first
+
+
+def test_interrupted_migration_is_completed_without_duplicates(make_app, seed_upload):
+    app = make_app(sharded=False)
+    seed_upload(app, 1, ROWS)
+    central = app.config['SQLALCHEMY_DATABASE_URI'][len('sqlite:///'):]
+    shared = _counts(central)
+    app.config['TENANT_DB_DIR'] = os.path.join(os.path.dirname(central), 'tenants')
+
+    with app.app_context():
+        # a run that copied user 1's rows but stopped before deleting the central ones
+        with tenant_engine(1).connect() as conn:
+            conn.exec_driver_sql("ATTACH DATABASE ? AS central", (central,))
+            for table in ('uploaded_files', 'documents'):
+                conn.exec_driver_sql(f"INSERT INTO main.{table} SELECT * FROM central.{table}")
+            conn.commit()
+            conn.exec_driver_sql("DETACH DATABASE central")
+        assert migrate_shared_database(db.engine) == 1
+        assert not has_shared_documents(db.engine)
+        path = tenant_db_path(1)
+    assert _counts(path) == shared
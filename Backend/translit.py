@@ -0,0 +1,138 @@
+import re
+from functools import lru_cache
+
+# =========================================================
+# NAME TRANSLITERATION + PHONETIC KEYS
+# Party names arrive in Devanagari in some files and romanized in
+# others ("अमोल टिळेकर" / "Amol Tilekar" / "Amool Tilaker").
+# latin_key() brings both scripts to one simplified Latin spelling;
+# phonetic_key() reduces a word to its consonant skeleton so that
+# spelling variants share a key. Used by the fuzzy party index
+# (parties.py).
+# =========================================================
+_INDEPENDENT_VOWELS = {
+    'अ': 'a', 'आ': 'aa', 'इ': 'i', 'ई': 'ee', 'उ': 'u', 'ऊ': 'oo', 'ऋ': 'ru',
+    'ए': 'e', 'ऐ': 'ai', 'ओ': 'o', 'औ': 'au', 'ऑ': 'o', 'ॲ': 'a',
+}
+_VOWEL_SIGNS = {
+    'ा': 'aa', 'ि': 'i', 'ी': 'ee', 'ु': 'u', 'ू': 'oo', 'ृ': 'ru',
+    'े': 'e', 'ै': 'ai', 'ो': 'o', 'ौ': 'au', 'ॉ': 'o', 'ॅ': 'a',
+}
+_CONSONANTS = {
+    'क': 'k', 'ख': 'kh', 'ग': 'g', 'घ': 'gh', 'ङ': 'n',
+    'च': 'ch', 'छ': 'chh', 'ज': 'j', 'झ': 'jh', 'ञ': 'n',
+    'ट': 't', 'ठ': 'th', 'ड': 'd', 'ढ': 'dh', 'ण': 'n',
+    'त': 't', 'थ': 'th', 'द': 'd', 'ध': 'dh', 'न': 'n',
+    'प': 'p', 'फ': 'ph', 'ब': 'b', 'भ': 'bh', 'म': 'm',
+    'य': 'y', 'र': 'r', 'ल': 'l', 'ळ': 'l', 'व': 'v',
+    'श': 'sh', 'ष': 'sh', 'स': 's', 'ह': 'h',
+}
+_VIRAMA = '्'
+_NASALS = {'ं': 'n', 'ँ': 'n'}
+_VISARGA = 'ः'
+_NUKTA = '़'
+
+# Latin spellings folded together before comparing
+_LATIN_FOLDS = [('aa', 'a'), ('ee', 'i'), ('oo', 'u'), ('w', 'v'), ('z', 'j'), ('q', 'k'),
+                ('ph', 'f'), ('x', 'ks'), ('ck', 'k')]
+_ASPIRATES_RE = re.compile(r'([b-df-hj-np-tv-z])h')   # kh, sh, vh (चव्हाण), mh …
+_REPEAT_RE = re.compile(r'(.)\1+')
+_VOWEL_RE = re.compile(r'[aeiou]')
+_NON_WORD_RE = re.compile(r'[^a-z ]+')
+PHONETIC_MIN_LEN = 2
+# names repeat heavily across documents (builders, common surnames)
+KEY_CACHE_SIZE = 65536
+
+
+def _syllables(word):
+    """Devanagari word → [consonant, vowel, inherent?] triples (vowel '' after a virama)."""
+    out = []
+    for ch in word.replace('ज्ञ', 'द्न्य'):   # Marathi pronounces ज्ञ as "dny"
+        if ch in _CONSONANTS:
+            out.append([_CONSONANTS[ch], 'a', True])
+        elif ch in _VOWEL_SIGNS and out:
+            out[-1][1:] = [_VOWEL_SIGNS[ch], False]
+        elif ch == _VIRAMA and out:
+            out[-1][1:] = ['', False]
+        elif ch in _INDEPENDENT_VOWELS:
+            out.append(['', _INDEPENDENT_VOWELS[ch], False])
+        elif ch in _NASALS and out:
+            out[-1][1] += _NASALS[ch]
+            out[-1][2] = False
+        elif ch == _VISARGA and out:
+            out[-1][1] += 'h'
+        elif ch != _NUKTA:
+            out.append([ch, '', False])
+    return out
+
+
+def _devanagari_word(word):
+    syl = _syllables(word)
+    if syl and syl[-1][2] and not (len(syl) > 1 and syl[-2][0] and not syl[-2][1]):
+        syl[-1][1:] = ['', False]           # word-final schwa is silent, except after a conjunct (चंद्र)
+    for i in range(1, len(syl) - 1):
+        # medial schwa between two sounded syllables is dropped: देशपांडे → deshpaande
+        if syl[i][2] and syl[i - 1][1] and syl[i + 1][0] and syl[i + 1][1]:
+            syl[i][1:] = ['', False]
+    return ''.join(c + v for c, v, _ in syl)
+
+
+def transliterate(text):
+    """Devanagari → Latin (Marathi conventions); other characters pass through lower-cased."""
+    words = []
+    for word in str(text or '').split():
+        if any('ऀ' <= ch <= 'ॿ' for ch in word):
+            word = _devanagari_word(word)
+        words.append(word.lower())
+    return ' '.join(words)
+
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def latin_key(name):
+    """Either script → simplified Latin words, the form edit distances are measured on."""
+    key = _NON_WORD_RE.sub(' ', transliterate(name))
+    for a, b in _LATIN_FOLDS:
+        key = key.replace(a, b)
+    return ' '.join(_REPEAT_RE.sub(r'\1', w) for w in key.split())
+
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def phonetic_key(word):
+    """One latin_key() word → consonant skeleton (leading vowel kept as A); '' if too short to use."""
+    w = _ASPIRATES_RE.sub(r'\1', word)
+    w = re.sub(r'y(?![aeiou])', '', w)       # "gaay-kavad" / "gaikwad"
+    head = 'a' if _VOWEL_RE.match(w) else ''
+    key = _REPEAT_RE.sub(r'\1', head + _VOWEL_RE.sub('', w)).upper()
+    return key if len(key) >= PHONETIC_MIN_LEN else ''
+
+
+def phonetic_keys(name):
+    """Distinct phonetic keys of the words of a name."""
+    return sorted({k for k in map(phonetic_key, latin_key(name).split()) if k})
+
+
+def edit_distance(a, b):
+    """Levenshtein distance."""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def name_distance(query, candidate):
+    """
+    0..1 distance of two latin_key() names: each query word against its closest
+    candidate word, averaged, so "amol tilekar" matches "amol vaishali tilekar".
+    """
+    q_words, c_words = query.split(), candidate.split()
+    if not q_words or not c_words:
+        return 1.0
+    total = 0.0
+    for qw in q_words:
+        total += min(edit_distance(qw, cw) / max(len(qw), len(cw)) for cw in c_words)
+    return total / len(q_words)